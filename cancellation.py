@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import threading
+
+
+class OperationCancelled(Exception):
+    """Операция прервана по запросу пользователя."""
+
+
+class CancelToken:
+    """Флаг отмены, который фоновая операция проверяет на границах этапов.
+
+    ``event`` позволяет разделить флаг между процессами
+    (``multiprocessing.Event``), по умолчанию используется ``threading.Event``.
+    """
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled("Операция отменена.")
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 import configparser
 import os
+import tempfile
 from dataclasses import dataclass, field
 from typing import Optional
 
 CONFIG_FILE = "config.ini"
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "barcode_pdf_cache")
+PREVIEW_MODES = ("full", "thumbnail", "outline")
+# Режим предпросмотра по умолчанию и для неизвестного значения в config.ini
+DEFAULT_PREVIEW_MODE = "thumbnail"
 
 
 @dataclass
@@ -15,8 +20,12 @@ class PageSettings:
     margin_left: int = 10
     margin_right: int = 10
     orientation: str = "Книжная"
+    source_type: str = "image"
+    layout: str = "grid"
 
     ORIENTATIONS = ("Книжная", "Альбомная")
+    SOURCE_TYPES = ("image", "vector")
+    LAYOUTS = ("grid", "packed")
 
     def to_dict(self) -> dict:
         return {
@@ -27,16 +36,82 @@ class PageSettings:
                 "right": self.margin_right,
             },
             "orientation": self.orientation,
+            "source_type": self.source_type,
+            "layout": self.layout,
         }
 
 
+@dataclass
+class PrintSettings:
+    backend: str = "shell"
+    spool_dir: str = "spool"
+    command: str = ""
+    per_printer_jobs: int = 1
+    retries: int = 2
+    batch_orders: bool = False
+    batch_max_orders: int = 10
+    batch_max_labels: int = 2000
+    batch_max_wait_sec: int = 60
+    batch_header_pages: bool = True
+    # Большие задания делятся на файлы-части (0 — без ограничения)
+    split_max_pages: int = 0
+    split_max_labels: int = 0
+
+    BACKENDS = ("shell", "directory")
+
+
+@dataclass
+class RasterSettings:
+    """Растрирование заданий в TIFF перед отправкой на медленные принтеры."""
+
+    enabled: bool = False
+    dpi: int = 300
+    bit_depth: int = 1
+    # Через запятую; пусто — все принтеры
+    printers: str = ""
+    max_mb: int = 1000
+    # 0 — по числу ядер
+    workers: int = 0
+
+    BIT_DEPTHS = (1, 8)
+
+    def printer_list(self) -> list[str]:
+        return [name.strip() for name in self.printers.split(",") if name.strip()]
+
+
+@dataclass
+class MirrorSettings:
+    enabled: bool = False
+    # Пустая строка — подпапка mirror в папке кэша
+    dir: str = ""
+    max_mb: int = 2000
+    revalidate_sec: int = 5
+
+
+@dataclass
+class InstrumentationSettings:
+    enabled: bool = False
+    jsonl_path: str = "timings.jsonl"
+    prometheus_path: str = ""
+
+
 @dataclass
 class AppConfig:
     barcode_dir: str = "barcode_images"
     pdf_source_dir: str = "pdf_barcodes"
     selected_printer: Optional[str] = None
     ribbon_printer: Optional[str] = None
+    # Предпросмотр: full — как печать, thumbnail — миниатюры, outline — рамки
+    preview_mode: str = DEFAULT_PREVIEW_MODE
     page_settings: PageSettings = field(default_factory=PageSettings)
+    cache_dir: str = DEFAULT_CACHE_DIR
+    cache_max_mb: int = 500
+    # Пустая строка — каталог библиотеки в папке кэша
+    catalog_path: str = ""
+    print_settings: PrintSettings = field(default_factory=PrintSettings)
+    mirror: MirrorSettings = field(default_factory=MirrorSettings)
+    raster: RasterSettings = field(default_factory=RasterSettings)
+    instrumentation: InstrumentationSettings = field(default_factory=InstrumentationSettings)
 
     @classmethod
     def load(cls, config_path: str = CONFIG_FILE) -> AppConfig:
@@ -50,6 +125,7 @@ class AppConfig:
         pdf_source_dir = parser.get("Settings", "PdfSourceDir", fallback="pdf_barcodes")
         selected_printer = parser.get("Settings", "SelectedPrinter", fallback=None) or None
         ribbon_printer = parser.get("Settings", "RibbonPrinter", fallback=None) or None
+        preview_mode = parser.get("Settings", "PreviewMode", fallback=DEFAULT_PREVIEW_MODE)
 
         page_settings = PageSettings(
             margin_top=parser.getint("PageSettings", "MarginTop", fallback=25),
@@ -57,6 +133,8 @@ class AppConfig:
             margin_left=parser.getint("PageSettings", "MarginLeft", fallback=10),
             margin_right=parser.getint("PageSettings", "MarginRight", fallback=10),
             orientation=parser.get("PageSettings", "Orientation", fallback="Книжная"),
+            source_type=parser.get("PageSettings", "SourceType", fallback="image"),
+            layout=parser.get("PageSettings", "Layout", fallback="grid"),
         )
 
         return cls(
@@ -64,7 +142,44 @@ class AppConfig:
             pdf_source_dir=pdf_source_dir,
             selected_printer=selected_printer,
             ribbon_printer=ribbon_printer,
+            preview_mode=preview_mode,
             page_settings=page_settings,
+            cache_dir=parser.get("Cache", "Dir", fallback="") or DEFAULT_CACHE_DIR,
+            cache_max_mb=parser.getint("Cache", "MaxMb", fallback=500),
+            catalog_path=parser.get("Cache", "CatalogPath", fallback=""),
+            print_settings=PrintSettings(
+                backend=parser.get("Printing", "Backend", fallback="shell"),
+                spool_dir=parser.get("Printing", "SpoolDir", fallback="spool"),
+                command=parser.get("Printing", "Command", fallback=""),
+                per_printer_jobs=parser.getint("Printing", "PerPrinterJobs", fallback=1),
+                retries=parser.getint("Printing", "Retries", fallback=2),
+                batch_orders=parser.getboolean("Printing", "BatchOrders", fallback=False),
+                batch_max_orders=parser.getint("Printing", "BatchMaxOrders", fallback=10),
+                batch_max_labels=parser.getint("Printing", "BatchMaxLabels", fallback=2000),
+                batch_max_wait_sec=parser.getint("Printing", "BatchMaxWaitSec", fallback=60),
+                batch_header_pages=parser.getboolean("Printing", "BatchHeaderPages", fallback=True),
+                split_max_pages=parser.getint("Printing", "SplitMaxPages", fallback=0),
+                split_max_labels=parser.getint("Printing", "SplitMaxLabels", fallback=0),
+            ),
+            mirror=MirrorSettings(
+                enabled=parser.getboolean("Mirror", "Enabled", fallback=False),
+                dir=parser.get("Mirror", "Dir", fallback=""),
+                max_mb=parser.getint("Mirror", "MaxMb", fallback=2000),
+                revalidate_sec=parser.getint("Mirror", "RevalidateSec", fallback=5),
+            ),
+            raster=RasterSettings(
+                enabled=parser.getboolean("Raster", "Enabled", fallback=False),
+                dpi=parser.getint("Raster", "Dpi", fallback=300),
+                bit_depth=parser.getint("Raster", "BitDepth", fallback=1),
+                printers=parser.get("Raster", "Printers", fallback=""),
+                max_mb=parser.getint("Raster", "MaxMb", fallback=1000),
+                workers=parser.getint("Raster", "Workers", fallback=0),
+            ),
+            instrumentation=InstrumentationSettings(
+                enabled=parser.getboolean("Instrumentation", "Enabled", fallback=False),
+                jsonl_path=parser.get("Instrumentation", "JsonlPath", fallback="timings.jsonl"),
+                prometheus_path=parser.get("Instrumentation", "PrometheusPath", fallback=""),
+            ),
         )
 
     def save(self, config_path: str = CONFIG_FILE) -> None:
@@ -74,6 +189,7 @@ class AppConfig:
             "PdfSourceDir": self.pdf_source_dir,
             "SelectedPrinter": self.selected_printer or "",
             "RibbonPrinter": self.ribbon_printer or "",
+            "PreviewMode": self.preview_mode,
         }
         parser["PageSettings"] = {
             "MarginTop": str(self.page_settings.margin_top),
@@ -81,6 +197,47 @@ class AppConfig:
             "MarginLeft": str(self.page_settings.margin_left),
             "MarginRight": str(self.page_settings.margin_right),
             "Orientation": self.page_settings.orientation,
+            "SourceType": self.page_settings.source_type,
+            "Layout": self.page_settings.layout,
+        }
+        parser["Cache"] = {
+            # Каталог по умолчанию не сохраняется: он зависит от TEMP станции
+            "Dir": "" if self.cache_dir == DEFAULT_CACHE_DIR else self.cache_dir,
+            "MaxMb": str(self.cache_max_mb),
+            "CatalogPath": self.catalog_path,
+        }
+        parser["Printing"] = {
+            "Backend": self.print_settings.backend,
+            "SpoolDir": self.print_settings.spool_dir,
+            "Command": self.print_settings.command,
+            "PerPrinterJobs": str(self.print_settings.per_printer_jobs),
+            "Retries": str(self.print_settings.retries),
+            "BatchOrders": str(self.print_settings.batch_orders).lower(),
+            "BatchMaxOrders": str(self.print_settings.batch_max_orders),
+            "BatchMaxLabels": str(self.print_settings.batch_max_labels),
+            "BatchMaxWaitSec": str(self.print_settings.batch_max_wait_sec),
+            "BatchHeaderPages": str(self.print_settings.batch_header_pages).lower(),
+            "SplitMaxPages": str(self.print_settings.split_max_pages),
+            "SplitMaxLabels": str(self.print_settings.split_max_labels),
+        }
+        parser["Mirror"] = {
+            "Enabled": str(self.mirror.enabled).lower(),
+            "Dir": self.mirror.dir,
+            "MaxMb": str(self.mirror.max_mb),
+            "RevalidateSec": str(self.mirror.revalidate_sec),
+        }
+        parser["Raster"] = {
+            "Enabled": str(self.raster.enabled).lower(),
+            "Dpi": str(self.raster.dpi),
+            "BitDepth": str(self.raster.bit_depth),
+            "Printers": self.raster.printers,
+            "MaxMb": str(self.raster.max_mb),
+            "Workers": str(self.raster.workers),
+        }
+        parser["Instrumentation"] = {
+            "Enabled": str(self.instrumentation.enabled).lower(),
+            "JsonlPath": self.instrumentation.jsonl_path,
+            "PrometheusPath": self.instrumentation.prometheus_path,
         }
         with open(config_path, "w", encoding="utf-8") as f:
             parser.write(f)
@@ -99,5 +256,37 @@ class AppConfig:
             errors.append(f"MarginRight ({ps.margin_right}) вне допустимого диапазона 0-50 мм")
         if ps.orientation not in PageSettings.ORIENTATIONS:
             errors.append(f"Orientation '{ps.orientation}' недопустима. Допустимые: {PageSettings.ORIENTATIONS}")
+        if ps.source_type not in PageSettings.SOURCE_TYPES:
+            errors.append(f"SourceType '{ps.source_type}' недопустим. Допустимые: {PageSettings.SOURCE_TYPES}")
+        if ps.layout not in PageSettings.LAYOUTS:
+            errors.append(f"Layout '{ps.layout}' недопустим. Допустимые: {PageSettings.LAYOUTS}")
+        if self.preview_mode not in PREVIEW_MODES:
+            errors.append(f"PreviewMode '{self.preview_mode}' недопустим. Допустимые: {PREVIEW_MODES}")
+        if self.cache_max_mb < 1:
+            errors.append(f"Cache MaxMb ({self.cache_max_mb}) должен быть не меньше 1 МБ")
+        pr = self.print_settings
+        if pr.backend not in PrintSettings.BACKENDS:
+            errors.append(f"Printing Backend '{pr.backend}' недопустим. Допустимые: {PrintSettings.BACKENDS}")
+        if pr.per_printer_jobs < 1:
+            errors.append(f"Printing PerPrinterJobs ({pr.per_printer_jobs}) должен быть не меньше 1")
+        if pr.retries < 0:
+            errors.append(f"Printing Retries ({pr.retries}) не может быть отрицательным")
+        if pr.batch_max_orders < 1 or pr.batch_max_labels < 1 or pr.batch_max_wait_sec < 1:
+            errors.append("Пороги пакетной печати (BatchMaxOrders, BatchMaxLabels, BatchMaxWaitSec) должны быть не меньше 1")
+        if pr.split_max_pages < 0 or pr.split_max_labels < 0:
+            errors.append("Пороги разбиения (SplitMaxPages, SplitMaxLabels) не могут быть отрицательными")
+        if self.mirror.max_mb < 1:
+            errors.append(f"Mirror MaxMb ({self.mirror.max_mb}) должен быть не меньше 1 МБ")
+        if self.mirror.revalidate_sec < 0:
+            errors.append(f"Mirror RevalidateSec ({self.mirror.revalidate_sec}) не может быть отрицательным")
+        ra = self.raster
+        if ra.dpi < 72 or ra.dpi > 1200:
+            errors.append(f"Raster Dpi ({ra.dpi}) вне допустимого диапазона 72-1200")
+        if ra.bit_depth not in RasterSettings.BIT_DEPTHS:
+            errors.append(f"Raster BitDepth '{ra.bit_depth}' недопустим. Допустимые: {RasterSettings.BIT_DEPTHS}")
+        if ra.max_mb < 1:
+            errors.append(f"Raster MaxMb ({ra.max_mb}) должен быть не меньше 1 МБ")
+        if ra.workers < 0:
+            errors.append(f"Raster Workers ({ra.workers}) не может быть отрицательным")
 
         return errors
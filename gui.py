@@ -1,43 +1,165 @@
 from __future__ import annotations
 
+# Импортируется первым, чтобы засечь начало загрузки модулей приложения
+import startup_profile
+
+import itertools
+import multiprocessing
 import os
-import threading
+import sys
+import time
 import tkinter as tk
 from tkinter import messagebox, ttk
 
-import win32print
-
 import app_styles
 import barcode_selection_tab
+import cancellation
 import ribbon_barcode_selection_tab
 import config_manager
+import instrumentation
+import job_scheduler
+import jobs_tab
+import library_catalog
+import library_scanner
+import library_source
+import library_watcher
 import main_tab
+import mirror_cache
+import order_batcher
+import order_import
+import pdf_cache
+import print_backend
+import progress
+import rasterizer
 import ribbon_print_tab
 import settings_tab
+import vector_labels
 
 
 class BarcodePDFApp(tk.Tk):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, startup_report: bool = False):
+        self.startup = startup_profile.StartupProfile()
+        self.startup.record("import", startup_profile.PROCESS_START)
+        self.startup_report = startup_report
+        self._startup_reported = False
+
+        with self.startup.phase("tk_init"):
+            super().__init__()
 
         self.title("Генератор PDF со штрих-кодами")
         self.geometry("850x600")
 
-        self.cfg = config_manager.AppConfig.load()
-        default_printer = None
-        try:
-            default_printer = win32print.GetDefaultPrinter()
-        except RuntimeError:
-            pass
+        with self.startup.phase("config"):
+            self.cfg = config_manager.AppConfig.load()
+            instrumentation.configure_from(self.cfg.instrumentation)
+            self.pdf_cache = pdf_cache.PdfCache(
+                self.cfg.cache_dir, self.cfg.cache_max_mb * pdf_cache.MB
+            )
+            self.catalog = library_catalog.LibraryCatalog(
+                self.cfg.catalog_path or library_catalog.default_path(self.cfg.cache_dir)
+            )
+            self.mirror = mirror_cache.create_mirror(self.cfg.mirror, self.cfg.cache_dir)
+            self.print_backend = print_backend.create_backend(self.cfg.print_settings)
+            raster = rasterizer.create_rasterizer(self.cfg.raster, self.cfg.cache_dir)
+            if raster is not None:
+                self.print_backend = print_backend.RasterizingBackend(
+                    self.print_backend, raster, self.cfg.raster.printer_list()
+                )
+            self.print_spooler = print_backend.PrintSpooler(
+                self.print_backend,
+                per_printer_limit=self.cfg.print_settings.per_printer_jobs,
+                max_retries=self.cfg.print_settings.retries,
+                dispatch=lambda fn: self.after(0, fn),
+            )
+
+        self._barcode_scanner: library_scanner.LibraryScanner | None = None
+        # Папки, для которых идёт синхронизация каталога, и флаг повторного прохода
+        self._catalog_syncs: dict[str, bool] = {}
+        self._order_numbers = itertools.count(1)
+        # Последний прогресс каждого задания; на панели — самое новое из них
+        self._job_progress: dict[job_scheduler.Job | None, tuple[str, progress.Progress]] = {}
+        self.order_batcher = order_batcher.OrderBatcher(
+            self,
+            self._print_batch,
+            max_orders=self.cfg.print_settings.batch_max_orders,
+            max_labels=self.cfg.print_settings.batch_max_labels,
+            max_wait_ms=self.cfg.print_settings.batch_max_wait_sec * 1000,
+        )
+        self.scheduler = job_scheduler.JobScheduler(
+            lambda fn: self.after(0, fn), on_update=self._on_job_update
+        )
+
+        with self.startup.phase("styles"):
+            self.setup_styles()
+        with self.startup.phase("widgets"):
+            self.create_widgets()
+        self.library_watcher = library_watcher.LibraryWatcher(self)
+        self.library_watcher.start()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.startup.begin("first_paint")
+        self.after_idle(self._on_first_idle)
+
+    def _on_first_idle(self):
+        self.startup.end("first_paint")
+        with self.startup.phase("printers"):
+            self.init_printers()
+        self.startup.begin("barcode_scan")
+        self.startup.begin("pdf_scan")
+        self.load_barcode_list()
+        if self.mirror is not None:
+            self.scheduler.submit(
+                "Сверка локального зеркала библиотеки",
+                self.mirror.refresh,
+                priority=job_scheduler.PRIORITY_BACKGROUND,
+            )
+
+    def on_close(self) -> None:
+        """Останавливает фоновые службы и закрывает окно.
+
+        Заказы, ожидающие в пакетах, при закрытии потерялись бы, поэтому
+        сначала предлагается отправить их на печать.
+        """
+        waiting = self.order_batcher.pending_orders()
+        if waiting:
+            answer = messagebox.askyesnocancel(
+                "Выход",
+                f"Заказов, ожидающих пакетной печати: {waiting}.\n"
+                "Отправить их на печать сейчас?\n\n"
+                "«Да» — отправить (программа останется открытой),\n"
+                "«Нет» — выйти без печати этих заказов.",
+            )
+            if answer is None:
+                return
+            if answer:
+                self.order_batcher.flush_all()
+                self.jobs_tab.update_summary()
+                self.update_status(
+                    "Ожидавшие пакеты отправлены на печать. "
+                    "Закройте программу после завершения заданий."
+                )
+                return
+        self.library_watcher.stop()
+        self.main_tab.shutdown()
+        if self.mirror is not None:
+            self.mirror.close(wait=False)
+        library_source.close_all()
+        self.destroy()
+
+    def init_printers(self):
+        default_printer = self.print_backend.default_printer()
         if not self.cfg.selected_printer:
             self.cfg.selected_printer = default_printer
         if not self.cfg.ribbon_printer:
             self.cfg.ribbon_printer = default_printer
+        self.settings_tab.load_printers()
 
-        self.setup_styles()
-        self.create_widgets()
-        self.load_barcode_list()
+    def on_library_scan_finished(self, phase: str) -> None:
+        self.startup.end(phase)
+        if self.startup_report and not self._startup_reported and not self.startup.pending:
+            self._startup_reported = True
+            print(self.startup.report())
 
     def setup_styles(self):
         style = ttk.Style(self)
@@ -54,7 +176,7 @@ class BarcodePDFApp(tk.Tk):
         self.config(menu=menubar)
 
         file_menu = tk.Menu(menubar, tearoff=0)
-        file_menu.add_command(label="Выход", command=self.destroy)
+        file_menu.add_command(label="Выход", command=self.on_close)
         menubar.add_cascade(label="Файл", menu=file_menu)
 
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -73,54 +195,202 @@ class BarcodePDFApp(tk.Tk):
         )
         self.ribbon_tab = ribbon_print_tab.RibbonPrintTab(self.notebook, self)
         self.settings_tab = settings_tab.SettingsTab(self.notebook, self)
+        self.jobs_tab = jobs_tab.JobsTab(self.notebook, self)
 
         self.notebook.add(self.main_tab, text="Печать с листа")
         self.notebook.add(self.selection_tab, text="Выбор штрих-кодов для печати с листа")
         self.notebook.add(self.ribbon_tab, text="Печать с ленты")
         self.notebook.add(self.ribbon_selection_tab, text="Выбор штрих-кодов для печати с ленты")
+        self.notebook.add(self.jobs_tab, text="Задания")
         self.notebook.add(self.settings_tab, text="Настройки")
 
+        status_frame = ttk.Frame(self)
+        status_frame.pack(side="bottom", fill="x", padx=10, pady=(0, 5))
+
+        cancel_button = ttk.Button(
+            status_frame, text="Отменить", command=self.cancel_current_job
+        )
+        cancel_button.pack(side="right", padx=(5, 0))
+
+        self.progress_bar = ttk.Progressbar(
+            status_frame, length=200, maximum=1.0, mode="determinate"
+        )
+        self.progress_bar.pack(side="right", padx=(5, 0))
+
         self.status_bar = ttk.Label(
-            self, text="Загрузка...", anchor="w", relief=tk.SUNKEN
+            status_frame, text="Загрузка...", anchor="w", relief=tk.SUNKEN
         )
-        self.status_bar.pack(side="bottom", fill="x", padx=10, pady=(0, 5))
+        self.status_bar.pack(side="left", fill="x", expand=True)
 
     def load_barcode_list(self):
         self.main_tab.clear_list(silent=True)
         self.main_tab.barcode_selector.set("")
+        self.main_tab.set_barcodes([])
+        self.selection_tab.populate_barcodes([])
+
+        self.library_watcher.unwatch("barcodes")
+        if self._barcode_scanner is not None:
+            self._barcode_scanner.cancel()
+            self._barcode_scanner = None
+        if self.catalog.is_synced(self.cfg.barcode_dir):
+            # Список берётся из каталога; расхождения с папкой сообщит первый
+            # же опрос наблюдателя, так как базовый снимок содержит метаданные
+            snapshot = self.catalog.snapshot(
+                self.cfg.barcode_dir, library_scanner.IMAGE_EXTENSIONS
+            )
+            self._on_barcode_batch(sorted(snapshot))
+            self._on_barcode_scan_done(None, known=snapshot)
+            self.ribbon_tab.load_pdf_list()
+            return
+        self._barcode_scanner = library_scanner.LibraryScanner(
+            self,
+            self.cfg.barcode_dir,
+            library_scanner.IMAGE_EXTENSIONS,
+            on_batch=self._on_barcode_batch,
+            on_done=self._on_barcode_scan_done,
+        )
+        self.update_status("Сканирование папки со штрих-кодами...")
+        self._barcode_scanner.start()
+        self.ribbon_tab.load_pdf_list()
+
+    def _on_barcode_batch(self, batch: list[str]) -> None:
+        self.main_tab.append_barcodes(batch)
+        self.selection_tab.append_barcodes(batch)
+        self.update_status(
+            f"Сканирование папки со штрих-кодами... "
+            f"найдено {len(self.main_tab.all_barcode_files)}"
+        )
 
-        if not os.path.isdir(self.cfg.barcode_dir):
+    def _on_barcode_scan_done(
+        self, error: Exception | None, known: library_watcher.Snapshot | None = None
+    ) -> None:
+        self._barcode_scanner = None
+        self.on_library_scan_finished("barcode_scan")
+        if error is not None:
             messagebox.showwarning(
                 "Папка не найдена",
-                f"Папка '{self.cfg.barcode_dir}' не найдена.\n\n"
+                f"Папка или архив '{self.cfg.barcode_dir}' не найдены или не читаются.\n\n"
                 "Пожалуйста, укажите правильный путь на вкладке 'Настройки'.",
             )
-            self.main_tab.barcode_selector["values"] = []
-            self.main_tab.all_barcode_files = []
+            self.main_tab.set_barcodes([])
             self.update_status("Ошибка: неверный путь к папке со штрих-кодами.")
             return
 
-        barcode_files = sorted(
-            f
-            for f in os.listdir(self.cfg.barcode_dir)
-            if f.lower().endswith((".png", ".jpg", ".jpeg"))
+        barcode_files = sorted(self.main_tab.all_barcode_files)
+        self.library_watcher.watch(
+            "barcodes",
+            self.cfg.barcode_dir,
+            library_scanner.IMAGE_EXTENSIONS,
+            self._on_barcode_library_changed,
+            known=barcode_files if known is None else known,
         )
-
+        self.sync_catalog(self.cfg.barcode_dir, library_scanner.IMAGE_EXTENSIONS)
         if not barcode_files:
             messagebox.showwarning(
                 "Внимание",
                 f"В папке '{self.cfg.barcode_dir}' не найдено изображений.",
             )
-            self.main_tab.barcode_selector["values"] = []
-            self.main_tab.all_barcode_files = []
             self.update_status("Внимание: Изображения не найдены.")
         else:
             self.main_tab.set_barcodes(barcode_files)
-            self.selection_tab.populate_barcodes(barcode_files)
-            self.ribbon_tab.load_pdf_list()
-            self.ribbon_selection_tab.populate_files(self.ribbon_tab.all_pdf_files)
+            self.selection_tab.finish_loading(barcode_files)
             self.update_status("Готово")
 
+    def _on_barcode_library_changed(self, changes: library_watcher.LibraryChanges) -> None:
+        self.main_tab.apply_library_changes(changes)
+        self.selection_tab.apply_library_changes(changes)
+        self.report_library_changes(changes)
+        self.on_library_changed(self.cfg.barcode_dir, library_scanner.IMAGE_EXTENSIONS, changes)
+
+    def on_library_changed(
+        self, path: str, extensions: tuple[str, ...], changes: library_watcher.LibraryChanges
+    ) -> None:
+        """Обновляет каталог и сбрасывает копии изменённых файлов в зеркале."""
+        if self.mirror is not None:
+            self.mirror.invalidate(path, changes.modified + changes.removed)
+        self.sync_catalog(path, extensions)
+
+    def library_path(self, source_dir: str, filename: str) -> str:
+        """Путь для чтения файла библиотеки (через зеркало, если оно включено)."""
+        if self.mirror is None:
+            return os.path.join(source_dir, filename)
+        return self.mirror.local_path(source_dir, filename)
+
+    def readable_dir(
+        self, source_dir: str, filenames, cancel_token: cancellation.CancelToken | None = None
+    ) -> str:
+        """Папка, из которой генератор прочитает ``filenames``.
+
+        Вызывается из фонового задания: при включённом зеркале здесь
+        скачиваются недостающие и изменившиеся файлы.
+        """
+        if self.mirror is None:
+            return source_dir
+        # Описания товаров нужны векторным этикеткам; отсутствующий файл пропускается
+        filenames = [*filenames, vector_labels.DESCRIPTIONS_FILE]
+        return self.mirror.ensure(source_dir, filenames, cancel_token)
+
+    def sync_catalog(self, path: str, extensions: tuple[str, ...]) -> None:
+        """Обновляет каталог библиотеки в фоне с самым низким приоритетом.
+
+        Если синхронизация папки уже идёт, после неё будет выполнен ещё один
+        проход, чтобы учесть изменения, пришедшие во время работы.
+        """
+        if path in self._catalog_syncs:
+            self._catalog_syncs[path] = True
+            return
+        self._catalog_syncs[path] = False
+
+        token = cancellation.CancelToken()
+
+        def task():
+            return self.catalog.sync(path, extensions, cancel_token=token)
+
+        def finished(_=None):
+            if self._catalog_syncs.pop(path, False):
+                self.sync_catalog(path, extensions)
+
+        self.scheduler.submit(
+            "Обновление каталога библиотеки",
+            task,
+            finished,
+            finished,
+            priority=job_scheduler.PRIORITY_BACKGROUND,
+            cancel_token=token,
+            on_cancel=lambda: self._catalog_syncs.pop(path, None),
+        )
+
+    def library_index(
+        self, path: str, files: list[str], extensions: tuple[str, ...]
+    ) -> order_import.SkuIndex:
+        """Индекс артикулов: из каталога, если он уже построен для папки.
+
+        Берутся только файлы из последнего сканирования ``files``: каталог
+        синхронизируется в фоне и может ещё хранить удалённые файлы.
+        """
+        if self.catalog.is_synced(path):
+            known = set(files)
+            entries = self.catalog.index_entries(path, extensions)
+            return order_import.SkuIndex.from_entries(e for e in entries if e[0] in known)
+        return order_import.SkuIndex(files)
+
+    def search_library(
+        self, path: str, text: str, files: list[str], extensions: tuple[str, ...]
+    ) -> list[str]:
+        """Поиск по библиотеке: по словам и фасовке через каталог."""
+        if self.catalog.is_synced(path):
+            known = set(files)
+            found = self.catalog.search(path, text, extensions=extensions)
+            return [f for f in found if f in known]
+        text = text.lower()
+        return [f for f in files if text in f.lower()]
+
+    def report_library_changes(self, changes: library_watcher.LibraryChanges) -> None:
+        self.update_status(
+            f"Библиотека обновлена: добавлено {len(changes.added)}, "
+            f"удалено {len(changes.removed)}, изменено {len(changes.modified)}"
+        )
+
     def add_barcodes_from_selection_tab(self, checkbox_vars):
         added = self.main_tab.add_barcodes_from_selection(checkbox_vars)
         if added > 0:
@@ -133,6 +403,48 @@ class BarcodePDFApp(tk.Tk):
             self.update_status(f"Добавлено {added} новых позиций в список печати с ленты.")
         self.ribbon_tab.switch_to_self()
 
+    def import_order_csv(
+        self,
+        library_dir: str,
+        extensions: tuple[str, ...],
+        library_files: list[str],
+        target,
+        title: str,
+    ) -> None:
+        """Заполняет список ``target`` (``QuantityListModel``) заказом из CSV."""
+        from tkinter import filedialog
+
+        path = filedialog.askopenfilename(
+            title="Импорт заказа из CSV",
+            filetypes=[("CSV файлы", "*.csv *.txt"), ("Все файлы", "*.*")],
+        )
+        if not path:
+            return
+        if target and not messagebox.askyesno(
+            "Импорт CSV", f"Заменить текущий список ({len(target)} поз.) содержимым заказа?"
+        ):
+            return
+
+        files = list(library_files)
+
+        def task():
+            return order_import.import_orders(path, self.library_index(library_dir, files, extensions))
+
+        def on_done(result: order_import.ImportResult):
+            target.replace(result.items)
+            self.update_status(
+                f"Импортировано позиций: {len(result.items)}, "
+                f"не распознано строк: {len(result.unresolved)}. Готово."
+            )
+            show = messagebox.showwarning if result.unresolved else messagebox.showinfo
+            show(title, result.summary())
+
+        def on_error(error):
+            messagebox.showerror("Ошибка импорта", f"Не удалось прочитать CSV:\n{error}")
+            self.update_status("Ошибка импорта CSV. Готово.")
+
+        self._run_task(task, on_done, on_error, "Импорт заказа из CSV...")
+
     def update_status(self, message):
         self.status_bar.config(text=message)
         self.update_idletasks()
@@ -143,33 +455,267 @@ class BarcodePDFApp(tk.Tk):
         on_done: callable,
         on_error: callable,
         status_text: str = "Выполнение...",
-    ):
-        self.attributes("-disabled", True)
+        priority: int = job_scheduler.PRIORITY_GENERATE,
+        cancel_token: cancellation.CancelToken | None = None,
+        on_cancel: callable | None = None,
+    ) -> job_scheduler.Job:
+        def _cancelled():
+            self.update_status("Задание отменено. Готово")
+            if on_cancel is not None:
+                on_cancel()
+
+        job = self.scheduler.submit(
+            status_text.rstrip(". "),
+            task,
+            on_done,
+            on_error,
+            priority=priority,
+            cancel_token=cancel_token,
+            on_cancel=_cancelled,
+        )
+        queued = self.scheduler.counts()[job_scheduler.QUEUED]
+        if queued > 1:
+            status_text = f"{status_text} (в очереди заданий: {queued})"
         self.update_status(status_text)
-        self.update_idletasks()
+        return job
+
+    def _prepare_for_printer(
+        self, paths: list[str], printer: str, submit: callable
+    ) -> None:
+        """Передаёт ``submit`` файлы, готовые к отправке на ``printer``.
+
+        Если бэкенду нужна подготовка (растрирование для медленных
+        принтеров), она выполняется фоновым заданием с прогрессом и отменой,
+        а в очередь печати попадает уже её результат.
+        """
+        backend = self.print_backend
+        if not any(backend.needs_prepare(path, printer) for path in paths):
+            submit(paths)
+            return
+        token = cancellation.CancelToken()
 
-        def _wrapper():
+        def task():
+            report = self.make_progress_callback("Растрирование для печати")
+            prepared = []
             try:
-                result = task()
-                self.after(
-                    0, lambda res=result: self._task_completed(on_done, on_error, res, None)
-                )
-            except Exception as exc:
-                self.after(
-                    0, lambda err=exc: self._task_completed(on_done, on_error, None, err)
+                for path in paths:
+                    prepared.append(backend.prepare(path, printer, report, token))
+                    # Готовый файл не вытесняется, пока его не примет очередь печати
+                    pdf_cache.pin(prepared[-1])
+            except BaseException:
+                for path in prepared:
+                    pdf_cache.unpin(path)
+                raise
+            return prepared
+
+        def on_done(prepared: list[str]):
+            try:
+                submit(prepared)
+            finally:
+                for path in prepared:
+                    pdf_cache.unpin(path)
+
+        def on_error(error):
+            messagebox.showerror(
+                "Ошибка печати", f"Не удалось подготовить документ для '{printer}':\n{error}"
+            )
+            self.update_status("Ошибка при подготовке к печати. Готово.")
+
+        self._run_task(
+            task,
+            on_done,
+            on_error,
+            f"Растрирование для '{printer}'...",
+            job_scheduler.PRIORITY_PRINT,
+            cancel_token=token,
+        )
+
+    def send_to_printer(self, path: str, printer: str, parent=None) -> None:
+        """Ставит готовый PDF в очередь печати, не блокируя интерфейс."""
+
+        def on_done(job: print_backend.PrintJob) -> None:
+            self.update_status("Документ отправлен на печать. Готово.")
+            self.jobs_tab.update_print_summary()
+            messagebox.showinfo("Печать", "Документ отправлен на печать.", parent=parent)
+
+        def on_error(job: print_backend.PrintJob) -> None:
+            self.update_status("Ошибка при печати. Готово.")
+            self.jobs_tab.update_print_summary()
+            messagebox.showerror(
+                "Ошибка печати",
+                f"Не удалось отправить документ на принтер '{job.printer}' "
+                f"(попыток: {job.attempts}):\n{job.error}",
+                parent=parent,
+            )
+
+        def submit(prepared: list[str]) -> None:
+            self.print_spooler.submit(prepared[0], printer, on_done, on_error)
+            self.update_status(f"Документ поставлен в очередь печати на '{printer}'...")
+
+        self._prepare_for_printer([path], printer, submit)
+
+    def send_parts_to_printer(self, paths: list[str], printer: str) -> None:
+        """Ставит части разбитого задания в очередь печати отдельными заданиями.
+
+        Части повторяются при ошибке независимо друг от друга; сообщение
+        пользователю выводится одно, когда обработаны все части.
+        """
+        remaining = len(paths)
+        failed: list[print_backend.PrintJob] = []
+        # Имя части для сообщения об ошибке, если на печать ушёл её растр
+        names: dict[str, str] = {}
+
+        def finished(job: print_backend.PrintJob, error: bool) -> None:
+            nonlocal remaining
+            remaining -= 1
+            if error:
+                failed.append(job)
+            self.jobs_tab.update_print_summary()
+            if remaining:
+                return
+            if not failed:
+                self.update_status(f"Отправлено на печать частей: {len(paths)}. Готово.")
+                messagebox.showinfo("Печать", f"Документ отправлен на печать ({len(paths)} ч.).")
+                return
+            self.update_status("Ошибка при печати части задания. Готово.")
+            details = "\n".join(f"{names.get(job.path, job.path)}: {job.error}" for job in failed)
+            messagebox.showerror(
+                "Ошибка печати",
+                f"Не удалось отправить на принтер '{printer}' частей: "
+                f"{len(failed)} из {len(paths)}:\n{details}",
+            )
+
+        def submit(prepared: list[str]) -> None:
+            for path, original in zip(prepared, paths):
+                names[path] = os.path.basename(original)
+                self.print_spooler.submit(
+                    path,
+                    printer,
+                    lambda job: finished(job, False),
+                    lambda job: finished(job, True),
                 )
+            self.update_status(
+                f"Задание из {len(paths)} частей поставлено в очередь печати на '{printer}'..."
+            )
 
-        threading.Thread(target=_wrapper, daemon=True).start()
+        self._prepare_for_printer(paths, printer, submit)
+
+    def new_order(
+        self, kind: str, items: dict, printer: str, source_dir: str, **kwargs
+    ) -> order_batcher.Order:
+        name = f"Заказ №{next(self._order_numbers)} от {time.strftime('%H:%M:%S')}"
+        return order_batcher.Order(name, kind, dict(items), printer, source_dir, **kwargs)
+
+    def queue_order(self, order: order_batcher.Order) -> None:
+        """Добавляет заказ в пакет; пакет печатается при достижении порога."""
+        batch = self.order_batcher.add(order)
+        waiting = self.order_batcher.pending_orders()
+        if waiting:
+            self.update_status(
+                f"{order.name} добавлен в пакет для '{batch.printer}'. "
+                f"Ожидают печати заказов: {waiting}."
+            )
+        self.jobs_tab.update_summary()
+
+    def _print_batch(self, batch: order_batcher.Batch) -> None:
+        """Собирает заказы пакета в один документ и отправляет его одним заданием."""
+        token = cancellation.CancelToken()
+        count = len(batch.orders)
+
+        def task():
+            return order_batcher.render_batch(
+                batch,
+                self.pdf_cache,
+                lambda order: self.readable_dir(order.source_dir, order.items, token),
+                header_pages=self.cfg.print_settings.batch_header_pages,
+                progress=self.make_progress_callback("Сборка пакета заказов"),
+                cancel_token=token,
+            )
+
+        def on_done(path):
+            self.send_to_printer(path, batch.printer)
+            self.jobs_tab.update_summary()
+
+        def on_error(error):
+            messagebox.showerror(
+                "Ошибка", f"Не удалось собрать пакет из {count} заказов:\n{error}"
+            )
+            self.update_status("Ошибка пакетной печати. Готово.")
+
+        self._run_task(
+            task,
+            on_done,
+            on_error,
+            f"Сборка пакета из {count} заказов...",
+            job_scheduler.PRIORITY_PRINT,
+            cancel_token=token,
+        )
+
+    def make_progress_callback(self, label: str) -> progress.ProgressCallback:
+        """Возвращает колбэк прогресса для фонового задания.
+
+        Генераторы уже ограничивают частоту вызовов, поэтому каждое обновление
+        просто передаётся в главный поток без ``update_idletasks``.
+        """
+
+        job = job_scheduler.current_job()
+
+        def callback(state: progress.Progress) -> None:
+            self.after(0, lambda s=state: self._show_progress(job, label, s))
 
-    def _task_completed(
-        self, on_done: callable, on_error: callable, result, error: Exception | None
-    ):
-        self.attributes("-disabled", False)
-        self.focus_set()
-        if error:
-            on_error(error)
+        return callback
+
+    def _show_progress(
+        self, job: job_scheduler.Job | None, label: str, state: progress.Progress
+    ) -> None:
+        if job is not None and job.state in job_scheduler.FINISHED_STATES:
+            return
+        if state.finished:
+            self._job_progress.pop(job, None)
+        else:
+            self._job_progress[job] = (label, state)
+        self._render_progress()
+
+    def _render_progress(self) -> None:
+        if not self._job_progress:
+            self.progress_bar["value"] = 0
+            return
+        label, state = self._job_progress[max(self._job_progress, key=self._progress_order)]
+        self.progress_bar["value"] = state.fraction
+
+        if state.labels_total:
+            done = f"{state.labels_placed}/{state.labels_total} этикеток"
+        else:
+            done = f"{state.sources_merged}/{state.sources_total} файлов"
+        text = f"{label}: {done}, стр. {state.pages_done}"
+        if state.eta is not None:
+            text += f", осталось ~{state.eta:.0f} с"
+        self.status_bar.config(text=text)
+
+    def cancel_current_job(self) -> None:
+        """Отменяет последнее запущенное задание, а если таких нет — последнее в очереди."""
+        active = self.scheduler.active_jobs()
+        running = [j for j in active if j.state == job_scheduler.RUNNING]
+        candidates = running or active
+        if not candidates:
+            self.update_status("Нет активных заданий для отмены.")
+            return
+        job = candidates[-1]
+        if self.scheduler.cancel(job):
+            self.update_status(f"Отмена задания: {job.name}...")
         else:
-            on_done(result)
+            self.update_status(f"Задание '{job.name}' нельзя отменить.")
+
+    @staticmethod
+    def _progress_order(job: job_scheduler.Job | None) -> int:
+        return job.id if job is not None else 0
+
+    def _on_job_update(self, job: job_scheduler.Job) -> None:
+        self.jobs_tab.update_job(job)
+        # Ошибка и отмена не присылают финального прогресса
+        if job.state in job_scheduler.FINISHED_STATES and job in self._job_progress:
+            del self._job_progress[job]
+            self._render_progress()
 
     def show_about_dialog(self):
         messagebox.showinfo(
@@ -181,5 +727,7 @@ class BarcodePDFApp(tk.Tk):
 
 
 if __name__ == "__main__":
-    app = BarcodePDFApp()
+    # Части больших заданий собираются в дочерних процессах (output_parts)
+    multiprocessing.freeze_support()
+    app = BarcodePDFApp(startup_report="--startup-report" in sys.argv)
     app.mainloop()
@@ -0,0 +1,421 @@
+"""HTTP-сервис генерации PDF для внешних систем (WMS).
+
+Запуск: python http_service.py [--host 127.0.0.1] [--port 8765] [--workers 2] [--queue 8]
+        [--max-quantity 10000] [--max-labels 100000]
+
+POST /generate  {"items": {"файл.png": 2, ...}, "title": "...", "page_settings": {...}}
+POST /merge     {"items": {"файл.pdf": 1, ...}}
+GET  /health
+
+Файлы ищутся только в папках из config.ini. Готовый PDF отдаётся потоком
+(``Transfer-Encoding: chunked``) из дискового кэша документов.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import config_manager
+import instrumentation
+import mirror_cache
+import pdf_cache
+import pdf_generator
+from cancellation import CancelToken
+
+MAX_BODY_BYTES = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Ограничения одного запроса: раскладка строится в памяти до первой проверки отмены
+MAX_ITEM_QUANTITY = 10_000
+MAX_TOTAL_LABELS = 100_000
+# Поля не больше половины листа A4 по короткой стороне
+MAX_MARGIN_MM = 105
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+@dataclass
+class ServiceStats:
+    requests: int = 0
+    rejected: int = 0
+    failed: int = 0
+    in_flight: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "uptime": round(time.monotonic() - self.started_at, 1),
+        }
+
+
+class HttpService:
+    """Асинхронный HTTP-сервер поверх генераторов PDF.
+
+    Генерация выполняется в пуле из ``max_workers`` потоков. Одновременно
+    принимается не больше ``max_workers + max_queue`` заданий; остальные
+    запросы сразу получают 503 с ``Retry-After``, чтобы клиент повторил позже,
+    а не копил соединения. Запрос больше ``max_item_quantity`` этикеток одной
+    позиции или ``max_total_labels`` всего отклоняется с 413.
+    """
+
+    def __init__(
+        self,
+        cfg: config_manager.AppConfig,
+        max_workers: int = 2,
+        max_queue: int = 8,
+        cache: Optional[pdf_cache.PdfCache] = None,
+        max_item_quantity: int = MAX_ITEM_QUANTITY,
+        max_total_labels: int = MAX_TOTAL_LABELS,
+    ):
+        self.cfg = cfg
+        self.max_workers = max_workers
+        self.max_item_quantity = max_item_quantity
+        self.max_total_labels = max_total_labels
+        self.max_pending = max_workers + max_queue
+        self.cache = cache or pdf_cache.PdfCache(cfg.cache_dir, cfg.cache_max_mb * pdf_cache.MB)
+        self.mirror = mirror_cache.create_mirror(cfg.mirror, cfg.cache_dir)
+        self.stats = ServiceStats()
+        self.port: Optional[int] = None
+        self.started = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http-gen")
+        self._tokens: set[CancelToken] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started.set()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for token in list(self._tokens):
+                token.cancel()
+            self._executor.shutdown(wait=False)
+
+    def close(self) -> None:
+        """Останавливает сервер; можно вызывать из любого потока."""
+        if self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as exc:
+                    await self._send_json(writer, exc.status, {"error": str(exc)}, False)
+                    break
+                if request is None:
+                    break
+                self.stats.requests += 1
+                await self._respond(request, writer)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Некорректная строка запроса")
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HttpError(400, "Некорректный Content-Length")
+        if length < 0:
+            raise HttpError(400, "Некорректный Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Слишком большой запрос")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target.split("?", 1)[0], headers, body)
+
+    async def _respond(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        keep_alive = request.keep_alive
+        try:
+            if request.path == "/health":
+                if request.method != "GET":
+                    raise HttpError(405, "Ожидается GET")
+                await self._send_json(writer, 200, {"status": "ok", **self.stats.as_dict()}, keep_alive)
+                return
+            if request.path not in ("/generate", "/merge"):
+                raise HttpError(404, f"Неизвестный адрес {request.path}")
+            if request.method != "POST":
+                raise HttpError(405, "Ожидается POST")
+
+            payload = self._parse_payload(request.body)
+            if self.stats.in_flight >= self.max_pending:
+                self.stats.rejected += 1
+                await self._send_json(
+                    writer,
+                    503,
+                    {"error": "Сервис перегружен, повторите позже"},
+                    keep_alive,
+                    extra_headers={"Retry-After": "1"},
+                )
+                return
+
+            self.stats.in_flight += 1
+            token = CancelToken()
+            self._tokens.add(token)
+            try:
+                kind = "sheet" if request.path == "/generate" else "ribbon"
+                loop = asyncio.get_running_loop()
+                path = await loop.run_in_executor(
+                    self._executor, self._build_traced, kind, payload, token
+                )
+            finally:
+                self._tokens.discard(token)
+                self.stats.in_flight -= 1
+            await self._send_file(writer, path, keep_alive)
+        except HttpError as exc:
+            await self._send_json(writer, exc.status, {"error": str(exc)}, keep_alive)
+        except ValueError as exc:
+            await self._send_json(writer, 422, {"error": str(exc)}, keep_alive)
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            self.stats.failed += 1
+            await self._send_json(writer, 500, {"error": str(exc)}, keep_alive)
+
+    def _parse_payload(self, body: bytes) -> dict:
+        """Проверяет запрос целиком; ``page_settings`` дополняются настройками по умолчанию."""
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Тело запроса должно быть JSON")
+        items = payload.get("items") if isinstance(payload, dict) else None
+        if not isinstance(items, dict) or not items:
+            raise HttpError(400, "Поле 'items' должно быть непустым объектом {файл: количество}")
+        for filename, quantity in items.items():
+            if os.path.basename(filename) != filename or filename in ("", ".", ".."):
+                raise HttpError(400, f"Недопустимое имя файла: {filename!r}")
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+                raise HttpError(400, f"Количество для {filename!r} должно быть целым положительным")
+            if quantity > self.max_item_quantity:
+                raise HttpError(
+                    413, f"Количество для {filename!r} больше {self.max_item_quantity}"
+                )
+        if sum(items.values()) > self.max_total_labels:
+            raise HttpError(413, f"Всего этикеток больше {self.max_total_labels}")
+
+        title = payload.get("title")
+        if title is not None and not isinstance(title, str):
+            raise HttpError(400, "Поле 'title' должно быть строкой")
+        return {
+            "items": items,
+            "title": title,
+            "page_settings": self._page_settings(payload.get("page_settings")),
+        }
+
+    def _page_settings(self, overrides) -> dict:
+        """Настройки страницы из config.ini с переопределёнными полями запроса."""
+        settings = self.cfg.page_settings.to_dict()
+        if overrides is None:
+            return settings
+        if not isinstance(overrides, dict):
+            raise HttpError(400, "Поле 'page_settings' должно быть объектом")
+        unknown = set(overrides) - set(settings)
+        if unknown:
+            raise HttpError(400, f"Неизвестные поля page_settings: {', '.join(sorted(unknown))}")
+
+        margins = overrides.get("margins", {})
+        if not isinstance(margins, dict):
+            raise HttpError(400, "Поле 'page_settings.margins' должно быть объектом")
+        unknown = set(margins) - set(settings["margins"])
+        if unknown:
+            raise HttpError(400, f"Неизвестные поля margins: {', '.join(sorted(unknown))}")
+        for side, value in margins.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise HttpError(400, f"Поле margins.{side} должно быть числом")
+            if not 0 <= value <= MAX_MARGIN_MM:
+                raise HttpError(422, f"Поле margins.{side} должно быть от 0 до {MAX_MARGIN_MM}")
+        settings["margins"].update(margins)
+
+        allowed = {
+            "orientation": config_manager.PageSettings.ORIENTATIONS,
+            "source_type": config_manager.PageSettings.SOURCE_TYPES,
+            "layout": config_manager.PageSettings.LAYOUTS,
+        }
+        for name, values in allowed.items():
+            if name not in overrides:
+                continue
+            if overrides[name] not in values:
+                raise HttpError(422, f"Поле {name} должно быть одним из: {', '.join(values)}")
+            settings[name] = overrides[name]
+        return settings
+
+    def _build_traced(self, kind: str, payload: dict, token: CancelToken) -> str:
+        with instrumentation.span("http.build", kind=kind, items=len(payload["items"])):
+            return self._build(kind, payload, token)
+
+    def _build(self, kind: str, payload: dict, token: CancelToken) -> str:
+        items = payload["items"]
+        if kind == "ribbon":
+            source_dir = self._readable_dir(self.cfg.pdf_source_dir, items, token)
+            key = pdf_cache.make_cache_key("ribbon", items, source_dir)
+            path, _ = self.cache.get_or_create(
+                key,
+                lambda out: pdf_generator.merge_pdfs(items, source_dir, out, cancel_token=token),
+            )
+            return path
+
+        source_dir = self._readable_dir(self.cfg.barcode_dir, items, token)
+        title = payload["title"]
+        page_settings = payload["page_settings"]
+        key = pdf_cache.make_cache_key("sheet", items, source_dir, page_settings, title)
+        path, _ = self.cache.get_or_create(
+            key,
+            lambda out: pdf_generator.create_pdf_from_barcodes(
+                items,
+                source_dir,
+                out,
+                title=title or "",
+                page_settings=page_settings,
+                cancel_token=token,
+            ),
+        )
+        return path
+
+    def _readable_dir(self, source_dir: str, items: dict, token: CancelToken) -> str:
+        if self.mirror is None:
+            return source_dir
+        return self.mirror.ensure(source_dir, items, token)
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str, keep_alive: bool) -> None:
+        # Файл открыт до начала ответа: вытеснение из кэша его уже не затронет
+        with open(path, "rb") as f:
+            self._write_head(
+                writer,
+                200,
+                {"Content-Type": "application/pdf", "Transfer-Encoding": "chunked"},
+                keep_alive,
+            )
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: dict,
+        keep_alive: bool,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Content-Length": str(len(body)),
+            **(extra_headers or {}),
+        }
+        self._write_head(writer, status, headers, keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+    @staticmethod
+    def _write_head(
+        writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], keep_alive: bool
+    ) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="HTTP-сервис генерации PDF")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue", type=int, default=8, help="сколько заданий может ждать в очереди")
+    parser.add_argument(
+        "--max-quantity", type=int, default=MAX_ITEM_QUANTITY, help="этикеток одной позиции"
+    )
+    parser.add_argument(
+        "--max-labels", type=int, default=MAX_TOTAL_LABELS, help="этикеток в одном запросе"
+    )
+    parser.add_argument("--config", default=config_manager.CONFIG_FILE)
+    args = parser.parse_args(argv)
+
+    cfg = config_manager.AppConfig.load(args.config)
+    instrumentation.configure_from(cfg.instrumentation)
+    service = HttpService(
+        cfg,
+        max_workers=args.workers,
+        max_queue=args.queue,
+        max_item_quantity=args.max_quantity,
+        max_total_labels=args.max_labels,
+    )
+    print(f"Сервис генерации PDF: http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
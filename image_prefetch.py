@@ -0,0 +1,201 @@
+"""Параллельная подготовка изображений этикеток впереди отрисовки.
+
+Пока reportlab сжимает и пишет очередную картинку в главном потоке, пул
+потоков уже открывает, декодирует и проверяет следующие. Декодированных
+изображений одновременно в памяти не больше ``window``: новое задание
+ставится в пул только после того, как отрисовка забрала готовое.
+
+Для черновых документов (предпросмотр) вместо полных изображений
+используются уменьшенные копии ``load_thumbnail``, которые запоминаются
+между вызовами.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+import library_source
+
+DEFAULT_WORKERS = 4
+DEFAULT_WINDOW = 8
+
+# Ширина миниатюры в пикселях: этикетка 45 мм на экране предпросмотра
+# занимает около 130 точек, запас на масштаб
+THUMBNAIL_WIDTH = 256
+THUMBNAIL_CACHE_SIZE = 512
+
+_thumbnail_lock = threading.Lock()
+_thumbnails: OrderedDict[tuple[str, int, int, int], object] = OrderedDict()
+
+
+def _open_image(path: str, max_width: Optional[int] = None):
+    from PIL import Image
+
+    filename = os.path.basename(path)
+    try:
+        if library_source.stat(path)[0] == 0:
+            raise ValueError(f"Файл '{filename}' пустой.")
+        # Файл может лежать в ZIP-архиве: изображение декодируется целиком,
+        # пока поток открыт
+        with library_source.open_file(path) as f:
+            img = Image.open(f)
+            if max_width is not None and img.width > max_width:
+                size = (max_width, max(1, img.height * max_width // img.width))
+                # Для JPEG уменьшение идёт уже при декодировании
+                img.draft("RGB", size)
+                img.thumbnail(size)
+            else:
+                img.load()
+    except (OSError, zipfile.BadZipFile, Image.DecompressionBombError) as exc:
+        raise ValueError(f"Не удалось прочитать изображение '{filename}': {exc}") from exc
+    if img.width == 0 or img.height == 0:
+        raise ValueError(f"Изображение '{filename}' имеет нулевой размер.")
+    return img
+
+
+def load_image(path: str):
+    """Открывает и полностью декодирует изображение для ``drawImage``.
+
+    Возвращает ``ImageReader`` с уже подготовленными RGB-данными; битый или
+    пустой файл даёт ``ValueError`` с именем файла.
+    """
+    from reportlab.lib.utils import ImageReader
+
+    reader = ImageReader(_open_image(path))
+    reader.getRGBData()
+    return reader
+
+
+def load_thumbnail(path: str, max_width: int = THUMBNAIL_WIDTH):
+    """Как ``load_image``, но уменьшенная копия шириной не больше ``max_width``.
+
+    Миниатюры запоминаются по пути, размеру и mtime файла, поэтому повторный
+    предпросмотр того же набора не читает изображения заново.
+    """
+    from reportlab.lib.utils import ImageReader
+
+    try:
+        size, mtime_ns = library_source.stat(path)
+    except OSError as exc:
+        raise ValueError(
+            f"Не удалось прочитать изображение '{os.path.basename(path)}': {exc}"
+        ) from exc
+    key = (path, size, mtime_ns, max_width)
+    with _thumbnail_lock:
+        reader = _thumbnails.get(key)
+        if reader is not None:
+            _thumbnails.move_to_end(key)
+            return reader
+
+    reader = ImageReader(_open_image(path, max_width))
+    reader.getRGBData()
+    with _thumbnail_lock:
+        _thumbnails[key] = reader
+        while len(_thumbnails) > THUMBNAIL_CACHE_SIZE:
+            _thumbnails.popitem(last=False)
+    return reader
+
+
+class ImagePrefetcher:
+    """Выдаёт декодированные изображения в порядке ``filenames``.
+
+    Используется как итератор пар ``(имя файла, ImageReader)``; ``close``
+    отменяет ещё не начатые задания (например, при отмене генерации).
+    """
+
+    def __init__(
+        self,
+        source_dir: str,
+        filenames: Iterable[str],
+        workers: int = DEFAULT_WORKERS,
+        window: int = DEFAULT_WINDOW,
+        loader: Optional[Callable[[str], object]] = None,
+    ):
+        self.source_dir = source_dir
+        self.loader = loader or load_image
+        self.window = max(1, window)
+        self._pending = iter(filenames)
+        self._futures: deque[tuple[str, Future]] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="image-prefetch"
+        )
+        for _ in range(self.window):
+            if not self._submit_next():
+                break
+
+    def _submit_next(self) -> bool:
+        filename = next(self._pending, None)
+        if filename is None:
+            return False
+        path = os.path.join(self.source_dir, filename)
+        self._futures.append((filename, self._executor.submit(self.loader, path)))
+        return True
+
+    def __iter__(self) -> Iterator[tuple[str, object]]:
+        return self
+
+    def __next__(self) -> tuple[str, object]:
+        if not self._futures:
+            self.close()
+            raise StopIteration
+        filename, future = self._futures.popleft()
+        self._submit_next()
+        return filename, future.result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._futures.clear()
+
+    def __enter__(self) -> ImagePrefetcher:
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.close()
+        return False
+
+
+class ImageForms:
+    """Растровые этикетки как формы PDF (XObject) единичного размера.
+
+    Изображение попадает в документ один раз, при первом использовании, а
+    копии ссылаются на форму через ``doForm`` с масштабом до размера
+    этикетки. ``images`` должен выдавать файлы в порядке их первого
+    использования (см. ``ImagePrefetcher``).
+    """
+
+    def __init__(self, canvas, images: Iterator[tuple[str, object]]):
+        self.canvas = canvas
+        self._images = images
+        self._forms: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def draw(self, filename: str, x: float, y: float, width: float, height: float) -> None:
+        name = self._forms.get(filename)
+        if name is None:
+            name = self._define(filename)
+        c = self.canvas
+        c.saveState()
+        c.translate(x, y)
+        c.scale(width, height)
+        c.doForm(name)
+        c.restoreState()
+
+    def _define(self, filename: str) -> str:
+        loaded, reader = next(self._images)
+        if loaded != filename:
+            raise RuntimeError(f"Ожидалось изображение '{filename}', получено '{loaded}'")
+        name = f"image{len(self._forms)}"
+        c = self.canvas
+        c.beginForm(name, lowerx=0, lowery=0, upperx=1, uppery=1)
+        c.drawImage(reader, 0, 0, width=1, height=1)
+        c.endForm()
+        self._forms[filename] = name
+        return name
@@ -0,0 +1,288 @@
+"""Замеры длительности этапов заданий.
+
+Использование::
+
+    with instrumentation.span("generate.save", labels=120):
+        c.save()
+
+Пока ``configure`` не вызван, ``span`` возвращает общий пустой объект, поэтому
+замеры можно оставлять в коде без заметных накладных расходов. Для этапов
+внутри горячих циклов (например, ``drawImage`` для каждой этикетки) служит
+``accumulator``: он суммирует время и выдаёт одну запись на документ.
+
+Записи пишутся построчно в JSON (JSON Lines); дополнительно агрегаты по именам
+этапов могут выгружаться в текстовый файл в формате Prometheus.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
+PROMETHEUS_PREFIX = "barcode_span"
+
+logger = logging.getLogger(__name__)
+
+_sink: Optional[SpanSink] = None
+_local = threading.local()
+_ids = itertools.count(1)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def emit(self, **attrs) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("sink", "name", "attrs", "start", "id", "parent", "trace")
+
+    def __init__(self, sink: SpanSink, name: str, attrs: dict):
+        self.sink = sink
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> _Span:
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.id = next(_ids)
+        parent = stack[-1] if stack else None
+        self.parent = parent.name if parent else None
+        self.trace = parent.trace if parent else self.id
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self.start
+        _local.stack.pop()
+        self.sink.emit(self.name, duration, self.trace, self.parent, exc_type, self.attrs)
+        return False
+
+
+class _Accumulator:
+    """Суммирует время многократно повторяемого этапа внутри текущего span."""
+
+    __slots__ = ("sink", "name", "total", "count", "_start", "trace", "parent")
+
+    def __init__(self, sink: SpanSink, name: str):
+        self.sink = sink
+        self.name = name
+        self.total = 0.0
+        self.count = 0
+        stack = getattr(_local, "stack", None)
+        parent = stack[-1] if stack else None
+        self.parent = parent.name if parent else None
+        self.trace = parent.trace if parent else None
+
+    def __enter__(self) -> _Accumulator:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.total += time.perf_counter() - self._start
+        self.count += 1
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def emit(self, **attrs) -> None:
+        if self.count:
+            self.sink.emit(
+                self.name, self.total, self.trace, self.parent, None, {"calls": self.count, **attrs}
+            )
+
+
+class SpanSink:
+    """Приёмник записей: файл JSON Lines и агрегаты для Prometheus."""
+
+    def __init__(
+        self,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        stream: Optional[TextIO] = None,
+        prometheus_interval: float = 10.0,
+    ):
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+        self._lock = threading.Lock()
+        # Ошибки записи не должны ломать задания: пишем в журнал один раз
+        self._write_failed = False
+        self._owns_stream = stream is None and jsonl_path is not None
+        self._stream = stream
+        if self._owns_stream:
+            try:
+                self._stream = open(jsonl_path, "a", encoding="utf-8", buffering=1)
+            except OSError as exc:
+                # Без файла журнала замеры продолжают копиться для Prometheus
+                self._report_failure(exc)
+                self._stream = None
+        # имя этапа -> [количество, сумма, максимум, ошибки]
+        self.totals: Dict[str, list] = {}
+        self._prometheus_written = time.monotonic()
+
+    def emit(self, name, duration, trace, parent, exc_type, attrs) -> None:
+        record = {
+            "ts": round(time.time(), 6),
+            "span": name,
+            "duration_ms": round(duration * 1000, 3),
+            "trace": trace,
+            "thread": threading.current_thread().name,
+        }
+        if parent is not None:
+            record["parent"] = parent
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(attrs)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+        with self._lock:
+            stats = self.totals.get(name)
+            if stats is None:
+                stats = self.totals[name] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            if exc_type is not None:
+                stats[3] += 1
+            if self._stream is not None:
+                try:
+                    self._stream.write(line)
+                except OSError as exc:
+                    self._report_failure(exc)
+            now = time.monotonic()
+            write_prometheus = (
+                self.prometheus_path is not None
+                and now - self._prometheus_written >= self.prometheus_interval
+            )
+            if write_prometheus:
+                self._prometheus_written = now
+        if write_prometheus:
+            try:
+                self.write_prometheus()
+            except OSError as exc:
+                with self._lock:
+                    self._report_failure(exc)
+
+    def _report_failure(self, exc: OSError) -> None:
+        # Вызывается под self._lock
+        if not self._write_failed:
+            self._write_failed = True
+            logger.warning("Не удалось записать замеры: %s", exc)
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            totals = {name: list(stats) for name, stats in self.totals.items()}
+        metric = f"{PROMETHEUS_PREFIX}_duration_seconds"
+        lines = [
+            f"# HELP {metric} Длительность этапов заданий.",
+            f"# TYPE {metric} summary",
+        ]
+        for name, (count, total, _, _) in sorted(totals.items()):
+            lines.append(f'{metric}_count{{span="{name}"}} {count}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_max_seconds gauge")
+        for name, (_, _, longest, _) in sorted(totals.items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_max_seconds{{span="{name}"}} {longest:.6f}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_errors_total counter")
+        for name, (_, _, _, errors) in sorted(totals.items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_errors_total{{span="{name}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self) -> None:
+        """Атомарно перезаписывает файл для textfile-коллектора node_exporter."""
+        if self.prometheus_path is None:
+            return
+        with self._lock:
+            self._prometheus_written = time.monotonic()
+        directory, name = os.path.split(os.path.abspath(self.prometheus_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, self.prometheus_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def close(self) -> None:
+        try:
+            self.write_prometheus()
+        except OSError as exc:
+            with self._lock:
+                self._report_failure(exc)
+        with self._lock:
+            if self._owns_stream and self._stream is not None:
+                self._stream.close()
+            self._stream = None
+
+
+def configure(
+    jsonl_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+    stream: Optional[TextIO] = None,
+) -> SpanSink:
+    """Включает замеры; предыдущий приёмник закрывается."""
+    global _sink
+    disable()
+    _sink = SpanSink(jsonl_path, prometheus_path, stream)
+    return _sink
+
+
+def configure_from(settings) -> None:
+    """Включает замеры по ``config_manager.InstrumentationSettings``."""
+    if settings.enabled:
+        configure(settings.jsonl_path or None, settings.prometheus_path or None)
+
+
+def disable() -> None:
+    global _sink
+    sink, _sink = _sink, None
+    if sink is not None:
+        sink.close()
+
+
+def enabled() -> bool:
+    return _sink is not None
+
+
+def span(name: str, /, **attrs):
+    sink = _sink
+    if sink is None:
+        return _NULL_SPAN
+    return _Span(sink, name, attrs)
+
+
+def accumulator(name: str):
+    sink = _sink
+    if sink is None:
+        return _NULL_SPAN
+    return _Accumulator(sink, name)
+
+
+atexit.register(disable)
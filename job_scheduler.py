@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import instrumentation
+from cancellation import CancelToken, OperationCancelled
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+STATE_LABELS = {
+    QUEUED: "В очереди",
+    RUNNING: "Выполняется",
+    DONE: "Готово",
+    FAILED: "Ошибка",
+    CANCELLED: "Отменено",
+}
+
+# Меньшее значение — более высокий приоритет
+PRIORITY_PREVIEW = 0
+PRIORITY_GENERATE = 10
+PRIORITY_PRINT = 20
+PRIORITY_BACKGROUND = 30
+
+
+_current = threading.local()
+
+
+def current_job() -> Optional["Job"]:
+    """Задание, которое выполняется в текущем рабочем потоке, или None."""
+    return getattr(_current, "job", None)
+
+
+@dataclass(eq=False)
+class Job:
+    id: int
+    name: str
+    task: Callable[[], Any]
+    priority: int
+    on_done: Optional[Callable[[Any], None]] = None
+    on_error: Optional[Callable[[Exception], None]] = None
+    on_cancel: Optional[Callable[[], None]] = None
+    cancel_token: Optional[CancelToken] = None
+    state: str = QUEUED
+    result: Any = None
+    error: Optional[Exception] = None
+    created_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class JobScheduler:
+    """Общая очередь фоновых заданий с ограниченным пулом рабочих потоков.
+
+    Задания выбираются по приоритету, а при равном приоритете — в порядке
+    постановки. Колбэки ``on_done``/``on_error`` и уведомления ``on_update``
+    передаются через ``dispatch``, который должен выполнить функцию в главном
+    потоке Tk (например, ``lambda fn: app.after(0, fn)``).
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[Callable[[], None]], None],
+        max_workers: int = 2,
+        on_update: Optional[Callable[[Job], None]] = None,
+        history_size: int = 200,
+    ):
+        self.dispatch = dispatch
+        self.max_workers = max_workers
+        self.on_update = on_update
+        self.history_size = history_size
+        self.jobs: list[Job] = []
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._workers: list[threading.Thread] = []
+
+    def submit(
+        self,
+        name: str,
+        task: Callable[[], Any],
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        priority: int = PRIORITY_GENERATE,
+        cancel_token: Optional[CancelToken] = None,
+        on_cancel: Optional[Callable[[], None]] = None,
+    ) -> Job:
+        """Ставит задание в очередь.
+
+        Задание, получившее ``cancel_token``, можно отменить через ``cancel``:
+        из очереди оно снимается сразу, а выполняющееся прерывается, когда
+        задача проверит флаг и выбросит ``OperationCancelled``.
+        """
+        job = Job(
+            next(self._ids),
+            name,
+            task,
+            priority,
+            on_done,
+            on_error,
+            on_cancel=on_cancel,
+            cancel_token=cancel_token,
+        )
+        with self._lock:
+            self.jobs.append(job)
+            self._trim_history()
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        self._queue.put((priority, next(self._seq), job))
+        self._notify(job)
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """Запрашивает отмену задания; возвращает False, если это невозможно."""
+        if job.cancel_token is None:
+            return False
+        with self._lock:
+            if job.state in FINISHED_STATES:
+                return False
+            job.cancel_token.cancel()
+            if job.state != QUEUED:
+                return True
+            job.state = CANCELLED
+            job.finished_at = time.monotonic()
+        self.dispatch(lambda j=job: self._complete(j))
+        return True
+
+    def active_jobs(self) -> list[Job]:
+        with self._lock:
+            return [j for j in self.jobs if j.state not in FINISHED_STATES]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            jobs = list(self.jobs)
+        result = dict.fromkeys(STATE_LABELS, 0)
+        for job in jobs:
+            result[job.state] += 1
+        return result
+
+    def _trim_history(self) -> None:
+        excess = len(self.jobs) - self.history_size
+        if excess <= 0:
+            return
+        finished = [j for j in self.jobs if j.state in FINISHED_STATES][:excess]
+        for job in finished:
+            self.jobs.remove(job)
+
+    def _work(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            with self._lock:
+                if job.state == CANCELLED:
+                    continue
+                job.state = RUNNING
+                job.started_at = time.monotonic()
+            self._notify(job)
+            with instrumentation.span(
+                "job",
+                name=job.name,
+                priority=job.priority,
+                queued_ms=round((job.started_at - job.created_at) * 1000, 3),
+            ) as span:
+                _current.job = job
+                try:
+                    job.result = job.task()
+                    job.state = DONE
+                except OperationCancelled as exc:
+                    job.error = exc
+                    job.state = CANCELLED
+                except Exception as exc:
+                    job.error = exc
+                    job.state = FAILED
+                finally:
+                    _current.job = None
+                span.set(state=job.state)
+            job.finished_at = time.monotonic()
+            self.dispatch(lambda j=job: self._complete(j))
+
+    def _complete(self, job: Job) -> None:
+        if self.on_update is not None:
+            self.on_update(job)
+        if job.state == CANCELLED:
+            if job.on_cancel is not None:
+                job.on_cancel()
+        elif job.state == FAILED:
+            if job.on_error is not None:
+                job.on_error(job.error)
+        elif job.on_done is not None:
+            job.on_done(job.result)
+
+    def _notify(self, job: Job) -> None:
+        if self.on_update is not None:
+            self.dispatch(lambda j=job: self.on_update(j))
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from tkinter import ttk
+
+import job_scheduler
+
+
+class JobsTab(ttk.Frame):
+    """Вкладка с очередью фоновых заданий и их состоянием."""
+
+    def __init__(self, parent: ttk.Notebook, app, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.app = app
+        self.create_widgets()
+
+    def create_widgets(self) -> None:
+        header = ttk.Label(self, text="Очередь заданий", font=("Segoe UI", 14, "bold"), anchor="center")
+        header.pack(fill="x", pady=(0, 10))
+
+        list_frame = ttk.Frame(self)
+        list_frame.pack(fill="both", expand=True, padx=10)
+
+        columns = ("id", "name", "state", "duration")
+        self.jobs_view = ttk.Treeview(list_frame, columns=columns, show="headings")
+        self.jobs_view.heading("id", text="№")
+        self.jobs_view.heading("name", text="Задание")
+        self.jobs_view.heading("state", text="Состояние")
+        self.jobs_view.heading("duration", text="Время, с")
+        self.jobs_view.column("id", width=50, anchor="center")
+        self.jobs_view.column("state", width=120, anchor="center")
+        self.jobs_view.column("duration", width=90, anchor="center")
+
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.jobs_view.yview)
+        self.jobs_view.configure(yscrollcommand=scrollbar.set)
+        self.jobs_view.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        bottom_frame = ttk.Frame(self)
+        bottom_frame.pack(fill="x", padx=10, pady=5)
+
+        cancel_button = ttk.Button(
+            bottom_frame,
+            text="Отменить выбранное",
+            command=self.cancel_selected,
+            style="Danger.TButton",
+        )
+        cancel_button.pack(side="left")
+
+        flush_button = ttk.Button(
+            bottom_frame,
+            text="Напечатать пакеты сейчас",
+            command=self.flush_batches,
+        )
+        flush_button.pack(side="left", padx=(5, 0))
+
+        self.summary_label = ttk.Label(bottom_frame, text="", anchor="e")
+        self.summary_label.pack(side="right")
+
+        self.print_summary_label = ttk.Label(self, text="", anchor="e")
+        self.print_summary_label.pack(fill="x", padx=10, pady=(0, 5))
+
+    def cancel_selected(self) -> None:
+        selected = set(self.jobs_view.selection())
+        for job in self.app.scheduler.active_jobs():
+            if str(job.id) in selected:
+                self.app.scheduler.cancel(job)
+
+    def flush_batches(self) -> None:
+        if not self.app.order_batcher.flush_all():
+            self.app.update_status("Нет заказов, ожидающих пакетной печати.")
+        self.update_summary()
+
+    def update_job(self, job: job_scheduler.Job) -> None:
+        values = (
+            job.id,
+            job.name,
+            job_scheduler.STATE_LABELS[job.state],
+            "" if job.duration is None else f"{job.duration:.1f}",
+        )
+        item_id = str(job.id)
+        if self.jobs_view.exists(item_id):
+            self.jobs_view.item(item_id, values=values)
+        else:
+            self.jobs_view.insert("", "end", iid=item_id, values=values)
+            self._drop_forgotten_jobs()
+        self.update_summary()
+
+    def update_summary(self) -> None:
+        counts = self.app.scheduler.counts()
+        self.summary_label.config(
+            text=(
+                f"В очереди: {counts[job_scheduler.QUEUED]}   "
+                f"Выполняется: {counts[job_scheduler.RUNNING]}   "
+                f"Ошибок: {counts[job_scheduler.FAILED]}   "
+                f"Заказов в пакетах: {self.app.order_batcher.pending_orders()}"
+            )
+        )
+
+    def update_print_summary(self) -> None:
+        stats = self.app.print_spooler.metrics.snapshot()
+        self.print_summary_label.config(
+            text=(
+                f"Печать: отправлено {stats['sent']}, ошибок {stats['failed']}, "
+                f"повторов {stats['retries']}   "
+                f"Задержка p50/p95: {stats['latency_p50']:.2f}/{stats['latency_p95']:.2f} с"
+            )
+        )
+
+    def _drop_forgotten_jobs(self) -> None:
+        if len(self.jobs_view.get_children()) <= self.app.scheduler.history_size:
+            return
+        known = {str(job.id) for job in self.app.scheduler.jobs}
+        stale = [i for i in self.jobs_view.get_children() if i not in known]
+        if stale:
+            self.jobs_view.delete(*stale)
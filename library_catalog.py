@@ -0,0 +1,316 @@
+"""Постоянный каталог библиотеки этикеток в SQLite.
+
+Имена файлов разбираются на код OZN, описание товара и фасовку (``_50шт``,
+`` 100 шт``) и хранятся вместе с размером, mtime и SHA-256 содержимого.
+Каталог обновляется инкрементально: при синхронизации свежий снимок папки
+сравнивается с сохранённым, и заново разбираются и хэшируются только
+добавленные и изменённые файлы. Поэтому при запуске список библиотеки берётся
+из каталога, а не из полного сканирования папки.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import instrumentation
+from cancellation import CancelToken
+from library_watcher import LibraryChanges, Snapshot, diff_snapshots, take_snapshot
+from order_import import OZN_PATTERN, normalize_name
+from pdf_cache import sha256_file
+
+SCHEMA_VERSION = 2
+CATALOG_FILENAME = "catalog.sqlite3"
+
+# Фасовка: число перед «шт», отделённое от остального имени пробелом или «_»
+PACK_PATTERN = re.compile(r"(?:^|[\s_])(\d+)\s*шт\.?(?=$|[\s_])", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    library TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ozn TEXT,
+    description TEXT NOT NULL,
+    name_norm TEXT NOT NULL,
+    description_norm TEXT NOT NULL,
+    pack_size INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (library, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_ozn ON files (ozn);
+CREATE INDEX IF NOT EXISTS files_ext ON files (library, ext);
+CREATE INDEX IF NOT EXISTS files_pack ON files (library, pack_size);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+CREATE TABLE IF NOT EXISTS libraries (
+    library TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class ParsedName:
+    ozn: Optional[str]
+    description: str
+    pack_size: Optional[int]
+
+
+def parse_filename(filename: str) -> ParsedName:
+    """Разбирает имя файла этикетки на код OZN, описание и фасовку."""
+    stem = os.path.splitext(filename)[0]
+    ozn = None
+    match = OZN_PATTERN.match(stem)
+    if match:
+        ozn = match.group(0).upper()
+        stem = stem[match.end():]
+
+    pack_size = None
+    packs = list(PACK_PATTERN.finditer(stem))
+    if packs:
+        last = packs[-1]
+        pack_size = int(last.group(1))
+        stem = stem[: last.start()] + " " + stem[last.end():]
+    description = " ".join(stem.replace("_", " ").split())
+    return ParsedName(ozn, description, pack_size)
+
+
+def default_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, CATALOG_FILENAME)
+
+
+def _sha256(path: str) -> Optional[str]:
+    try:
+        return sha256_file(path)
+    except OSError:
+        return None
+
+
+class LibraryCatalog:
+    """Каталог файлов нескольких папок библиотеки.
+
+    Папка идентифицируется абсолютным путём. Соединение одно на каталог и
+    защищено блокировкой, поэтому синхронизация может идти в фоновом
+    задании, а поиск — из главного потока.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        try:
+            self._conn = self._open(db_path)
+        except sqlite3.DatabaseError:
+            # Каталог — производные данные: повреждённый файл просто строится заново
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(db_path + suffix)
+                except OSError:
+                    pass
+            self._conn = self._open(db_path)
+
+    @staticmethod
+    def _open(db_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS libraries;")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.commit()
+        except sqlite3.DatabaseError:
+            conn.close()
+            raise
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _library(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def is_synced(self, path: str) -> bool:
+        """Была ли папка хотя бы раз полностью синхронизирована."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM libraries WHERE library = ?", (self._library(path),)
+            ).fetchone()
+        return row is not None
+
+    def snapshot(self, path: str, extensions: tuple[str, ...] = ()) -> Snapshot:
+        """Сохранённый снимок папки в формате ``library_watcher``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, size, mtime_ns FROM files WHERE library = ?",
+                (self._library(path),),
+            ).fetchall()
+        return {
+            name: (size, mtime_ns)
+            for name, size, mtime_ns in rows
+            if not extensions or name.lower().endswith(extensions)
+        }
+
+    def names(self, path: str, extensions: tuple[str, ...] = ()) -> list[str]:
+        return sorted(self.snapshot(path, extensions))
+
+    def sync(
+        self,
+        path: str,
+        extensions: tuple[str, ...],
+        cancel_token: Optional[CancelToken] = None,
+        chunk_size: int = 500,
+    ) -> LibraryChanges:
+        """Приводит каталог в соответствие с папкой и возвращает изменения.
+
+        Записи фиксируются порциями по ``chunk_size`` файлов: прерванная
+        первая синхронизация большой папки продолжится с того же места.
+        """
+        library = self._library(path)
+        with instrumentation.span("catalog.sync") as sp:
+            current = take_snapshot(path, extensions)
+            changes = diff_snapshots(self.snapshot(path, extensions), current)
+            sp.set(
+                files=len(current),
+                added=len(changes.added),
+                removed=len(changes.removed),
+                modified=len(changes.modified),
+            )
+
+            if changes.removed:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "DELETE FROM files WHERE library = ? AND name = ?",
+                        [(library, name) for name in changes.removed],
+                    )
+
+            pending = changes.added + changes.modified
+            for start in range(0, len(pending), chunk_size):
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                rows = [
+                    self._row(library, path, name, current[name])
+                    for name in pending[start:start + chunk_size]
+                ]
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO libraries VALUES (?, ?)", (library, time.time())
+                )
+        return changes
+
+    @staticmethod
+    def _row(library: str, path: str, name: str, meta: tuple[int, int]) -> tuple:
+        parsed = parse_filename(name)
+        size, mtime_ns = meta
+        # Для индекса артикулов описание нормализуется вместе с фасовкой,
+        # как это делает ``SkuIndex`` при разборе имён
+        code_end = len(parsed.ozn) if parsed.ozn else len(name)
+        return (
+            library,
+            name,
+            parsed.ozn,
+            parsed.description,
+            normalize_name(name),
+            normalize_name(name[code_end:]),
+            parsed.pack_size,
+            size,
+            mtime_ns,
+            _sha256(os.path.join(path, name)),
+            os.path.splitext(name)[1].lower(),
+        )
+
+    def lookup(self, path: str, name: str) -> Optional[dict]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT name, ozn, description, pack_size, size, mtime_ns, sha256 "
+                "FROM files WHERE library = ? AND name = ?",
+                (self._library(path), name),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip((col[0] for col in cursor.description), row))
+
+    def find_by_code(self, ozn: str, path: Optional[str] = None) -> list[str]:
+        query = "SELECT name FROM files WHERE ozn = ?"
+        args: list = [ozn.upper()]
+        if path is not None:
+            query += " AND library = ?"
+            args.append(self._library(path))
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query + " ORDER BY name", args)]
+
+    def _where(self, path: str, extensions: tuple[str, ...]) -> tuple[str, list]:
+        """Условие по папке и, если заданы, расширениям файлов."""
+        query = "library = ?"
+        args: list = [self._library(path)]
+        if extensions:
+            query += f" AND ext IN ({', '.join('?' * len(extensions))})"
+            args.extend(ext.lower() for ext in extensions)
+        return query, args
+
+    def search(
+        self,
+        path: str,
+        text: str = "",
+        pack_size: Optional[int] = None,
+        limit: Optional[int] = None,
+        extensions: tuple[str, ...] = (),
+    ) -> list[str]:
+        """Имена файлов, содержащие все слова запроса.
+
+        Фасовка вида ``50шт`` в запросе фильтрует по колонке ``pack_size``,
+        а не по тексту имени. ``extensions`` ограничивает вид библиотеки
+        (изображения или PDF), если в одной папке лежат оба.
+        """
+        where, args = self._where(path, extensions)
+        query = f"SELECT name FROM files WHERE {where}"
+
+        words = normalize_name(text)
+        packs = list(PACK_PATTERN.finditer(words))
+        if packs:
+            last = packs[-1]
+            if pack_size is None:
+                pack_size = int(last.group(1))
+            words = words[: last.start()] + " " + words[last.end():]
+        if pack_size is not None:
+            query += " AND pack_size = ?"
+            args.append(pack_size)
+        # После нормализации в словах нет «%» и «_», экранировать их не нужно
+        for word in words.split():
+            query += " AND name_norm LIKE ?"
+            args.append(f"%{word}%")
+
+        query += " ORDER BY name"
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, args)]
+
+    def index_entries(
+        self, path: str, extensions: tuple[str, ...] = ()
+    ) -> Iterable[tuple[str, Optional[str], str, str]]:
+        """Строки для ``order_import.SkuIndex.from_entries``."""
+        where, args = self._where(path, extensions)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT name, ozn, name_norm, description_norm FROM files WHERE {where}", args
+            ).fetchall()
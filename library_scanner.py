@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from typing import Callable, Iterator, Optional
+
+import instrumentation
+import library_source
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+PDF_EXTENSIONS = (".pdf",)
+
+
+def iter_library_batches(
+    path: str, extensions: tuple[str, ...], batch_size: int = 500
+) -> Iterator[list[str]]:
+    """Перечисляет файлы библиотеки пакетами через ``os.scandir``.
+
+    Файлы выдаются в порядке каталога, без сортировки, чтобы первые результаты
+    появлялись сразу, не дожидаясь окончания обхода. Для ZIP-архива имена
+    берутся из его центрального каталога.
+    """
+    if library_source.is_archive(path):
+        names = library_source.archive_index(path).names(extensions)
+        for start in range(0, len(names), batch_size):
+            yield names[start:start + batch_size]
+        return
+
+    batch: list[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            batch.append(entry.name)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+class LibraryScanner:
+    """Фоновое сканирование папки с передачей результатов в UI пакетами.
+
+    Рабочий поток складывает пакеты в очередь, а главный поток Tk забирает их
+    по таймеру ``after`` и вызывает ``on_batch``. По окончании вызывается
+    ``on_done`` с ошибкой (``OSError``) или ``None``.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        widget,
+        path: str,
+        extensions: tuple[str, ...],
+        on_batch: Callable[[list[str]], None],
+        on_done: Callable[[Optional[Exception]], None],
+        batch_size: int = 500,
+        poll_ms: int = 50,
+    ):
+        self.widget = widget
+        self.path = path
+        self.extensions = extensions
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.batch_size = batch_size
+        self.poll_ms = poll_ms
+        self._queue: queue.Queue = queue.Queue()
+        self._cancelled = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._scan, daemon=True).start()
+        self.widget.after(self.poll_ms, self._poll)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _scan(self) -> None:
+        error: Optional[Exception] = None
+        with instrumentation.span("library.scan", path=self.path) as span:
+            found = 0
+            try:
+                for batch in iter_library_batches(
+                    self.path, self.extensions, self.batch_size
+                ):
+                    if self._cancelled.is_set():
+                        return
+                    found += len(batch)
+                    self._queue.put(batch)
+            except OSError as exc:
+                error = exc
+            span.set(files=found)
+        self._queue.put((self._DONE, error))
+
+    def _poll(self) -> None:
+        if self._cancelled.is_set():
+            return
+        # Ограничиваем работу за один тик, чтобы окно оставалось отзывчивым
+        for _ in range(8):
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, tuple) and item[0] is self._DONE:
+                self.on_done(item[1])
+                return
+            self.on_batch(item)
+        self.widget.after(self.poll_ms, self._poll)
@@ -0,0 +1,212 @@
+"""Файлы библиотеки из папки или прямо из ZIP-архива.
+
+Библиотеки раздаются на станции ZIP-архивами с десятками тысяч PNG и PDF;
+распаковка создаёт огромное число файлов и замедляет каждый обход папки.
+Поэтому вместо папки (``BarcodeDir``, ``PdfSourceDir``) можно указать путь к
+архиву. Файл внутри архива адресуется тем же путём, что и в папке:
+``os.path.join(архив, имя)``, а функции этого модуля (``exists``,
+``stat``, ``open_file``, ``open_pdf``) работают с обоими видами путей.
+
+Центральный каталог архива читается один раз и хранится в памяти, пока не
+изменятся размер или mtime архива; устаревший индекс сразу закрывается, а
+его уже открытые потоки дочитываются до конца (``zipfile`` держит файл
+открытым, пока жив хотя бы один поток). Записи читаются из архива потоком,
+без извлечения на диск. Вложенные папки архива не различаются: файл доступен
+по имени, как в плоской папке библиотеки.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import zipfile
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional
+
+ARCHIVE_EXTENSIONS = (".zip",)
+
+# Сколько секунд индекс архива считается актуальным без повторного stat
+REVALIDATE_AFTER = 2.0
+
+_lock = threading.Lock()
+_indexes: Dict[str, "ArchiveIndex"] = {}
+
+
+def _entry_name(info: zipfile.ZipInfo) -> str:
+    name = info.filename.rsplit("/", 1)[-1]
+    if info.flag_bits & 0x800:
+        return name
+    # Без флага UTF-8 zipfile декодирует имя как cp437; «Сжатая папка»
+    # Windows пишет имена в кодировке OEM (cp866 для русской локали)
+    raw = name.encode("cp437")
+    for encoding in ("utf-8", "cp866"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return name
+
+
+class ArchiveIndex:
+    """Центральный каталог одного архива: имя файла -> запись ZIP."""
+
+    def __init__(self, path: str):
+        st = os.stat(path)
+        self.path = path
+        self.stat = (st.st_size, st.st_mtime_ns)
+        self.checked = time.monotonic()
+        self._lock = threading.Lock()
+        self.closed = False
+        try:
+            self._zip = zipfile.ZipFile(path)
+        except zipfile.BadZipFile as exc:
+            raise OSError(f"Не удалось прочитать архив '{path}': {exc}") from exc
+        self.entries: Dict[str, zipfile.ZipInfo] = {}
+        for info in self._zip.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            self.entries.setdefault(_entry_name(info), info)
+
+    def _info(self, name: str) -> zipfile.ZipInfo:
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise FileNotFoundError(f"Файл '{name}' не найден в архиве '{self.path}'") from None
+
+    def names(self, extensions: tuple[str, ...] = ()) -> list[str]:
+        return [
+            name for name in self.entries if not extensions or name.lower().endswith(extensions)
+        ]
+
+    def entry_stat(self, name: str) -> tuple[int, int]:
+        """``(размер, mtime в наносекундах)`` записи, как у файла в папке."""
+        info = self._info(name)
+        mtime = datetime(*info.date_time).timestamp()
+        return info.file_size, int(mtime * 1_000_000_000)
+
+    def snapshot(self, extensions: tuple[str, ...] = ()) -> Dict[str, tuple[int, int]]:
+        return {name: self.entry_stat(name) for name in self.names(extensions)}
+
+    def open(self, name: str) -> BinaryIO:
+        """Поток для чтения записи; распаковывается по мере чтения.
+
+        Индекс, заменённый новым, пока его держал вызывающий поток, читает
+        запись из актуального индекса архива.
+        """
+        with self._lock:
+            if not self.closed:
+                return self._zip.open(self._info(name))
+        return archive_index(self.path).open(name)
+
+    def close(self) -> None:
+        """Закрывает архив; открытые потоки записей продолжают читаться."""
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._zip.close()
+
+
+def _key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_archive(path: str) -> bool:
+    """Указан ли вместо папки библиотеки ZIP-архив."""
+    if not path.lower().endswith(ARCHIVE_EXTENSIONS):
+        return False
+    with _lock:
+        if _key(path) in _indexes:
+            return True
+    return os.path.isfile(path)
+
+
+def archive_index(path: str) -> ArchiveIndex:
+    """Индекс архива из памяти; перечитывается, если архив изменился.
+
+    Битый архив даёт ``OSError``, как недоступная папка.
+    """
+    key = _key(path)
+    now = time.monotonic()
+    with _lock:
+        index = _indexes.get(key)
+    if index is not None:
+        if now - index.checked < REVALIDATE_AFTER:
+            return index
+        try:
+            st = os.stat(path)
+        except OSError:
+            with _lock:
+                if _indexes.get(key) is index:
+                    del _indexes[key]
+            index.close()
+            raise
+        if (st.st_size, st.st_mtime_ns) == index.stat:
+            index.checked = now
+            return index
+
+    index = ArchiveIndex(path)
+    with _lock:
+        previous = _indexes.get(key)
+        _indexes[key] = index
+    if previous is not None and previous is not index:
+        previous.close()
+    return index
+
+
+def close_all() -> None:
+    """Закрывает все открытые архивы (при выходе из программы)."""
+    with _lock:
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.close()
+
+
+def _split(path: str) -> Optional[tuple[ArchiveIndex, str]]:
+    """Индекс архива и имя записи, если ``path`` указывает внутрь архива."""
+    parent, name = os.path.split(path)
+    if not is_archive(parent):
+        return None
+    return archive_index(parent), name
+
+
+def exists(path: str) -> bool:
+    try:
+        entry = _split(path)
+    except OSError:
+        return False
+    if entry is None:
+        return os.path.exists(path)
+    index, name = entry
+    return name in index.entries
+
+
+def stat(path: str) -> tuple[int, int]:
+    """``(размер, mtime_ns)`` файла в папке или записи архива; ``OSError``, если его нет."""
+    entry = _split(path)
+    if entry is None:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    index, name = entry
+    return index.entry_stat(name)
+
+
+def open_file(path: str) -> BinaryIO:
+    """Открывает файл библиотеки для чтения в двоичном режиме."""
+    entry = _split(path)
+    if entry is None:
+        return open(path, "rb")
+    index, name = entry
+    return index.open(name)
+
+
+def open_pdf(path: str):
+    """Документ PyMuPDF из папки или архива (запись читается в память)."""
+    import fitz  # PyMuPDF
+
+    entry = _split(path)
+    if entry is None:
+        return fitz.open(path)
+    index, name = entry
+    with index.open(name) as f:
+        return fitz.open(stream=f.read(), filetype="pdf")
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Union
+
+import library_source
+
+# Снимок папки: имя файла -> (размер, mtime в наносекундах) или None,
+# если метаданные ещё не известны (файл получен от сканера без stat)
+Snapshot = Dict[str, Optional[tuple[int, int]]]
+
+DEFAULT_INTERVAL_MS = 5000
+
+
+@dataclass
+class LibraryChanges:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+def take_snapshot(path: str, extensions: tuple[str, ...]) -> Snapshot:
+    if library_source.is_archive(path):
+        # Пока архив не изменился, снимок строится из индекса в памяти
+        return dict(library_source.archive_index(path).snapshot(extensions))
+    snapshot: Snapshot = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+    return snapshot
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> LibraryChanges:
+    changes = LibraryChanges()
+    for name, meta in new.items():
+        if name not in old:
+            changes.added.append(name)
+        elif old[name] is not None and old[name] != meta:
+            changes.modified.append(name)
+    changes.removed = [name for name in old if name not in new]
+    changes.added.sort()
+    changes.modified.sort()
+    changes.removed.sort()
+    return changes
+
+
+@dataclass
+class _Watch:
+    path: str
+    extensions: tuple[str, ...]
+    on_changes: Callable[[LibraryChanges], None]
+    snapshot: Snapshot
+
+
+class LibraryWatcher:
+    """Отслеживает изменения в папках библиотеки опросом снимков.
+
+    Опрос выполняется в фоновом потоке и работает на любой файловой системе,
+    включая сетевые папки. События передаются в главный поток Tk через
+    очередь, которую разбирает таймер ``after``.
+    """
+
+    def __init__(self, widget, interval_ms: int = DEFAULT_INTERVAL_MS, poll_ms: int = 200):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.poll_ms = poll_ms
+        self._watches: Dict[str, _Watch] = {}
+        self._lock = threading.Lock()
+        self._events: queue.Queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(
+        self,
+        key: str,
+        path: str,
+        extensions: tuple[str, ...],
+        on_changes: Callable[[LibraryChanges], None],
+        known: Union[Iterable[str], Snapshot] = (),
+    ) -> None:
+        """Начинает наблюдение за папкой.
+
+        ``known`` — уже загруженные в UI имена файлов: они становятся базовым
+        снимком, поэтому файлы, появившиеся после сканирования, не потеряются.
+        Если передан снимок с метаданными (например, из каталога), первый же
+        опрос сообщит и об изменённых файлах.
+        """
+        baseline = dict(known) if isinstance(known, dict) else dict.fromkeys(known)
+        with self._lock:
+            self._watches[key] = _Watch(path, extensions, on_changes, baseline)
+
+    def unwatch(self, key: str) -> None:
+        with self._lock:
+            self._watches.pop(key, None)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.widget.after(self.poll_ms, self._dispatch)
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """Останавливает опрос; ждёт завершения потока не дольше ``timeout`` секунд."""
+        self._stopped.set()
+        with self._lock:
+            self._watches.clear()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def check_now(self) -> None:
+        """Выполняет один проход опроса синхронно (в текущем потоке)."""
+        with self._lock:
+            watches = list(self._watches.items())
+        for key, watch in watches:
+            try:
+                snapshot = take_snapshot(watch.path, watch.extensions)
+            except OSError:
+                continue
+            changes = diff_snapshots(watch.snapshot, snapshot)
+            watch.snapshot = snapshot
+            if changes:
+                self._events.put((key, watch, changes))
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval_ms / 1000):
+            self.check_now()
+
+    def _dispatch(self) -> None:
+        if self._stopped.is_set():
+            return
+        while True:
+            try:
+                key, watch, changes = self._events.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                current = self._watches.get(key)
+            # События от папки, которую уже перестали отслеживать, отбрасываются
+            if current is watch:
+                watch.on_changes(changes)
+        self.widget.after(self.poll_ms, self._dispatch)
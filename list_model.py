@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+DELETE_MARK = "❌"
+
+
+class QuantityListModel:
+    """Упорядоченный список «файл → количество», привязанный к Treeview.
+
+    Модель хранит устойчивое соответствие имени файла и идентификатора строки
+    и применяет к Treeview только минимальные изменения: вставку, удаление,
+    перемещение и обновление отдельных строк. Итоговое количество
+    поддерживается инкрементально.
+
+    ``on_total_changed`` вызывается с новым итогом, ``on_order_changed`` — после
+    изменения порядка строк, когда итог остался прежним.
+    """
+
+    def __init__(self, view, on_total_changed=None, on_order_changed=None):
+        self.view = view
+        self.on_total_changed = on_total_changed
+        self.on_order_changed = on_order_changed
+        self._items: Dict[str, int] = {}
+        self._item_ids: Dict[str, str] = {}
+        self._filenames: Dict[str, str] = {}
+        self._order_dirty = False
+        self.total = 0
+
+    @property
+    def items(self) -> Dict[str, int]:
+        """Текущий список в порядке отображения (только для чтения)."""
+        return self._items
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def filename_of(self, item_id: str) -> Optional[str]:
+        return self._filenames.get(item_id)
+
+    def item_id_of(self, filename: str) -> Optional[str]:
+        return self._item_ids.get(filename)
+
+    def set(self, filename: str, quantity: int) -> None:
+        """Добавляет позицию в конец списка или обновляет её количество на месте."""
+        old = self._items.get(filename)
+        if old is None:
+            self._insert(filename, quantity)
+        elif old != quantity:
+            self._items[filename] = quantity
+            self.view.item(
+                self._item_ids[filename], values=(filename, quantity, DELETE_MARK)
+            )
+        else:
+            return
+        self._change_total(quantity - (old or 0))
+
+    def add_missing(self, filenames: Iterable[str], quantity: int = 1) -> int:
+        """Добавляет отсутствующие в списке файлы, возвращает число добавленных."""
+        added = 0
+        for filename in filenames:
+            if filename not in self._items:
+                self._insert(filename, quantity)
+                added += 1
+        if added:
+            self._change_total(added * quantity)
+        return added
+
+    def remove(self, filename: str) -> bool:
+        quantity = self._items.pop(filename, None)
+        if quantity is None:
+            return False
+        item_id = self._item_ids.pop(filename)
+        del self._filenames[item_id]
+        self.view.delete(item_id)
+        self._change_total(-quantity)
+        return True
+
+    def clear(self) -> None:
+        if self._item_ids:
+            self.view.delete(*self._item_ids.values())
+        self._items.clear()
+        self._item_ids.clear()
+        self._filenames.clear()
+        self._order_dirty = False
+        self._change_total(-self.total)
+
+    def replace(self, items: Dict[str, int]) -> None:
+        """Приводит список к ``items``, затрагивая только изменившиеся строки."""
+        for filename in [f for f in self._items if f not in items]:
+            self.remove(filename)
+        for filename, quantity in items.items():
+            self.set(filename, quantity)
+
+        if list(self._items) != list(items):
+            # Строки до index уже стоят как в items, остальные — в прежнем
+            # порядке, поэтому первая ещё не поставленная строка и есть строка
+            # на позиции index: обходится без view.index для каждой строки
+            rows = self.view.get_children()
+            placed = set()
+            cursor = 0
+            for index, filename in enumerate(items):
+                item_id = self._item_ids[filename]
+                while rows[cursor] in placed:
+                    cursor += 1
+                if rows[cursor] == item_id:
+                    cursor += 1
+                else:
+                    self.view.move(item_id, "", index)
+                placed.add(item_id)
+            self._items = {f: self._items[f] for f in items}
+            self._order_changed()
+
+    def move(self, item_id: str, index: int) -> None:
+        """Перемещает строку в Treeview; порядок фиксируется в ``commit_order``."""
+        if self.view.index(item_id) != index:
+            self.view.move(item_id, "", index)
+            self._order_dirty = True
+
+    def commit_order(self) -> bool:
+        """Синхронизирует порядок модели с Treeview после перетаскивания."""
+        if not self._order_dirty:
+            return False
+        self._order_dirty = False
+        self._items = {
+            self._filenames[item_id]: self._items[self._filenames[item_id]]
+            for item_id in self.view.get_children()
+        }
+        self._order_changed()
+        return True
+
+    def _insert(self, filename: str, quantity: int) -> None:
+        item_id = self.view.insert(
+            "", "end", values=(filename, quantity, DELETE_MARK)
+        )
+        self._items[filename] = quantity
+        self._item_ids[filename] = item_id
+        self._filenames[item_id] = filename
+
+    def _change_total(self, delta: int) -> None:
+        if not delta:
+            return
+        self.total += delta
+        if self.on_total_changed is not None:
+            self.on_total_changed(self.total)
+
+    def _order_changed(self) -> None:
+        if self.on_order_changed is not None:
+            self.on_order_changed()
+
+
+def merge_sorted(
+    existing: list[str], added: Iterable[str]
+) -> tuple[list[str], list[tuple[str, Optional[str]]]]:
+    """Сливает отсортированный список с новыми именами за один проход.
+
+    Возвращает итоговый порядок и для каждого нового имени (по возрастанию)
+    уже существующее имя, перед которым его нужно вставить; ``None`` — в конец.
+    """
+    known = set(existing)
+    new = sorted({name for name in added if name not in known})
+    order: list[str] = []
+    anchors: list[tuple[str, Optional[str]]] = []
+    i = 0
+    for name in new:
+        while i < len(existing) and existing[i] <= name:
+            order.append(existing[i])
+            i += 1
+        order.append(name)
+        anchors.append((name, existing[i] if i < len(existing) else None))
+    order.extend(existing[i:])
+    return order, anchors
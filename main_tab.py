@@ -1,16 +1,63 @@
 from __future__ import annotations
 
+import bisect
 import os
-import tempfile
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from tkinter import filedialog, messagebox, ttk
-from typing import Dict, Optional
-
-import win32api
-from PIL import Image, ImageTk
-
+from typing import TYPE_CHECKING, Dict, Optional
+
+import cancellation
+import config_manager
+import job_scheduler
+import library_scanner
+import library_source
+import list_model
+import order_batcher
+import output_parts
+import pdf_cache
 import pdf_generator
 import preview_window
+import sheet_layout
+import vector_labels
+
+if TYPE_CHECKING:
+    from PIL import ImageTk
+
+PRINT_TITLE = "Печать штрих-кодов"
+
+
+def read_label_aspect(path: str) -> Optional[float]:
+    """Отношение высоты этикетки к ширине по заголовку изображения; ``None`` — не читается."""
+    from PIL import Image
+
+    try:
+        with library_source.open_file(path) as f, Image.open(f) as img:
+            width, height = img.size
+    except (OSError, Image.DecompressionBombError):
+        return None
+    return height / width if width else None
+
+
+@dataclass
+class _GeneratedPdf:
+    """Последний созданный цельный PDF: к нему можно дописать новые этикетки."""
+
+    path: str
+    barcode_dir: str
+    page_settings: dict
+    layout: sheet_layout.SheetLayout
+    # (размер, mtime_ns) файла сразу после записи: файл не меняли со стороны
+    stat: tuple[int, int]
+
+
+def _file_stat(path: str) -> Optional[tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
 
 
 class MainTab(ttk.Frame):
@@ -19,9 +66,17 @@ class MainTab(ttk.Frame):
         super().__init__(parent)
         self.app = app
 
-        self.selected_for_generation: Dict[str, int] = {}
         self.all_barcode_files: list[str] = []
         self.preview_image: Optional[ImageTk.PhotoImage] = None
+        self.preview_filename: Optional[str] = None
+        # Пропорции этикеток для оценки листов; None — файл не читается
+        self._aspects: Dict[str, Optional[float]] = {}
+        # Файлы, заголовки которых сейчас читает фоновое задание
+        self._aspects_pending: set[str] = set()
+        # Меняется при смене папки: результаты старого чтения отбрасываются
+        self._aspects_epoch = 0
+        self._aspect_reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aspects")
+        self._last_generated: Optional[_GeneratedPdf] = None
 
         self.create_widgets()
 
@@ -98,6 +153,12 @@ class MainTab(ttk.Frame):
         self.generation_list_view.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
+        self.generation_list = list_model.QuantityListModel(
+            self.generation_list_view,
+            on_total_changed=self.update_total_count,
+            on_order_changed=self.update_total_count,
+        )
+
         total_frame = ttk.Frame(list_frame)
         total_frame.pack(fill="x", side="bottom", pady=(5, 0))
         self.total_count_label = ttk.Label(total_frame, text="Всего для печати: 0")
@@ -112,6 +173,13 @@ class MainTab(ttk.Frame):
         )
         self.generation_list_view.bind("<Double-1>", self.edit_list_item)
 
+        import_button = ttk.Button(
+            left_panel,
+            text="Импорт CSV...",
+            command=self.import_csv,
+        )
+        import_button.pack(pady=(5, 0))
+
         clear_button = ttk.Button(
             left_panel,
             text="Убрать все",
@@ -155,27 +223,77 @@ class MainTab(ttk.Frame):
         )
         self.preview_label.pack(fill="both", expand=True)
 
+    @property
+    def selected_for_generation(self) -> Dict[str, int]:
+        return self.generation_list.items
+
     def set_barcodes(self, files: list[str]) -> None:
         self.all_barcode_files = files
+        self._aspects.clear()
+        self._aspects_pending.clear()
+        self._aspects_epoch += 1
+        self._last_generated = None
         self.barcode_selector["values"] = files
         if files:
             self.barcode_selector.current(0)
             self.show_preview(self.barcode_selector.get())
+        else:
+            self.show_preview(None)
+
+    def append_barcodes(self, files: list[str]) -> None:
+        """Добавляет очередной пакет файлов, пришедший от фонового сканирования."""
+        self.all_barcode_files.extend(files)
+
+    def apply_library_changes(self, changes) -> None:
+        """Применяет изменения папки со штрих-кодами, не трогая список для генерации."""
+        if changes.removed:
+            removed = set(changes.removed)
+            self.all_barcode_files = [
+                f for f in self.all_barcode_files if f not in removed
+            ]
+        for filename in changes.added:
+            bisect.insort(self.all_barcode_files, filename)
+        self.filter_barcodes()
+
+        touched = (*changes.added, *changes.removed, *changes.modified)
+        changed = [f for f in touched if f in self._aspects]
+        for filename in changed:
+            del self._aspects[filename]
+        if any(f in self._aspects_pending for f in touched):
+            # Идущее чтение могло застать старую версию файла
+            self._aspects_pending.clear()
+            self._aspects_epoch += 1
+            changed.extend(touched)
+        if self._last_generated is not None and any(
+            p.filename in changes.modified or p.filename in changes.removed
+            for p in self._last_generated.layout.placements
+        ):
+            self._last_generated = None
+        if any(f in self.generation_list for f in changed):
+            self.update_total_count()
+
+        if self.preview_filename in changes.removed or self.preview_filename in changes.modified:
+            self.show_preview(self.preview_filename)
 
     def show_preview(self, filename: Optional[str]) -> None:
+        self.preview_filename = filename
         if not filename:
             self.preview_label.config(image="", text="Выберите штрих-код")
             self.preview_image = None
             return
 
-        filepath = os.path.join(self.app.cfg.barcode_dir, filename)
-        if not os.path.exists(filepath):
+        filepath = self.app.library_path(self.app.cfg.barcode_dir, filename)
+        if not library_source.exists(filepath):
             self.preview_label.config(image="", text="Файл не найден")
             self.preview_image = None
             return
 
+        from PIL import Image, ImageTk
+
         try:
-            img = Image.open(filepath)
+            with library_source.open_file(filepath) as f:
+                img = Image.open(f)
+                img.load()
             max_width = 250
             w_percent = max_width / float(img.size[0])
             h_size = int((float(img.size[1]) * float(w_percent)))
@@ -196,8 +314,7 @@ class MainTab(ttk.Frame):
         selected_items = self.generation_list_view.selection()
         if not selected_items:
             return
-        item_id = selected_items[0]
-        filename = self.generation_list_view.item(item_id, "values")[0]
+        filename = self.generation_list.filename_of(selected_items[0])
         self.show_preview(filename)
 
     def filter_barcodes(self, event=None):
@@ -205,8 +322,12 @@ class MainTab(ttk.Frame):
         if not search_term:
             self.barcode_selector["values"] = self.all_barcode_files
             return
-        filtered = [f for f in self.all_barcode_files if search_term in f.lower()]
-        self.barcode_selector["values"] = filtered
+        self.barcode_selector["values"] = self.app.search_library(
+            self.app.cfg.barcode_dir,
+            search_term,
+            self.all_barcode_files,
+            library_scanner.IMAGE_EXTENSIONS,
+        )
 
     def add_to_list(self):
         filename = self.barcode_selector.get()
@@ -233,8 +354,7 @@ class MainTab(ttk.Frame):
             )
             return
 
-        self.selected_for_generation[filename] = quantity
-        self.update_generation_list_view()
+        self.generation_list.set(filename, quantity)
         self.app.update_status(f"Добавлен: {filename}")
 
         self.quantity_input.delete(0, tk.END)
@@ -243,40 +363,111 @@ class MainTab(ttk.Frame):
         self.barcode_selector.focus_set()
 
     def add_barcodes_from_selection(self, checkbox_vars: dict) -> int:
-        added_count = 0
+        checked = []
         for filename, var in checkbox_vars.items():
             if var.get() == 1:
-                if filename not in self.selected_for_generation:
-                    self.selected_for_generation[filename] = 1
-                    added_count += 1
+                checked.append(filename)
                 var.set(0)
-        if added_count > 0:
-            self.update_generation_list_view()
-        return added_count
+        return self.generation_list.add_missing(checked)
 
     def switch_to_main_tab(self):
         self.app.notebook.select(self)
 
-    def update_total_count(self):
-        total = sum(self.selected_for_generation.values())
-        self.total_count_label.config(text=f"Всего для печати: {total}")
-
-    def update_generation_list_view(self):
-        for i in self.generation_list_view.get_children():
-            self.generation_list_view.delete(i)
-
-        for filename, quantity in self.selected_for_generation.items():
-            self.generation_list_view.insert(
-                "", tk.END, values=(filename, quantity, "❌")
-            )
+    def update_total_count(self, total: Optional[int] = None):
+        if total is None:
+            total = self.generation_list.total
+        text = f"Всего для печати: {total}"
+        pages = self.estimate_pages()
+        if pages is None:
+            text += " · Листов: считается…"
+        elif pages:
+            text += f" · Листов: {pages}"
+        self.total_count_label.config(text=text)
+
+    def estimate_pages(self) -> Optional[int]:
+        """Сколько листов займёт текущий список, без генерации PDF.
+
+        Пропорции читаются из заголовков изображений фоновым заданием один
+        раз и запоминаются; пока они читаются, возвращается ``None``.
+        Отсутствующие файлы пропускаются, как при генерации.
+        """
+        page_settings = self.app.cfg.page_settings.to_dict()
+        vector = page_settings.get("source_type") == vector_labels.SOURCE_VECTOR
+        groups = []
+        aspects = {}
+        unknown = []
+        for filename, quantity in self.generation_list.items.items():
+            if vector:
+                aspect = (
+                    vector_labels.LABEL_ASPECT
+                    if vector_labels.code_from_filename(filename)
+                    else None
+                )
+            elif filename not in self._aspects:
+                unknown.append(filename)
+                continue
+            else:
+                aspect = self._aspects[filename]
+            if aspect is not None:
+                groups.append((filename, quantity))
+                aspects[filename] = aspect
+        if unknown:
+            self._read_aspects(unknown)
+            return None
+        return sheet_layout.estimate_pages(groups, aspects, page_settings)
+
+    def _read_aspects(self, filenames: list[str]) -> None:
+        """Читает пропорции этикеток в отдельном потоке и обновляет оценку листов.
+
+        Заголовки читаются прямо из папки библиотеки: зеркало на главном
+        потоке не трогается, а сетевое чтение не блокирует интерфейс.
+        """
+        filenames = [f for f in filenames if f not in self._aspects_pending]
+        if not filenames:
+            return
+        self._aspects_pending.update(filenames)
+        barcode_dir = self.app.cfg.barcode_dir
+        epoch = self._aspects_epoch
 
-        self.update_total_count()
+        def task():
+            return {f: read_label_aspect(os.path.join(barcode_dir, f)) for f in filenames}
+
+        def finished(aspects: Dict[str, Optional[float]]) -> None:
+            if epoch != self._aspects_epoch:
+                return
+            self._aspects_pending.difference_update(filenames)
+            self._aspects.update(aspects)
+            self.update_total_count()
+
+        def deliver(future) -> None:
+            try:
+                aspects = future.result()
+            except Exception:
+                aspects = dict.fromkeys(filenames)
+            try:
+                self.after(0, lambda: finished(aspects))
+            except (RuntimeError, tk.TclError):
+                pass  # окно уже закрыто
+
+        # Свой поток: общий планировщик может быть надолго занят синхронизацией
+        # каталога и зеркала, а чтение заголовков занимает миллисекунды
+        self._aspect_reader.submit(task).add_done_callback(deliver)
+
+    def shutdown(self) -> None:
+        """Останавливает поток чтения пропорций (при закрытии окна)."""
+        self._aspect_reader.shutdown(wait=False, cancel_futures=True)
+
+    def import_csv(self):
+        self.app.import_order_csv(
+            self.app.cfg.barcode_dir,
+            library_scanner.IMAGE_EXTENSIONS,
+            self.all_barcode_files, self.generation_list, "Импорт заказа: печать с листа"
+        )
 
     def clear_list(self, silent: bool = False):
-        if not self.selected_for_generation:
+        if not self.generation_list:
             return
-        self.selected_for_generation.clear()
-        self.update_generation_list_view()
+        self.generation_list.clear()
         if not silent:
             self.app.update_status("Список очищен. Готово")
         self.show_preview(None)
@@ -285,11 +476,9 @@ class MainTab(ttk.Frame):
         column_id = self.generation_list_view.identify_column(event.x)
         if column_id == "#3":
             item_id = self.generation_list_view.identify_row(event.y)
-            if item_id:
-                filename = self.generation_list_view.item(item_id, "values")[0]
-                if filename in self.selected_for_generation:
-                    del self.selected_for_generation[filename]
-                    self.update_generation_list_view()
+            filename = self.generation_list.filename_of(item_id)
+            if filename:
+                self.generation_list.remove(filename)
 
     def edit_list_item(self, event):
         item_id = self.generation_list_view.identify_row(event.y)
@@ -323,14 +512,12 @@ class MainTab(ttk.Frame):
             if new_quantity <= 0:
                 raise ValueError("Количество должно быть положительным")
 
-            filename = self.generation_list_view.item(item_id, "values")[0]
+            filename = self.generation_list.filename_of(item_id)
 
-            if filename in self.selected_for_generation:
-                self.selected_for_generation[filename] = new_quantity
+            if filename in self.generation_list:
+                self.generation_list.set(filename, new_quantity)
                 self.app.update_status(f"Количество для '{filename}' обновлено")
 
-            self.update_generation_list_view()
-
         except ValueError:
             messagebox.showerror(
                 "Ошибка ввода", "Количество должно быть целым положительным числом."
@@ -355,25 +542,17 @@ class MainTab(ttk.Frame):
 
         moveto_item = self.generation_list_view.identify_row(event.y)
         if moveto_item:
-            self.generation_list_view.move(
+            self.generation_list.move(
                 self.generation_list_view.selection()[0],
-                "",
                 self.generation_list_view.index(moveto_item),
             )
 
     def on_drag_release(self, event):
-        new_order = self.generation_list_view.get_children()
-        new_selected = {
-            self.generation_list_view.item(item, "values")[0]: self.selected_for_generation[
-                self.generation_list_view.item(item, "values")[0]
-            ]
-            for item in new_order
-        }
-        self.selected_for_generation = new_selected
-        self.app.update_status("Порядок элементов изменен")
+        if self.generation_list.commit_order():
+            self.app.update_status("Порядок элементов изменен")
 
     def process_generation(self):
-        selected_barcodes = self.selected_for_generation
+        selected_barcodes = dict(self.selected_for_generation)
 
         if not selected_barcodes:
             messagebox.showwarning(
@@ -392,67 +571,192 @@ class MainTab(ttk.Frame):
             self.app.update_status("Генерация отменена. Готово")
             return
 
+        token = cancellation.CancelToken()
+
+        barcode_dir = self.app.cfg.barcode_dir
+        page_settings = self.app.cfg.page_settings.to_dict()
+        max_pages, max_labels = self._split_limits()
+
+        previous = self._appendable(file_path, barcode_dir, page_settings)
+        self._last_generated = None
+
         def task():
+            source_dir = self.app.readable_dir(barcode_dir, selected_barcodes, token)
+            layout = pdf_generator.plan_sheet(selected_barcodes, source_dir, page_settings)
+            title = os.path.splitext(os.path.basename(file_path))[0]
+            progress = self.app.make_progress_callback("Генерация PDF")
+            split = len(sheet_layout.split_layout(layout, max_pages, max_labels)) > 1
+            if previous is not None and not split:
+                # Тот же файл после добавления этикеток: дописываются только
+                # изменившиеся страницы
+                kept = pdf_generator.append_pdf_from_barcodes(
+                    selected_barcodes,
+                    source_dir,
+                    file_path,
+                    previous.layout,
+                    title=title,
+                    page_settings=page_settings,
+                    progress=progress,
+                    cancel_token=token,
+                    layout=layout,
+                )
+                if kept is not None:
+                    return file_path, layout, None, kept
+            if split:
+                parts = output_parts.create_pdf_parts(
+                    selected_barcodes,
+                    source_dir,
+                    file_path,
+                    title=title,
+                    page_settings=page_settings,
+                    max_pages=max_pages,
+                    max_labels=max_labels,
+                    progress=progress,
+                    cancel_token=token,
+                    layout=layout,
+                )
+                return file_path, layout, parts, None
             pdf_generator.create_pdf_from_barcodes(
                 selected_barcodes,
-                self.app.cfg.barcode_dir,
+                source_dir,
                 file_path,
-                title=os.path.splitext(os.path.basename(file_path))[0],
-                page_settings=self.app.cfg.page_settings.to_dict(),
+                title=title,
+                page_settings=page_settings,
+                progress=progress,
+                cancel_token=token,
+                layout=layout,
             )
-            return file_path
+            return file_path, layout, None, None
 
         def on_done(result):
-            messagebox.showinfo(
-                "Готово",
-                f"PDF-файл успешно создан и сохранен как:\n{os.path.basename(result)}",
-            )
-            self.app.update_status(
-                f"PDF-файл успешно создан: {os.path.basename(result)}"
-            )
+            path, layout, parts, kept = result
+            if not parts:
+                stat = _file_stat(path)
+                if stat is not None:
+                    self._last_generated = _GeneratedPdf(
+                        path, barcode_dir, page_settings, layout, stat
+                    )
+            if parts:
+                saved = (
+                    f"Задание разбито на {len(parts)} ч.: {parts[0].file} … {parts[-1].file}\n"
+                    f"Манифест: {os.path.basename(output_parts.manifest_path(path))}"
+                )
+                short = f"PDF-файл создан частями: {len(parts)}"
+            elif kept is not None:
+                saved = (
+                    f"PDF-файл дополнен: {os.path.basename(path)}\n"
+                    f"Перерисовано страниц: {layout.pages - kept} из {layout.pages}"
+                )
+                short = f"PDF-файл дополнен: {os.path.basename(path)}"
+            else:
+                saved = f"PDF-файл успешно создан и сохранен как:\n{os.path.basename(path)}"
+                short = f"PDF-файл успешно создан: {os.path.basename(path)}"
+            messagebox.showinfo("Готово", f"{saved}\n\n{layout.report()}")
+            self.app.update_status(f"{short}. {layout.report()}")
 
         def on_error(error):
             messagebox.showerror("Ошибка генерации", f"Произошла ошибка:\n{error}")
             self.app.update_status("Ошибка при генерации PDF. Готово")
 
-        self.app._run_task(task, on_done, on_error, "Генерация PDF...")
+        self.app._run_task(
+            task,
+            on_done,
+            on_error,
+            "Генерация PDF...",
+            job_scheduler.PRIORITY_GENERATE,
+            cancel_token=token,
+        )
+
+    def _appendable(
+        self, file_path: str, barcode_dir: str, page_settings: dict
+    ) -> Optional[_GeneratedPdf]:
+        """Прошлый результат, если новый документ пишется поверх него без изменений извне."""
+        previous = self._last_generated
+        if (
+            previous is None
+            or os.path.normcase(os.path.abspath(previous.path))
+            != os.path.normcase(os.path.abspath(file_path))
+            or previous.barcode_dir != barcode_dir
+            or previous.page_settings != page_settings
+            or _file_stat(file_path) != previous.stat
+        ):
+            return None
+        return previous
+
+    def _split_limits(self) -> tuple[int, int]:
+        settings = self.app.cfg.print_settings
+        return settings.split_max_pages, settings.split_max_labels
 
     def process_preview(self):
-        selected_barcodes = self.selected_for_generation
+        selected_barcodes = dict(self.selected_for_generation)
         if not selected_barcodes:
             messagebox.showwarning("Внимание", "Список для генерации пуст.")
             return
 
-        temp_fd, temp_file_path = tempfile.mkstemp(suffix=".pdf")
-        os.close(temp_fd)
+        page_settings = self.app.cfg.page_settings.to_dict()
+        barcode_dir = self.app.cfg.barcode_dir
+        mode = self.app.cfg.preview_mode
+        if mode not in config_manager.PREVIEW_MODES:
+            mode = config_manager.DEFAULT_PREVIEW_MODE
+        draft = mode if mode in pdf_generator.DRAFT_MODES else None
+        token = cancellation.CancelToken()
 
         def task():
-            pdf_generator.create_pdf_from_barcodes(
+            # Предпросмотр строится с тем же заголовком, что и печать, поэтому
+            # документ из кэша печати подходит и для него. При промахе PDF
+            # собирается в памяти и попадает на диск только при печати;
+            # черновик в кэш не попадает вовсе.
+            source_dir = self.app.readable_dir(barcode_dir, selected_barcodes, token)
+            key = pdf_cache.make_cache_key(
+                "sheet", selected_barcodes, source_dir, page_settings, PRINT_TITLE
+            )
+            cached_path = self.app.pdf_cache.get(key)
+            if cached_path is not None:
+                return key, cached_path, None
+            pdf_bytes = pdf_generator.create_pdf_from_barcodes(
                 selected_barcodes,
-                self.app.cfg.barcode_dir,
-                temp_file_path,
-                "Preview",
-                self.app.cfg.page_settings.to_dict(),
+                source_dir,
+                None,
+                PRINT_TITLE,
+                page_settings,
+                progress=self.app.make_progress_callback("Предпросмотр"),
+                cancel_token=token,
+                draft=draft,
             )
-            return temp_file_path
+            return key, None, pdf_bytes
 
         def on_done(result):
-            self.app.update_status("Готово к предпросмотру.")
+            key, cached_path, pdf_bytes = result
+            self.app.update_status(
+                "Готово к предпросмотру (из кэша)." if cached_path else "Готово к предпросмотру."
+            )
             preview_window.PDFPreviewWindow(
-                self.app, result, self.app.cfg.selected_printer
+                self.app,
+                cached_path,
+                self.app.cfg.selected_printer,
+                delete_on_close=False,
+                pdf_bytes=pdf_bytes,
+                save_for_print=lambda data: self.app.pdf_cache.put_bytes(key, data),
+                send_to_printer=self.app.send_to_printer,
+                print_action=self.process_printing if draft and not cached_path else None,
             )
 
         def on_error(error):
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
             messagebox.showerror(
                 "Ошибка", f"Не удалось создать PDF для предпросмотра:\n{error}"
             )
 
-        self.app._run_task(task, on_done, on_error, "Генерация PDF для предпросмотра...")
+        self.app._run_task(
+            task,
+            on_done,
+            on_error,
+            "Генерация PDF для предпросмотра...",
+            job_scheduler.PRIORITY_PREVIEW,
+            cancel_token=token,
+        )
 
     def process_printing(self):
-        selected_barcodes = self.selected_for_generation
+        selected_barcodes = dict(self.selected_for_generation)
         if not selected_barcodes:
             messagebox.showwarning("Внимание", "Список для генерации пуст.")
             return
@@ -464,33 +768,94 @@ class MainTab(ttk.Frame):
             )
             return
 
-        temp_fd, temp_file_path = tempfile.mkstemp(suffix=".pdf")
-        os.close(temp_fd)
+        page_settings = self.app.cfg.page_settings.to_dict()
+        barcode_dir = self.app.cfg.barcode_dir
+        printer = self.app.cfg.selected_printer
+        if self.app.cfg.print_settings.batch_orders:
+            self.app.queue_order(
+                self.app.new_order(
+                    order_batcher.KIND_SHEET,
+                    selected_barcodes,
+                    printer,
+                    barcode_dir,
+                    page_settings=page_settings,
+                    title=PRINT_TITLE,
+                )
+            )
+            return
+
+        token = cancellation.CancelToken()
+        max_pages, max_labels = self._split_limits()
 
         def task():
-            pdf_generator.create_pdf_from_barcodes(
-                selected_barcodes,
-                self.app.cfg.barcode_dir,
-                temp_file_path,
-                title="Печать штрих-кодов",
-                page_settings=self.app.cfg.page_settings.to_dict(),
+            source_dir = self.app.readable_dir(barcode_dir, selected_barcodes, token)
+            key = pdf_cache.make_cache_key(
+                "sheet", selected_barcodes, source_dir, page_settings, PRINT_TITLE
             )
-            win32api.ShellExecute(
-                0,
-                "printto",
-                temp_file_path,
-                f'"{self.app.cfg.selected_printer}"',
-                ".",
-                0,
+            if max_pages or max_labels:
+                layout = pdf_generator.plan_sheet(selected_barcodes, source_dir, page_settings)
+                count = len(sheet_layout.split_layout(layout, max_pages, max_labels))
+                if count > 1:
+                    # Каждая часть — отдельное задание печати со своими повторами
+                    paths, _ = self.app.pdf_cache.get_or_create_parts(
+                        pdf_cache.make_cache_key(
+                            "sheet-parts",
+                            selected_barcodes,
+                            source_dir,
+                            {**page_settings, "split": [max_pages, max_labels]},
+                            PRINT_TITLE,
+                        ),
+                        count,
+                        lambda out_dir: [
+                            os.path.join(out_dir, part.file)
+                            for part in output_parts.create_pdf_parts(
+                                selected_barcodes,
+                                source_dir,
+                                os.path.join(out_dir, "sheet.pdf"),
+                                title=PRINT_TITLE,
+                                page_settings=page_settings,
+                                max_pages=max_pages,
+                                max_labels=max_labels,
+                                progress=self.app.make_progress_callback(
+                                    "Генерация PDF для печати"
+                                ),
+                                cancel_token=token,
+                                layout=layout,
+                            )
+                        ],
+                    )
+                    token.raise_if_cancelled()
+                    return paths
+            path, _ = self.app.pdf_cache.get_or_create(
+                key,
+                lambda out: pdf_generator.create_pdf_from_barcodes(
+                    selected_barcodes,
+                    source_dir,
+                    out,
+                    title=PRINT_TITLE,
+                    page_settings=page_settings,
+                    progress=self.app.make_progress_callback("Генерация PDF для печати"),
+                    cancel_token=token,
+                ),
             )
-            return temp_file_path
+            token.raise_if_cancelled()
+            return [path]
 
-        def on_done(result):
-            self.app.update_status("Документ отправлен на печать. Готово.")
-            messagebox.showinfo("Печать", "Документ отправлен на печать.")
+        def on_done(paths):
+            if len(paths) > 1:
+                self.app.send_parts_to_printer(paths, printer)
+            else:
+                self.app.send_to_printer(paths[0], printer)
 
         def on_error(error):
             messagebox.showerror("Ошибка", f"Произошла ошибка:\n{error}")
             self.app.update_status("Ошибка при печати. Готово.")
 
-        self.app._run_task(task, on_done, on_error, "Генерация и отправка на печать...")
+        self.app._run_task(
+            task,
+            on_done,
+            on_error,
+            "Генерация PDF для печати...",
+            job_scheduler.PRIORITY_PRINT,
+            cancel_token=token,
+        )
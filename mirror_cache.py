@@ -0,0 +1,385 @@
+"""Локальное зеркало папок библиотеки, лежащих на медленном сетевом ресурсе.
+
+Все чтения (превью, генерация, объединение PDF) идут из локальной копии.
+Копия считается актуальной, пока у исходного файла не изменились размер и
+mtime; при изменении файл копируется заново с подсчётом SHA-256, и хэш
+сохраняется в индексе зеркала. Размер зеркала ограничен: давно не
+использованные копии вытесняются (LRU), как в ``pdf_cache``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional
+
+import instrumentation
+import library_source
+from cancellation import CancelToken
+from pdf_cache import sha256_file
+
+INDEX_FILENAME = "index.json"
+
+# Недавно выданные копии не вытесняются: их может читать текущее задание
+MIN_EVICTION_AGE = 60.0
+# Сколько секунд проверенная копия считается актуальной без обращения к ресурсу
+REVALIDATE_AFTER = 5.0
+# Копирование по сети упирается в задержку, а не в полосу: качаем параллельно
+FETCH_WORKERS = 4
+# Индекс записывается не чаще, чем раз в столько секунд после изменений
+SAVE_DELAY = 2.0
+
+
+@dataclass
+class MirrorEntry:
+    size: int
+    mtime_ns: int
+    sha256: str
+    used: float
+    checked: float = 0.0
+
+
+class MirrorCache:
+    """Зеркало нескольких исходных папок с общим лимитом размера.
+
+    Копии каждой папки лежат в отдельном подкаталоге ``root`` под теми же
+    именами, поэтому путь из ``ensure`` можно передавать генераторам вместо
+    исходной папки.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        revalidate_after: float = REVALIDATE_AFTER,
+        min_eviction_age: float = MIN_EVICTION_AGE,
+        save_delay: float = SAVE_DELAY,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.min_eviction_age = min_eviction_age
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        # (папка зеркала, имя файла) -> запись
+        self._entries: Dict[tuple[str, str], MirrorEntry] = {}
+        # папка зеркала -> исходная папка
+        self._sources: Dict[str, str] = {}
+        # Копии, заказанные из ``local_path`` и ещё не скачанные
+        self._queued: set[tuple[str, str]] = set()
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mirror")
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def mirror_dir(self, source_dir: str) -> str:
+        source = os.path.normcase(os.path.abspath(source_dir))
+        name = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        mirror = os.path.join(self.root, name)
+        with self._lock:
+            self._sources.setdefault(mirror, source_dir)
+        return mirror
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.root, INDEX_FILENAME), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, section in data.items():
+            mirror = os.path.join(self.root, name)
+            self._sources[mirror] = section["source"]
+            for filename, fields in section["files"].items():
+                entry = MirrorEntry(**fields)
+                entry.checked = 0.0
+                # Копия, пропавшая или обрезанная вне приложения, не используется
+                try:
+                    if os.path.getsize(os.path.join(mirror, filename)) != entry.size:
+                        continue
+                except OSError:
+                    continue
+                self._entries[(mirror, filename)] = entry
+
+    def save(self) -> None:
+        with self._lock:
+            self._dirty = False
+            data: Dict[str, dict] = {}
+            for (mirror, filename), entry in self._entries.items():
+                section = data.get(os.path.basename(mirror))
+                if section is None:
+                    section = data[os.path.basename(mirror)] = {
+                        "source": self._sources[mirror],
+                        "files": {},
+                    }
+                section["files"][filename] = asdict(entry)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.root)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.root, INDEX_FILENAME))
+
+    def save_later(self) -> None:
+        """Записывает индекс через ``save_delay`` секунд, объединяя изменения."""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self._on_save_timer)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _on_save_timer(self) -> None:
+        with self._lock:
+            self._save_timer = None
+        self.flush()
+
+    def flush(self) -> None:
+        """Записывает индекс, если в нём есть несохранённые изменения."""
+        with self._lock:
+            dirty = self._dirty
+        if dirty:
+            self.save()
+
+    def close(self, wait: bool = True) -> None:
+        """Останавливает фоновое копирование и сохраняет индекс.
+
+        При ``wait=False`` заказанные, но не начатые копии отбрасываются.
+        """
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+        self._background.shutdown(wait=wait, cancel_futures=not wait)
+        self.flush()
+
+    def usage(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    def local_path(self, source_dir: str, filename: str) -> str:
+        """Путь для чтения файла без обращения к ресурсу в текущем потоке.
+
+        Вызывается из главного потока (превью): недавно проверенная копия
+        отдаётся сразу, иначе возвращается исходный путь, а копирование или
+        проверка ставятся в фоновую очередь — следующее превью уже прочитает
+        копию. Архив читается на месте: его индекс уже в памяти.
+        """
+        source_path = os.path.join(source_dir, filename)
+        if library_source.is_archive(source_dir):
+            return source_path
+        mirror = self.mirror_dir(source_dir)
+        key = (mirror, filename)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.checked < self.revalidate_after:
+                entry.used = now
+                return os.path.join(mirror, filename)
+            if key in self._queued:
+                return source_path
+            self._queued.add(key)
+        try:
+            self._background.submit(self._fetch_queued, source_dir, filename, key)
+        except RuntimeError:
+            # Зеркало уже закрыто
+            with self._lock:
+                self._queued.discard(key)
+        return source_path
+
+    def _fetch_queued(self, source_dir: str, filename: str, key: tuple[str, str]) -> None:
+        try:
+            self.fetch(source_dir, filename)
+        finally:
+            with self._lock:
+                self._queued.discard(key)
+
+    def fetch(self, source_dir: str, filename: str) -> str:
+        """Как ``local_path``, но проверяет и при необходимости копирует файл сразу.
+
+        Если файл нельзя скопировать (нет на ресурсе, ошибка диска),
+        возвращается исходный путь — вызывающий код обработает ошибку как
+        раньше.
+        """
+        source_path = os.path.join(source_dir, filename)
+        if library_source.is_archive(source_dir):
+            return source_path
+        try:
+            fetched = self._validate(source_dir, filename)
+        except OSError:
+            return source_path
+        if fetched:
+            self.evict()
+            self.save_later()
+        return os.path.join(self.mirror_dir(source_dir), filename)
+
+    def ensure(
+        self,
+        source_dir: str,
+        filenames: Iterable[str],
+        cancel_token: Optional[CancelToken] = None,
+    ) -> str:
+        """Готовит актуальные копии файлов и возвращает папку для чтения.
+
+        Файлы, отсутствующие на ресурсе, удаляются и из зеркала, чтобы
+        генератор сообщил о них так же, как при чтении с ресурса. Если хотя
+        бы один файл скопировать не удалось, возвращается исходная папка.
+        """
+        if library_source.is_archive(source_dir):
+            return source_dir
+        filenames = list(dict.fromkeys(filenames))
+        failed = False
+        fetched = 0
+        with instrumentation.span("mirror.ensure", files=len(filenames)) as sp:
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                futures = [
+                    pool.submit(self._validate_checked, source_dir, name, cancel_token)
+                    for name in filenames
+                ]
+                for future in futures:
+                    try:
+                        fetched += future.result()
+                    except FileNotFoundError:
+                        continue
+                    except OSError:
+                        failed = True
+            sp.set(fetched=fetched, fallback=failed)
+        if fetched:
+            self.evict()
+            self.save_later()
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return source_dir if failed else self.mirror_dir(source_dir)
+
+    def _validate_checked(
+        self, source_dir: str, filename: str, cancel_token: Optional[CancelToken]
+    ) -> bool:
+        if cancel_token is not None and cancel_token.cancelled:
+            return False
+        return self._validate(source_dir, filename)
+
+    def _validate(self, source_dir: str, filename: str, force: bool = False) -> bool:
+        """Проверяет копию и при необходимости обновляет её; True — файл скопирован."""
+        mirror = self.mirror_dir(source_dir)
+        key = (mirror, filename)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not force and now - entry.checked < self.revalidate_after:
+                entry.used = now
+                return False
+
+        source_path = os.path.join(source_dir, filename)
+        try:
+            st = os.stat(source_path)
+        except FileNotFoundError:
+            self._drop(key)
+            raise
+        unchanged = entry is not None and (entry.size, entry.mtime_ns) == (st.st_size, st.st_mtime_ns)
+        if unchanged and not force:
+            with self._lock:
+                entry.checked = entry.used = now
+            return False
+
+        sha256 = self._fetch(source_path, mirror, filename)
+        # Файл меняли во время копирования — копия может быть несогласованной
+        after = os.stat(source_path)
+        if (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            self._drop(key)
+            raise OSError(f"Файл '{filename}' изменился во время копирования")
+        with self._lock:
+            self._entries[key] = MirrorEntry(st.st_size, st.st_mtime_ns, sha256, now, now)
+        return True
+
+    def _fetch(self, source_path: str, mirror: str, filename: str) -> str:
+        os.makedirs(mirror, exist_ok=True)
+        h = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=mirror)
+        try:
+            with os.fdopen(fd, "wb") as dst, open(source_path, "rb") as src:
+                for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                    h.update(chunk)
+                    dst.write(chunk)
+            os.replace(tmp_path, os.path.join(mirror, filename))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return h.hexdigest()
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        try:
+            os.remove(os.path.join(*key))
+        except OSError:
+            pass
+
+    def invalidate(self, source_dir: str, filenames: Iterable[str]) -> None:
+        """Сбрасывает копии файлов, изменённых или удалённых на ресурсе."""
+        mirror = self.mirror_dir(source_dir)
+        for filename in filenames:
+            self._drop((mirror, filename))
+
+    def refresh(self, cancel_token: Optional[CancelToken] = None) -> int:
+        """Фоновая сверка всех копий с ресурсом; возвращает число обновлённых.
+
+        Заодно проверяется SHA-256 локальных копий: повреждённая копия
+        скачивается заново. Копии, которые не удалось проверить или обновить,
+        не считаются обновлёнными (их число попадает в замер ``failed``).
+        """
+        with self._lock:
+            keys = list(self._entries)
+            sources = dict(self._sources)
+        updated = failed = 0
+        with instrumentation.span("mirror.refresh", files=len(keys)) as sp:
+            for mirror, filename in keys:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                with self._lock:
+                    entry = self._entries.get((mirror, filename))
+                if entry is None:
+                    continue
+                try:
+                    corrupted = sha256_file(os.path.join(mirror, filename)) != entry.sha256
+                except OSError:
+                    corrupted = True
+                try:
+                    updated += self._validate(sources[mirror], filename, force=corrupted)
+                except OSError:
+                    failed += 1
+            sp.set(updated=updated, failed=failed)
+        self.save()
+        return updated
+
+    def evict(self) -> None:
+        with self._lock:
+            total = sum(entry.size for entry in self._entries.values())
+            if total <= self.max_bytes:
+                return
+            protected_since = time.time() - self.min_eviction_age
+            victims = []
+            for key, entry in sorted(self._entries.items(), key=lambda item: item[1].used):
+                if total <= self.max_bytes:
+                    break
+                if entry.used >= protected_since:
+                    continue
+                victims.append(key)
+                total -= entry.size
+        for key in victims:
+            self._drop(key)
+
+
+def create_mirror(settings, cache_dir: str) -> Optional[MirrorCache]:
+    """Зеркало по ``config_manager.MirrorSettings`` или ``None``, если оно выключено."""
+    if not settings.enabled:
+        return None
+    return MirrorCache(
+        settings.dir or os.path.join(cache_dir, "mirror"),
+        settings.max_mb * 1024 * 1024,
+        revalidate_after=settings.revalidate_sec,
+    )
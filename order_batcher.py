@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import pdf_cache
+import pdf_generator
+from cancellation import CancelToken
+from progress import ProgressCallback
+
+KIND_SHEET = "sheet"
+KIND_RIBBON = "ribbon"
+
+
+@dataclass(eq=False)
+class Order:
+    """Заказ, ожидающий печати в составе пакета."""
+
+    name: str
+    kind: str
+    items: Dict[str, int]
+    printer: str
+    source_dir: str
+    page_settings: Optional[dict] = None
+    title: Optional[str] = None
+
+    @property
+    def labels(self) -> int:
+        return sum(self.items.values())
+
+
+@dataclass(eq=False)
+class Batch:
+    kind: str
+    printer: str
+    orders: list[Order] = field(default_factory=list)
+    generation: int = 0
+
+    @property
+    def labels(self) -> int:
+        return sum(order.labels for order in self.orders)
+
+
+class OrderBatcher:
+    """Собирает заказы в пакеты, чтобы отправлять их на принтер одним заданием.
+
+    Пакеты ведутся отдельно для каждой пары «вид печати, принтер». Пакет
+    отправляется в ``on_flush``, когда в нём набирается ``max_orders`` заказов
+    или ``max_labels`` этикеток, либо через ``max_wait_ms`` после добавления
+    первого заказа (таймер ``after`` виджета Tk).
+    """
+
+    def __init__(
+        self,
+        widget,
+        on_flush: Callable[[Batch], None],
+        max_orders: int = 10,
+        max_labels: int = 2000,
+        max_wait_ms: int = 60_000,
+    ):
+        self.widget = widget
+        self.on_flush = on_flush
+        self.max_orders = max_orders
+        self.max_labels = max_labels
+        self.max_wait_ms = max_wait_ms
+        self._batches: Dict[tuple[str, str], Batch] = {}
+        self._generations = itertools.count(1)
+
+    def add(self, order: Order) -> Batch:
+        key = (order.kind, order.printer)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = Batch(order.kind, order.printer, generation=next(self._generations))
+            self._batches[key] = batch
+            self.widget.after(
+                self.max_wait_ms, lambda k=key, g=batch.generation: self._on_timer(k, g)
+            )
+        batch.orders.append(order)
+
+        if len(batch.orders) >= self.max_orders or batch.labels >= self.max_labels:
+            self.flush(key)
+        return batch
+
+    def pending(self) -> list[Batch]:
+        return list(self._batches.values())
+
+    def pending_orders(self) -> int:
+        return sum(len(batch.orders) for batch in self._batches.values())
+
+    def flush(self, key: tuple[str, str]) -> bool:
+        batch = self._batches.pop(key, None)
+        if batch is None or not batch.orders:
+            return False
+        self.on_flush(batch)
+        return True
+
+    def flush_all(self) -> int:
+        flushed = 0
+        for key in list(self._batches):
+            flushed += self.flush(key)
+        return flushed
+
+    def _on_timer(self, key: tuple[str, str], generation: int) -> None:
+        # Пакет мог уже уйти по порогу размера; тогда таймер относится к старому
+        batch = self._batches.get(key)
+        if batch is not None and batch.generation == generation:
+            self.flush(key)
+
+
+def render_order(
+    order: Order,
+    cache: pdf_cache.PdfCache,
+    source_dir: str,
+    cancel_token: Optional[CancelToken] = None,
+) -> tuple[str, str]:
+    """Возвращает путь к документу заказа в кэше и его ключ.
+
+    ``source_dir`` — папка, из которой читаются файлы заказа (может
+    отличаться от ``order.source_dir``, если включено локальное зеркало).
+    """
+    if order.kind == KIND_RIBBON:
+        key = pdf_cache.make_cache_key("ribbon", order.items, source_dir)
+
+        def build(out):
+            pdf_generator.merge_pdfs(order.items, source_dir, out, cancel_token=cancel_token)
+
+    else:
+        key = pdf_cache.make_cache_key(
+            "sheet", order.items, source_dir, order.page_settings, order.title
+        )
+
+        def build(out):
+            pdf_generator.create_pdf_from_barcodes(
+                order.items,
+                source_dir,
+                out,
+                title=order.title,
+                page_settings=order.page_settings,
+                cancel_token=cancel_token,
+            )
+
+    path, _ = cache.get_or_create(key, build)
+    return path, key
+
+
+def render_batch(
+    batch: Batch,
+    cache: pdf_cache.PdfCache,
+    resolve_dir: Callable[[Order], str] = lambda order: order.source_dir,
+    header_pages: bool = True,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+) -> str:
+    """Собирает заказы пакета в один документ в кэше и возвращает путь к нему.
+
+    Рядом с документом сохраняется карта страниц заказов (``sidecar_path``).
+    ``resolve_dir`` возвращает папку, из которой читать файлы заказа.
+    """
+    orders = list(batch.orders)
+    parts, keys = [], []
+    for number, order in enumerate(orders, 1):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        path, key = render_order(order, cache, resolve_dir(order), cancel_token)
+        keys.append(key)
+        lines = [
+            order.name,
+            f"Заказ {number} из {len(orders)}",
+            f"Позиций: {len(order.items)}, этикеток: {order.labels}",
+            f"Принтер: {batch.printer}",
+        ]
+        parts.append((order.name, path, lines))
+
+    batch_key = pdf_cache.make_batch_key(
+        keys, [order.name for order in orders], header_pages, batch.printer
+    )
+
+    def build(out):
+        _, page_map = pdf_generator.combine_orders(
+            parts,
+            out,
+            header_pages=header_pages,
+            progress=progress,
+            cancel_token=cancel_token,
+        )
+        cache.write_sidecar(batch_key, {"printer": batch.printer, "orders": page_map})
+
+    path, _ = cache.get_or_create(batch_key, build)
+    return path
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import csv
+import io
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, TextIO, Union
+
+OZN_PATTERN = re.compile(r"OZN\d+", re.IGNORECASE)
+
+DELIMITERS = ",;\t|"
+
+SKU_COLUMNS = ("артикул", "штрих-код", "штрихкод", "sku", "код", "code", "ozn", "offer_id")
+NAME_COLUMNS = ("наименование", "название", "товар", "name", "файл", "file")
+QUANTITY_COLUMNS = ("количество", "кол-во", "колво", "qty", "quantity", "шт")
+
+# Больше стольких этикеток одной позиции в заказе не бывает: это ошибка в файле
+MAX_QUANTITY = 100_000
+
+# Неоднозначный ключ: соответствует нескольким файлам
+_AMBIGUOUS = ""
+
+
+def normalize_name(text: str) -> str:
+    """Приводит имя к виду для сравнения: без расширения, регистра и разделителей."""
+    stem, ext = os.path.splitext(text)
+    if ext.lower() in (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".pdf"):
+        text = stem
+    return " ".join(re.sub(r"[\W_]+", " ", text.lower()).split())
+
+
+class SkuIndex:
+    """Индекс имён файлов библиотеки по коду OZN и нормализованному имени."""
+
+    def __init__(self, filenames: Iterable[str] = ()):
+        self.filenames: set[str] = set()
+        self.by_code: Dict[str, str] = {}
+        self.by_name: Dict[str, str] = {}
+        for filename in filenames:
+            match = OZN_PATTERN.match(filename)
+            if match:
+                code = match.group(0).upper()
+                description = normalize_name(filename[match.end():])
+            else:
+                code, description = None, ""
+            self._add_entry(filename, code, normalize_name(filename), description)
+
+    @classmethod
+    def from_entries(
+        cls, entries: Iterable[tuple[str, Optional[str], str, str]]
+    ) -> SkuIndex:
+        """Строит индекс из уже разобранных имён (``LibraryCatalog.index_entries``)."""
+        index = cls()
+        for filename, code, normalized, description in entries:
+            index._add_entry(filename, code, normalized, description)
+        return index
+
+    def _add_entry(
+        self, filename: str, code: Optional[str], normalized: str, description: str
+    ) -> None:
+        self.filenames.add(filename)
+        self._add(self.by_name, normalized, filename)
+        if code:
+            self._add(self.by_code, code, filename)
+            if description:
+                self._add(self.by_name, description, filename)
+
+    @staticmethod
+    def _add(index: Dict[str, str], key: str, filename: str) -> None:
+        existing = index.get(key)
+        if existing is None:
+            index[key] = filename
+        elif existing != filename:
+            index[key] = _AMBIGUOUS
+
+    def resolve(self, value: str) -> tuple[Optional[str], str]:
+        """Возвращает файл и пустую строку либо ``None`` и причину неудачи."""
+        value = value.strip()
+        if not value:
+            return None, "пустой артикул"
+        if value in self.filenames:
+            return value, ""
+
+        match = OZN_PATTERN.search(value)
+        if match:
+            filename = self.by_code.get(match.group(0).upper())
+            if filename:
+                return filename, ""
+            if filename == _AMBIGUOUS:
+                return None, "код соответствует нескольким файлам"
+
+        filename = self.by_name.get(normalize_name(value))
+        if filename:
+            return filename, ""
+        if filename == _AMBIGUOUS:
+            return None, "имя соответствует нескольким файлам"
+        return None, "не найден в библиотеке"
+
+
+@dataclass
+class UnresolvedRow:
+    line: int
+    value: str
+    reason: str
+
+
+@dataclass
+class ImportResult:
+    items: Dict[str, int] = field(default_factory=dict)
+    unresolved: list[UnresolvedRow] = field(default_factory=list)
+    rows: int = 0
+
+    def summary(self, limit: int = 10) -> str:
+        text = (
+            f"Строк обработано: {self.rows}\n"
+            f"Позиций: {len(self.items)}, всего этикеток: {sum(self.items.values())}\n"
+            f"Не распознано строк: {len(self.unresolved)}"
+        )
+        if self.unresolved:
+            lines = [f"  стр. {r.line}: {r.value!r} — {r.reason}" for r in self.unresolved[:limit]]
+            if len(self.unresolved) > limit:
+                lines.append(f"  … и ещё {len(self.unresolved) - limit}")
+            text += "\n" + "\n".join(lines)
+        return text
+
+
+def parse_quantity(value: str) -> Optional[int]:
+    """Целое количество от 1 до ``MAX_QUANTITY`` или ``None``, если ячейка неверна."""
+    value = value.strip().replace(" ", "").replace("\u00a0", "").replace(",", ".")
+    try:
+        quantity = float(value)
+    except (ValueError, OverflowError):
+        return None
+    if not math.isfinite(quantity) or quantity <= 0 or quantity != int(quantity):
+        return None
+    if quantity > MAX_QUANTITY:
+        return None
+    return int(quantity)
+
+
+def _find_column(header: list[str], names: tuple[str, ...]) -> Optional[int]:
+    for index, cell in enumerate(header):
+        if cell.strip().lower() in names:
+            return index
+    return None
+
+
+def _sniff_delimiter(sample: str) -> str:
+    """Самый частый разделитель первой строки вне кавычек (по умолчанию ``;``)."""
+    first_line = next((line for line in sample.splitlines() if line.strip()), "")
+    unquoted = re.sub(r'"[^"]*"', "", first_line)
+    counts = {d: unquoted.count(d) for d in DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ";"
+
+
+def import_orders(
+    source: Union[str, TextIO], index: SkuIndex, encoding: str = "utf-8-sig"
+) -> ImportResult:
+    """Читает заказ из CSV построчно и сопоставляет строки с файлами библиотеки.
+
+    Разделитель определяется по началу файла. Если первая строка — заголовок,
+    столбцы артикула/наименования и количества ищутся по названию; иначе
+    первый столбец считается артикулом, а второй — количеством (без него — 1
+    шт.). Повторяющиеся позиции суммируются, порядок соответствует первому
+    упоминанию.
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding=encoding, newline="") as f:
+            return import_orders(f, index)
+
+    sample = source.read(64 * 1024)
+    stream = io.StringIO(sample) if len(sample) < 64 * 1024 else None
+    reader = csv.reader(
+        stream if stream is not None else _chain(sample, source),
+        delimiter=_sniff_delimiter(sample),
+    )
+    result = ImportResult()
+
+    first = next(reader, None)
+    if first is None:
+        return result
+    key_columns = [
+        c for c in (_find_column(first, SKU_COLUMNS), _find_column(first, NAME_COLUMNS))
+        if c is not None
+    ]
+    qty_column = _find_column(first, QUANTITY_COLUMNS)
+    if key_columns:
+        rows = reader
+        line = 1
+    else:
+        key_columns, qty_column = [0], 1
+        rows = _prepend(first, reader)
+        line = 0
+
+    items = result.items
+    unresolved = result.unresolved
+    for row in rows:
+        line += 1
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        result.rows += 1
+
+        if qty_column is None or qty_column >= len(row):
+            quantity = 1
+        else:
+            quantity = parse_quantity(row[qty_column])
+        values = [row[c] for c in key_columns if c < len(row)]
+        value = next((v for v in values if v.strip()), "")
+        if quantity is None:
+            unresolved.append(UnresolvedRow(line, value, f"неверное количество {row[qty_column]!r}"))
+            continue
+
+        filename, reason = None, "пустой артикул"
+        for candidate in values:
+            filename, reason = index.resolve(candidate)
+            if filename:
+                break
+        if filename is None:
+            unresolved.append(UnresolvedRow(line, value, reason))
+            continue
+        total = items.get(filename, 0) + quantity
+        if total > MAX_QUANTITY:
+            unresolved.append(
+                UnresolvedRow(line, value, f"всего больше {MAX_QUANTITY} шт. одной позиции")
+            )
+            continue
+        items[filename] = total
+
+    return result
+
+
+def _chain(head: str, rest: TextIO):
+    """Склеивает уже прочитанный образец с оставшейся частью файла построчно."""
+    buffer = io.StringIO(head)
+    tail = buffer.readlines()
+    if tail and not tail[-1].endswith("\n"):
+        last = tail.pop()
+        yield from tail
+        yield last + rest.readline()
+    else:
+        yield from tail
+    yield from rest
+
+
+def _prepend(first: list[str], rows):
+    yield first
+    yield from rows
@@ -0,0 +1,421 @@
+"""Разбиение больших заданий на несколько PDF-файлов, собираемых параллельно.
+
+Документ на сотни страниц долго собирается и долго проходит через спулер,
+а ошибка на любом этапе губит всё задание. Здесь задание делится на части
+по целым страницам (не больше ``max_pages`` страниц и ``max_labels``
+этикеток в части), каждая часть собирается в отдельном процессе, а рядом с
+частями пишется манифест в JSON. Части получают детерминированные имена
+``<имя>_part001.pdf``…, поэтому их можно печатать и повторять по отдельности.
+
+В манифесте у каждой части есть состояние. Если часть не собралась или
+задание отменили, готовые части остаются на диске, а повторный запуск того
+же задания (совпадает подпись — выбор, содержимое файлов и параметры)
+собирает только недостающие.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional
+
+import instrumentation
+import library_source
+import pdf_cache
+import pdf_generator
+import sheet_layout
+from cancellation import CancelToken, OperationCancelled
+from progress import ProgressCallback, ProgressReporter
+
+MANIFEST_VERSION = 2
+# Как часто главный поток проверяет отмену, пока части собираются
+POLL_INTERVAL = 0.2
+
+PART_PENDING = "pending"
+PART_DONE = "done"
+PART_FAILED = "failed"
+
+# Флаг отмены в дочернем процессе пула (см. ``_init_worker``)
+_worker_cancel = None
+
+
+@dataclass
+class OutputPart:
+    file: str
+    pages: int
+    # Этикеток в части; для объединения PDF — число вставленных документов
+    labels: int
+    # Номер первой страницы части в цельном документе (с единицы)
+    first_page: int
+    size: int = 0
+    status: str = PART_PENDING
+    error: str = ""
+
+
+class PartsFailed(Exception):
+    """Часть частей не собрана; готовые сохранены и указаны в манифесте."""
+
+
+def part_path(output_path: str, index: int) -> str:
+    """Путь части с номером ``index`` (с единицы) рядом с ``output_path``."""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_part{index:03d}{ext or '.pdf'}"
+
+
+def manifest_path(output_path: str) -> str:
+    return f"{os.path.splitext(output_path)[0]}_manifest.json"
+
+
+def load_manifest(output_path: str) -> Optional[dict]:
+    try:
+        with open(manifest_path(output_path), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def create_pdf_parts(
+    selected_barcodes: dict,
+    source_dir: str,
+    output_path: str,
+    title: Optional[str] = None,
+    page_settings: Optional[dict] = None,
+    max_pages: int = 0,
+    max_labels: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    layout: Optional[sheet_layout.SheetLayout] = None,
+) -> list[OutputPart]:
+    """``create_pdf_from_barcodes`` с разбиением результата на части.
+
+    Раскладка строится один раз для всего задания и режется по страницам
+    (``sheet_layout.split_layout``), так что части, напечатанные подряд,
+    совпадают с цельным документом, включая заголовки и разделители.
+    """
+    if layout is None:
+        layout = pdf_generator.plan_sheet(selected_barcodes, source_dir, page_settings)
+    pieces = sheet_layout.split_layout(layout, max_pages, max_labels)
+    title = title or os.path.splitext(os.path.basename(output_path))[0]
+
+    jobs = []
+    parts = []
+    first_page = 1
+    for index, piece in enumerate(pieces, 1):
+        path = part_path(output_path, index)
+        jobs.append(
+            (
+                pdf_generator.create_pdf_from_barcodes,
+                path,
+                (selected_barcodes, source_dir),
+                {"title": title, "page_settings": page_settings, "layout": piece},
+            )
+        )
+        parts.append(
+            OutputPart(os.path.basename(path), piece.pages, len(piece.placements), first_page)
+        )
+        first_page += piece.pages
+    signature = _signature(
+        parts, pdf_cache.make_cache_key("sheet", selected_barcodes, source_dir, page_settings, title)
+    )
+    return _build_parts(
+        "sheet", title, output_path, jobs, parts, "labels", workers, progress, cancel_token,
+        signature,
+    )
+
+
+def plan_merge(
+    selected_pdfs: dict, source_dir: str, max_pages: int = 0, max_labels: int = 0
+) -> list[tuple[Dict[str, int], int, int]]:
+    """Делит объединение PDF на части: ``(выбор, страниц, копий)`` для каждой.
+
+    Исходные документы не разрезаются: часть заканчивается перед копией,
+    которая превысила бы ``max_pages``; ``max_labels`` ограничивает число
+    вставленных копий. Отсутствующие файлы пропускаются, как в ``merge_pdfs``.
+    """
+    page_counts: Dict[str, int] = {}
+    for filename in selected_pdfs:
+        full_path = os.path.join(source_dir, filename)
+        if library_source.exists(full_path):
+            with library_source.open_pdf(full_path) as doc:
+                page_counts[filename] = len(doc)
+
+    pieces: list[tuple[Dict[str, int], int, int]] = []
+    selection: Dict[str, int] = {}
+    pages = copies = 0
+    for filename, quantity in selected_pdfs.items():
+        if filename not in page_counts:
+            continue
+        for _ in range(quantity):
+            count = page_counts[filename]
+            if copies and (
+                (max_pages and pages + count > max_pages) or (max_labels and copies >= max_labels)
+            ):
+                pieces.append((selection, pages, copies))
+                selection, pages, copies = {}, 0, 0
+            selection[filename] = selection.get(filename, 0) + 1
+            pages += count
+            copies += 1
+    if not copies:
+        raise ValueError("Не найдено ни одного PDF-файла для объединения.")
+    pieces.append((selection, pages, copies))
+    return pieces
+
+
+def merge_pdf_parts(
+    selected_pdfs: dict,
+    source_dir: str,
+    output_path: str,
+    max_pages: int = 0,
+    max_labels: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    pieces: Optional[list[tuple[Dict[str, int], int, int]]] = None,
+) -> list[OutputPart]:
+    """``merge_pdfs`` с разбиением результата на части (см. ``plan_merge``)."""
+    if pieces is None:
+        pieces = plan_merge(selected_pdfs, source_dir, max_pages, max_labels)
+
+    jobs = []
+    parts = []
+    first_page = 1
+    for index, (selection, pages, copies) in enumerate(pieces, 1):
+        path = part_path(output_path, index)
+        jobs.append((pdf_generator.merge_pdfs, path, (selection, source_dir), {}))
+        parts.append(OutputPart(os.path.basename(path), pages, copies, first_page))
+        first_page += pages
+    title = os.path.splitext(os.path.basename(output_path))[0]
+    signature = _signature(parts, pdf_cache.make_cache_key("merge", selected_pdfs, source_dir))
+    return _build_parts(
+        "merge", title, output_path, jobs, parts, "sources", workers, progress, cancel_token,
+        signature,
+    )
+
+
+def _signature(parts: list[OutputPart], key: str) -> str:
+    """Подпись задания: входные данные и нарезка на части."""
+    layout = [[part.file, part.pages, part.labels, part.first_page] for part in parts]
+    payload = json.dumps({"key": key, "parts": layout})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _init_worker(cancel_event) -> None:
+    global _worker_cancel
+    _worker_cancel = cancel_event
+
+
+def _write_part(build: Callable, path: str, args: tuple, kwargs: dict) -> int:
+    """Собирает одну часть во временный файл и переименовывает её; возвращает размер.
+
+    ``build`` — ``create_pdf_from_barcodes`` или ``merge_pdfs``: путь
+    результата передаётся им третьим аргументом. В дочернем процессе пула
+    сборка прерывается по общему флагу отмены.
+    """
+    if _worker_cancel is not None:
+        kwargs = {**kwargs, "cancel_token": CancelToken(_worker_cancel)}
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        build(*args, tmp_path, **kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def _build_parts(
+    kind: str,
+    title: str,
+    output_path: str,
+    jobs: list[tuple[Callable, str, tuple, dict]],
+    parts: list[OutputPart],
+    unit: str,
+    workers: Optional[int],
+    progress: Optional[ProgressCallback],
+    cancel_token: Optional[CancelToken],
+    signature: str,
+) -> list[OutputPart]:
+    done_field, total_field = (
+        ("labels_placed", "labels_total") if unit == "labels" else ("sources_merged", "sources_total")
+    )
+    reporter = ProgressReporter(progress)
+    reporter.update(force=True, **{total_field: sum(part.labels for part in parts)})
+    units_done = pages_done = 0
+
+    def part_done(part: OutputPart, size: int) -> None:
+        nonlocal units_done, pages_done
+        part.size = size
+        part.status = PART_DONE
+        units_done += part.labels
+        pages_done += part.pages
+        reporter.update(**{done_field: units_done}, pages_done=pages_done)
+
+    def write_manifest() -> None:
+        _write_manifest(output_path, kind, title, parts, unit, signature)
+
+    for part in _reuse_parts(output_path, signature, parts):
+        part_done(part, part.size)
+    todo = [(job, part) for job, part in zip(jobs, parts) if part.status != PART_DONE]
+    errors: list[BaseException] = []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+    with instrumentation.span(
+        f"parts.{kind}", parts=len(jobs), rebuilt=len(todo), workers=workers
+    ) as sp:
+        try:
+            if workers == 1:
+                for (build, path, args, kwargs), part in todo:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    try:
+                        size = _write_part(build, path, args, {**kwargs, "cancel_token": cancel_token})
+                    except OperationCancelled:
+                        raise
+                    except Exception as exc:
+                        _part_failed(part, exc, errors)
+                    else:
+                        part_done(part, size)
+            else:
+                _build_in_pool(todo, workers, part_done, errors, cancel_token)
+        except BaseException:
+            _finish_manifest(output_path, parts, write_manifest)
+            raise
+        sp.set(failed=len(errors))
+
+    _finish_manifest(output_path, parts, write_manifest)
+    if errors:
+        failed = sum(part.status == PART_FAILED for part in parts)
+        message = f"Не удалось собрать частей: {failed} из {len(parts)} ({errors[0]})."
+        if failed < len(parts):
+            message += " Готовые части сохранены, повторный запуск соберёт только недостающие."
+        raise PartsFailed(message) from errors[0]
+    reporter.finish(
+        **{done_field: units_done},
+        pages_done=pages_done,
+        bytes_written=sum(part.size for part in parts),
+    )
+    return parts
+
+
+def _part_failed(part: OutputPart, exc: BaseException, errors: list[BaseException]) -> None:
+    part.status = PART_FAILED
+    part.error = str(exc)
+    errors.append(exc)
+
+
+def _reuse_parts(output_path: str, signature: str, parts: list[OutputPart]) -> list[OutputPart]:
+    """Части прошлого запуска того же задания, которые можно не собирать заново.
+
+    Если задание другое, файлы прошлого запуска удаляются.
+    """
+    manifest = load_manifest(output_path)
+    if manifest is None or manifest.get("signature") != signature:
+        _remove_stale_parts(output_path)
+        return []
+    directory = os.path.dirname(output_path)
+    previous = {entry["file"]: entry for entry in manifest.get("parts", ())}
+    reused = []
+    for part in parts:
+        entry = previous.get(part.file)
+        if entry is None or entry.get("status") != PART_DONE:
+            continue
+        try:
+            size = os.path.getsize(os.path.join(directory, part.file))
+        except OSError:
+            continue
+        if size == entry.get("size"):
+            part.size = size
+            reused.append(part)
+    return reused
+
+
+def _finish_manifest(output_path: str, parts: list[OutputPart], write_manifest) -> None:
+    """Сохраняет манифест, если есть готовые части, иначе убирает следы запуска."""
+    if any(part.status == PART_DONE for part in parts):
+        write_manifest()
+    else:
+        _remove_stale_parts(output_path)
+
+
+def _build_in_pool(todo, workers, part_done, errors, cancel_token) -> None:
+    # spawn на всех платформах: дочерний процесс не наследует потоки Tk и
+    # планировщика, а поведение совпадает с Windows
+    context = multiprocessing.get_context("spawn")
+    cancel_event = context.Event()
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(cancel_event,),
+    )
+    try:
+        pending: Dict[Future, OutputPart] = {
+            pool.submit(_write_part, *job): part for job, part in todo
+        }
+        while pending:
+            done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if cancel_token is not None and cancel_token.cancelled:
+                # Запущенные части прерываются на ближайшей границе страницы
+                cancel_event.set()
+                cancel_token.raise_if_cancelled()
+            for future in done:
+                part = pending.pop(future)
+                try:
+                    part_done(part, future.result())
+                except Exception as exc:
+                    _part_failed(part, exc, errors)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _remove_stale_parts(output_path: str) -> None:
+    """Удаляет части и манифест прошлого запуска с тем же именем.
+
+    Удаляются только файлы с точным именем части (``<имя>_part001.pdf``…):
+    другие файлы пользователя с похожим началом имени не трогаются.
+    """
+    directory = os.path.dirname(output_path)
+    stem, ext = os.path.splitext(os.path.basename(output_path))
+    part_name = re.compile(rf"{re.escape(stem)}_part\d{{3}}{re.escape(ext or '.pdf')}")
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return
+    manifest = os.path.basename(manifest_path(output_path))
+    for name in names:
+        # Манифест прошлой версии не читается, поэтому части ищутся по имени
+        if part_name.fullmatch(name) or name == manifest:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _write_manifest(
+    output_path: str, kind: str, title: str, parts: list[OutputPart], unit: str, signature: str
+) -> None:
+    data = {
+        "version": MANIFEST_VERSION,
+        "kind": kind,
+        "title": title,
+        "signature": signature,
+        "unit": unit,
+        "pages": sum(part.pages for part in parts),
+        "labels": sum(part.labels for part in parts),
+        "parts": [asdict(part) for part in parts],
+    }
+    path = manifest_path(output_path)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
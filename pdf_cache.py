@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import instrumentation
+import library_source
+import vector_labels
+
+MB = 1024 * 1024
+
+# Недавно выданные файлы не вытесняются: их ещё не успели передать спулеру
+MIN_EVICTION_AGE = 60.0
+
+_digest_lock = threading.Lock()
+_digests: Dict[str, tuple[int, int, str]] = {}
+
+# Файлы, которые читают задания печати: путь -> число ссылок
+_pin_lock = threading.Lock()
+_pins: Dict[str, int] = {}
+
+
+def _pin_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def pin(path: str) -> None:
+    """Запрещает вытеснение файла, пока для него не вызван ``unpin``."""
+    key = _pin_key(path)
+    with _pin_lock:
+        _pins[key] = _pins.get(key, 0) + 1
+
+
+def unpin(path: str) -> None:
+    key = _pin_key(path)
+    with _pin_lock:
+        count = _pins.get(key, 0) - 1
+        if count > 0:
+            _pins[key] = count
+        else:
+            _pins.pop(key, None)
+
+
+def is_pinned(path: str) -> bool:
+    with _pin_lock:
+        return _pin_key(path) in _pins
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with library_source.open_file(path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """SHA-256 содержимого файла (или записи архива) с запоминанием по размеру и mtime."""
+    try:
+        size, mtime_ns = library_source.stat(path)
+    except OSError:
+        return None
+    with _digest_lock:
+        cached = _digests.get(path)
+    if cached is not None and cached[:2] == (size, mtime_ns):
+        return cached[2]
+
+    digest = sha256_file(path)
+    with _digest_lock:
+        _digests[path] = (size, mtime_ns, digest)
+    return digest
+
+
+def make_cache_key(
+    kind: str,
+    selection: dict,
+    source_dir: str,
+    page_settings: Optional[dict] = None,
+    title: Optional[str] = None,
+) -> str:
+    """Ключ документа: упорядоченный выбор, количества, хэши файлов и параметры."""
+    items = [
+        [filename, quantity, file_digest(os.path.join(source_dir, filename))]
+        for filename, quantity in selection.items()
+    ]
+    params = {"kind": kind, "items": items, "page_settings": page_settings, "title": title}
+    if page_settings and page_settings.get("source_type") == vector_labels.SOURCE_VECTOR:
+        # Векторные этикетки печатают описания из файла библиотеки
+        params["descriptions"] = file_digest(
+            os.path.join(source_dir, vector_labels.DESCRIPTIONS_FILE)
+        )
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_batch_key(
+    part_keys: list[str], names: list[str], header_pages: bool, printer: str
+) -> str:
+    """Ключ пакета заказов по ключам входящих в него документов.
+
+    Принтер печатается на страницах-заголовках, поэтому входит в ключ.
+    """
+    payload = json.dumps(
+        {
+            "kind": "batch",
+            "parts": part_keys,
+            "names": names,
+            "header_pages": header_pages,
+            "printer": printer,
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    """Дисковый кэш сгенерированных PDF с ограничением размера и вытеснением LRU.
+
+    Время последнего использования хранится в mtime файла: ``get`` обновляет
+    его, а при превышении лимита удаляются самые давно использованные файлы,
+    кроме закреплённых через ``pin``.
+    ``suffix`` позволяет хранить так же и другие файлы (растр для принтера).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        min_eviction_age: float = MIN_EVICTION_AGE,
+        suffix: str = ".pdf",
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.min_eviction_age = min_eviction_age
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def sidecar_path(self, key: str) -> str:
+        """Файл с метаданными документа; удаляется вместе с ним при вытеснении."""
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def write_sidecar(self, key: str, data) -> str:
+        """Атомарно записывает метаданные документа в JSON."""
+        path = self.sidecar_path(key)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def commit(self, key: str, tmp_path: str) -> str:
+        path = self.path_for(key)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self.commit(key, tmp_path)
+
+    def get_or_create(self, key: str, build: Callable[[str], None]) -> tuple[str, bool]:
+        """Возвращает путь к документу и признак попадания в кэш.
+
+        При промахе ``build`` записывает документ во временный файл внутри
+        каталога кэша; при ошибке или отмене временный файл удаляется.
+        """
+        path = self.get(key)
+        if path is not None:
+            return path, True
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            with instrumentation.span("cache.build", key=key[:12]):
+                build(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.commit(key, tmp_path), False
+
+    def get_or_create_parts(
+        self, key: str, count: int, build: Callable[[str], list[str]]
+    ) -> tuple[list[str], bool]:
+        """Как ``get_or_create``, но для задания, разбитого на ``count`` частей.
+
+        Части хранятся под ключами ``<key>-001``, ``<key>-002``…; ``build``
+        собирает их во временном каталоге и возвращает пути по порядку. Если
+        хотя бы одна часть была вытеснена, задание собирается заново целиком.
+        """
+        keys = [f"{key}-{index:03d}" for index in range(1, count + 1)]
+        paths = [self.get(part_key) for part_key in keys]
+        if all(path is not None for path in paths):
+            return paths, True
+
+        tmp_dir = tempfile.mkdtemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with instrumentation.span("cache.build", key=key[:12], parts=count):
+                built = build(tmp_dir)
+            if len(built) != count:
+                raise ValueError(f"Ожидалось частей: {count}, собрано: {len(built)}")
+            return [self.commit(part_key, path) for part_key, path in zip(keys, built)], False
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.suffix):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+            protected_since = time.time() - self.min_eviction_age
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if mtime >= protected_since or is_pinned(path):
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+                sidecar = os.path.splitext(path)[0] + ".json"
+                if os.path.exists(sidecar):
+                    os.remove(sidecar)
@@ -1,147 +1,558 @@
+import io
 import os
-from typing import Optional
+import tempfile
+from typing import BinaryIO, Optional, Union
 
-import fitz  # PyMuPDF
-from PIL import Image
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+import image_prefetch
+import instrumentation
+import library_source
+import sheet_layout
+import vector_labels
+from cancellation import CancelToken
+from progress import ProgressCallback, ProgressReporter
+
+# PyMuPDF, Pillow и reportlab импортируются внутри функций: модуль загружается
+# вместе с GUI, а эти библиотеки нужны только при генерации документа.
+
+# Куда писать результат: путь к файлу, открытый бинарный поток или None —
+# тогда документ собирается в памяти и возвращается в виде bytes.
+OutputTarget = Union[str, BinaryIO, None]
+
+# Черновые режимы для предпросмотра: раскладка та же, что при печати
+DRAFT_THUMBNAIL = "thumbnail"  # уменьшенные копии изображений
+DRAFT_OUTLINE = "outline"  # рамки с именами файлов, изображения не читаются
+DRAFT_MODES = (DRAFT_THUMBNAIL, DRAFT_OUTLINE)
+
+# После стольких инкрементальных сохранений файл пересобирается целиком: каждое
+# дописывание оставляет в нём удалённые страницы и копии тех же изображений
+MAX_INCREMENTAL_SAVES = 8
+
+
+def plan_sheet(
+    selected_barcodes: dict,
+    source_dir: str,
+    page_settings: Optional[dict] = None,
+) -> sheet_layout.SheetLayout:
+    """Раскладывает этикетки по листам без отрисовки (см. ``sheet_layout``).
+
+    Пропорции читаются из заголовков изображений: в режиме grid — только у
+    первого файла, в режиме packed — у каждого. Отсутствующие файлы
+    пропускаются с предупреждением, как и при генерации.
+    """
+    from PIL import Image
+
+    page_settings = page_settings or {}
+    vector = page_settings.get("source_type") == vector_labels.SOURCE_VECTOR
+    packed = page_settings.get("layout") == sheet_layout.LAYOUT_PACKED
+
+    with instrumentation.span("generate.scan", files=len(selected_barcodes)):
+        if vector:
+            # Векторным этикеткам файлы не нужны: достаточно кода в имени
+            groups = []
+            descriptions = vector_labels.load_descriptions(source_dir)
+            for filename, quantity in selected_barcodes.items():
+                code = vector_labels.code_from_filename(filename)
+                if code is None:
+                    print(f"Warning: No OZN code in file name, label will be skipped: {filename}")
+                    continue
+                if code not in descriptions:
+                    print(
+                        f"Warning: No description for {code} in "
+                        f"{vector_labels.DESCRIPTIONS_FILE}, using the file name: {filename}"
+                    )
+                groups.append((filename, quantity))
+        else:
+            groups = []
+            for filename, quantity in selected_barcodes.items():
+                full_path = os.path.join(source_dir, filename)
+                if library_source.exists(full_path):
+                    groups.append((filename, quantity))
+                else:
+                    print(f"Warning: File not found and will be skipped: {full_path}")
+
+    if not groups:
+        raise ValueError("Не найдено ни одного файла для размещения в PDF.")
+
+    aspects = {}
+    with instrumentation.span("generate.decode", files=len(groups) if packed else 1):
+        for filename, _ in groups if packed else groups[:1]:
+            if vector:
+                aspects[filename] = vector_labels.LABEL_ASPECT
+                continue
+            path = os.path.join(source_dir, filename)
+            with library_source.open_file(path) as f, Image.open(f) as img:
+                img_width_px, img_height_px = img.size
+            aspects[filename] = img_height_px / img_width_px
+
+    with instrumentation.span("generate.plan") as sp:
+        layout = sheet_layout.plan_sheet(groups, aspects, page_settings)
+        sp.set(
+            mode=layout.mode,
+            labels=len(layout.placements),
+            pages=layout.pages,
+            baseline_pages=layout.baseline_pages,
+        )
+    return layout
 
 
 def create_pdf_from_barcodes(
     selected_barcodes: dict,
     source_dir: str,
-    output_path: str,
+    output_path: OutputTarget = None,
     title: Optional[str] = None,
     page_settings: Optional[dict] = None,
-) -> None:
-    existing_image_paths = [
-        os.path.join(source_dir, f)
-        for f in selected_barcodes.keys()
-        if os.path.exists(os.path.join(source_dir, f))
-    ]
-
-    if not existing_image_paths:
-        raise ValueError("Не найдено ни одного файла для размещения в PDF.")
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    layout: Optional[sheet_layout.SheetLayout] = None,
+    draft: Optional[str] = None,
+) -> Optional[bytes]:
+    """Размещает изображения штрих-кодов на листах A4 и сохраняет PDF.
 
-    try:
-        pdfmetrics.registerFont(TTFont("Verdana", "Verdana.ttf"))
-        font_name = "Verdana"
-    except Exception:
-        font_name = "Helvetica"
+    Если ``output_path`` не задан, документ возвращается в виде bytes.
+
+    Раскладка берётся из ``layout`` или строится ``plan_sheet``; при
+    ``page_settings["layout"] == "packed"`` этикетки упаковываются плотно.
+
+    При ``page_settings["source_type"] == "vector"`` этикетки рисуются как
+    векторный Code128 по коду OZN из имени файла с описанием из
+    ``descriptions.csv`` библиотеки (см. ``vector_labels``), и сами файлы
+    изображений не требуются.
+
+    ``draft`` (один из ``DRAFT_MODES``) строит черновик для предпросмотра с
+    той же геометрией страниц: вместо полных изображений — миниатюры или
+    рамки с именами файлов. На векторные этикетки не влияет.
+
+    При отмене через ``cancel_token`` (проверяется на границах страниц и групп)
+    выбрасывается ``OperationCancelled``; reportlab пишет файл только в
+    ``c.save()``, поэтому частично записанный документ не остаётся.
+    """
+    from reportlab.pdfgen import canvas
 
     if page_settings is None:
         page_settings = {}
+    vector = page_settings.get("source_type") == vector_labels.SOURCE_VECTOR
+    if layout is None:
+        layout = plan_sheet(selected_barcodes, source_dir, page_settings)
 
-    orientation = page_settings.get("orientation", "Книжная")
-    margins = page_settings.get(
-        "margins", {"top": 25, "bottom": 10, "left": 10, "right": 10}
-    )
+    check_cancelled = _cancel_checker(cancel_token)
+    reporter = ProgressReporter(progress)
+    labels_total = len(layout.placements)
+    labels_placed = 0
+    pages_done = 0
+    reporter.update(force=True, labels_total=labels_total)
+
+    font_name = _register_font()
+    margins = page_settings.get("margins", sheet_layout.DEFAULT_MARGINS)
 
-    page_size = landscape(A4) if orientation == "Альбомная" else A4
+    target, buffer = _open_output(output_path)
+    c = canvas.Canvas(target, pagesize=layout.page_size)
+    page_width, page_height = layout.page_size
 
-    c = canvas.Canvas(output_path, pagesize=page_size)
-    page_width, page_height = page_size
+    doc_title = title or _default_title(output_path)
+    header_y = page_height - margins["top"] * sheet_layout.MM + 10 * sheet_layout.MM
+    line_left = margins["left"] * sheet_layout.MM
+    line_right = page_width - margins["right"] * sheet_layout.MM
 
-    doc_title = title or os.path.splitext(os.path.basename(output_path))[0]
+    def start_page(page: int) -> None:
+        if page not in layout.headerless:
+            c.setFont(font_name, 12)
+            c.drawCentredString(page_width / 2.0, header_y, doc_title)
 
-    def draw_page_header(canvas_obj: canvas.Canvas) -> None:
-        canvas_obj.setFont(font_name, 12)
-        canvas_obj.drawCentredString(
-            page_width / 2.0, page_height - margins["top"] * mm + 10 * mm, doc_title
+    forms = images = prefetcher = None
+    if vector and layout.placements:
+        first = layout.placements[0]
+        forms = vector_labels.LabelForms(
+            c,
+            first.width,
+            first.height,
+            font_name,
+            vector_labels.load_descriptions(source_dir),
+        )
+    elif draft == DRAFT_OUTLINE:
+        images = _PlaceholderLabels(c, font_name)
+    elif not vector:
+        # Файлы декодируются в пуле потоков в порядке первого использования,
+        # пока главный поток пишет уже готовые
+        prefetcher = image_prefetch.ImagePrefetcher(
+            source_dir,
+            dict.fromkeys(p.filename for p in layout.placements),
+            loader=image_prefetch.load_thumbnail if draft == DRAFT_THUMBNAIL else None,
         )
+        images = image_prefetch.ImageForms(c, prefetcher)
 
-    draw_page_header(c)
-
-    # Задаем размеры и отступы в миллиметрах и конвертируем в пункты
-    img_draw_width = 45 * mm
-    margin_left = margins["left"] * mm
-    margin_right = margins["right"] * mm
-    margin_top = margins["top"] * mm
-    margin_bottom = margins["bottom"] * mm
-    gap_x = 2 * mm
-    gap_y = 5 * mm
-
-    # Определяем высоту изображения, сохраняя пропорции, чтобы избежать искажений
-    # Мы делаем это один раз на основе первого изображения в списке
-    with Image.open(existing_image_paths[0]) as img:
-        img_width_px, img_height_px = img.size
-    aspect_ratio = img_height_px / img_width_px
-    img_draw_height = img_draw_width * aspect_ratio
-
-    # Начальные координаты для первого изображения (левый верхний угол, с учетом отступов)
-    x = margin_left
-    y = page_height - margin_top - img_draw_height
-
-    barcode_types = list(selected_barcodes.keys())
-    for i, filename in enumerate(barcode_types):
-        quantity = selected_barcodes[filename]
-        full_path = os.path.join(source_dir, filename)
-
-        if not os.path.exists(full_path):
-            print(f"Warning: File not found and will be skipped: {full_path}")
-            continue
-
-        # Размещаем все экземпляры текущего типа штрих-кода
-        for _ in range(quantity):
-            # Проверяем, не выходим ли за правый край страницы
-            if x + img_draw_width > page_width - margin_right:
-                # Переходим на новую строку
-                x = margin_left
-                y -= img_draw_height + gap_y
-
-            # Проверяем, не выходим ли за нижний край страницы
-            if y < margin_bottom:
-                c.showPage()  # Завершаем текущую страницу
-                draw_page_header(c)  # Рисуем заголовок на новой странице
-                # Сбрасываем координаты для новой страницы
-                x = margin_left
-                y = page_height - margin_top - img_draw_height
-
-            # Рисуем изображение на холсте PDF
-            c.drawImage(full_path, x, y, width=img_draw_width, height=img_draw_height)
-
-            # Сдвигаем координату X для следующего изображения в ряду
-            x += img_draw_width + gap_x
-
-        # --- Рисуем разделительную линию после каждой группы (кроме последней) ---
-        is_last_group = i == len(barcode_types) - 1
-        if not is_last_group:
-            # Если группа закончилась не в начале строки, принудительно переходим на новую
-            if x != margin_left:
-                x = margin_left
-                y -= img_draw_height + gap_y
-
-            # Проверяем, не нужно ли перейти на новую страницу перед отрисовкой линии
-            if y < margin_bottom:
-                c.showPage()
-                y = page_height - margin_top - img_draw_height
-                continue  # Не рисуем линию в самом верху новой страницы
-
-            # Рисуем линию в промежутке между строками
-            line_y_pos = y + img_draw_height + (gap_y / 2)
+    separators: dict[int, list[float]] = {}
+    for page, line_y in layout.separators:
+        separators.setdefault(page, []).append(line_y)
+
+    def finish_page(page: int) -> None:
+        for line_y in separators.get(page, ()):
             c.setStrokeColorRGB(0.7, 0.7, 0.7)  # Светло-серый цвет
             c.setLineWidth(0.5)
-            c.line(margin_left, line_y_pos, page_width - margin_right, line_y_pos)
+            c.line(line_left, line_y, line_right, line_y)
 
-    c.save()
+    def next_page() -> None:
+        nonlocal current_page, pages_done
+        finish_page(current_page)
+        check_cancelled()
+        c.showPage()
+        pages_done += 1
+        current_page += 1
+        start_page(current_page)
+
+    start_page(0)
+    current_page = 0
+    draw_timer = instrumentation.accumulator("generate.draw_image")
+    try:
+        with instrumentation.span("generate.layout", labels=labels_total, mode=layout.mode):
+            previous = None
+            for placement in layout.placements:
+                while current_page < placement.page:
+                    next_page()
+                if placement.filename != previous:
+                    check_cancelled()
+                    previous = placement.filename
+
+                with draw_timer:
+                    if forms is not None:
+                        forms.draw(placement.filename, placement.x, placement.y)
+                    else:
+                        images.draw(
+                            placement.filename,
+                            placement.x,
+                            placement.y,
+                            placement.width,
+                            placement.height,
+                        )
+                labels_placed += 1
+                reporter.update(labels_placed=labels_placed, pages_done=pages_done)
+            while current_page < layout.pages - 1:
+                next_page()
+            finish_page(current_page)
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+    draw_timer.emit()
 
+    check_cancelled()
+    with instrumentation.span("generate.save", pages=pages_done + 1):
+        c.save()
+    reporter.finish(
+        labels_placed=labels_placed,
+        pages_done=pages_done + 1,
+        bytes_written=_bytes_written(output_path, buffer),
+    )
+    return buffer.getvalue() if buffer is not None else None
 
-def merge_pdfs(selected_pdfs: dict, source_dir: str, output_path: str) -> None:
+
+def append_pdf_from_barcodes(
+    selected_barcodes: dict,
+    source_dir: str,
+    output_path: str,
+    previous: sheet_layout.SheetLayout,
+    title: Optional[str] = None,
+    page_settings: Optional[dict] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    layout: Optional[sheet_layout.SheetLayout] = None,
+) -> Optional[int]:
+    """Дописывает изменения в уже созданный ``output_path`` без полной генерации.
+
+    ``previous`` — план, по которому файл был создан (с тем же ``title`` и
+    теми же изображениями). Страницы, совпадающие с новым планом, остаются в
+    файле как есть; заново рисуются только первая изменившаяся страница и
+    следующие за ней, а PDF сохраняется инкрементально — новые объекты
+    дописываются в конец файла. Каждое ``MAX_INCREMENTAL_SAVES``-е сохранение
+    полное, со сборкой мусора и объединением одинаковых изображений, чтобы
+    файл не рос без предела.
+
+    Возвращает число сохранённых без изменений страниц или ``None``, если
+    сохранить нечего (изменилась уже первая страница) или файл не
+    соответствует ``previous`` — тогда нужна обычная генерация.
+    """
+    import fitz  # PyMuPDF
+
+    if layout is None:
+        layout = plan_sheet(selected_barcodes, source_dir, page_settings)
+    kept = sheet_layout.common_pages(previous, layout)
+    if kept == 0:
+        return None
+
+    doc = fitz.open(output_path)
+    try:
+        if len(doc) != previous.pages or not doc.can_save_incrementally():
+            return None
+        if kept == layout.pages == len(doc):
+            return kept
+        compact = doc.version_count >= MAX_INCREMENTAL_SAVES
+        with instrumentation.span(
+            "generate.append", kept=kept, pages=layout.pages - kept, compact=compact
+        ):
+            tail = None
+            if kept < layout.pages:
+                tail = create_pdf_from_barcodes(
+                    selected_barcodes,
+                    source_dir,
+                    title=title or _default_title(output_path),
+                    page_settings=page_settings,
+                    progress=progress,
+                    cancel_token=cancel_token,
+                    layout=sheet_layout.slice_layout(layout, kept),
+                )
+            if kept < len(doc):
+                doc.delete_pages(from_page=kept, to_page=len(doc) - 1)
+            if tail is not None:
+                with fitz.open("pdf", tail) as tail_doc:
+                    doc.insert_pdf(tail_doc)
+            _cancel_checker(cancel_token)()
+            if not compact:
+                doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                return kept
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(output_path) or ".")
+            os.close(fd)
+            try:
+                doc.save(tmp_path, garbage=3, deflate=True)
+                doc.close()
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    finally:
+        if not doc.is_closed:
+            doc.close()
+    return kept
+
+
+class _PlaceholderLabels:
+    """Черновые этикетки: серая рамка с именем файла вместо изображения."""
+
+    FONT_SIZE = 6
+
+    def __init__(self, canvas, font_name: str):
+        self.canvas = canvas
+        self.font_name = font_name
+
+    def draw(self, filename: str, x: float, y: float, width: float, height: float) -> None:
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        c = self.canvas
+        c.setStrokeColorRGB(0.5, 0.5, 0.5)
+        c.setLineWidth(0.5)
+        c.rect(x, y, width, height)
+        text = os.path.splitext(filename)[0]
+        padding = 2
+        while text and stringWidth(text, self.font_name, self.FONT_SIZE) > width - 2 * padding:
+            text = text[:-1]
+        c.setFont(self.font_name, self.FONT_SIZE)
+        c.drawString(x + padding, y + (height - self.FONT_SIZE) / 2, text)
+
+
+def merge_pdfs(
+    selected_pdfs: dict,
+    source_dir: str,
+    output_path: OutputTarget = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+) -> Optional[bytes]:
+    """Объединяет PDF-файлы с учётом количества копий и сохраняет результат.
+
+    Если ``output_path`` не задан, документ возвращается в виде bytes.
+
+    Отмена проверяется перед каждой вставкой источника и перед сохранением.
+    """
+    import fitz  # PyMuPDF
+
+    check_cancelled = _cancel_checker(cancel_token)
+    reporter = ProgressReporter(progress)
+    sources_merged = 0
+    reporter.update(force=True, sources_total=sum(selected_pdfs.values()))
+
+    open_timer = instrumentation.accumulator("merge.open")
+    insert_timer = instrumentation.accumulator("merge.insert_pdf")
     result_pdf = fitz.open()
+    try:
+        for filename, quantity in selected_pdfs.items():
+            full_path = os.path.join(source_dir, filename)
+            if not library_source.exists(full_path):
+                sources_merged += quantity
+                continue
+            with open_timer:
+                source_pdf = library_source.open_pdf(full_path)
+            try:
+                for _ in range(quantity):
+                    check_cancelled()
+                    with insert_timer:
+                        result_pdf.insert_pdf(source_pdf)
+                    sources_merged += 1
+                    reporter.update(
+                        sources_merged=sources_merged, pages_done=len(result_pdf)
+                    )
+            finally:
+                source_pdf.close()
+
+        open_timer.emit()
+        insert_timer.emit(pages=len(result_pdf))
+        if len(result_pdf) == 0:
+            raise ValueError("Не найдено ни одного PDF-файла для объединения.")
+
+        check_cancelled()
+        target, buffer = _open_output(output_path)
+        with instrumentation.span("merge.save", pages=len(result_pdf)):
+            result_pdf.save(target)
+        reporter.finish(
+            sources_merged=sources_merged,
+            pages_done=len(result_pdf),
+            bytes_written=_bytes_written(output_path, buffer),
+        )
+        return buffer.getvalue() if buffer is not None else None
+    finally:
+        result_pdf.close()
+
+
+def combine_orders(
+    parts: list[tuple[str, Union[str, bytes], list[str]]],
+    output_path: OutputTarget = None,
+    header_pages: bool = True,
+    progress: Optional[ProgressCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+) -> tuple[Optional[bytes], list[dict]]:
+    """Собирает готовые документы нескольких заказов в один PDF для печати.
+
+    ``parts`` — список ``(имя заказа, путь или bytes PDF, строки заголовка)``.
+    Перед каждым заказом вставляется страница-заголовок того же формата, что
+    и первая страница заказа (при ``header_pages=False`` — не вставляется),
+    а в оглавление документа добавляется закладка на заказ.
+
+    Возвращает документ (bytes, если ``output_path`` не задан) и карту
+    страниц: для каждого заказа номера страницы-заголовка, первой и последней
+    страницы (с единицы).
+    """
+    import fitz  # PyMuPDF
+
+    check_cancelled = _cancel_checker(cancel_token)
+    reporter = ProgressReporter(progress)
+    reporter.update(force=True, sources_total=len(parts))
+
+    if not parts:
+        raise ValueError("Пакет не содержит ни одного заказа.")
+
+    result_pdf = fitz.open()
+    sources = []
+    try:
+        for _, document, _ in parts:
+            if isinstance(document, bytes):
+                sources.append(fitz.open(stream=document, filetype="pdf"))
+            else:
+                sources.append(fitz.open(document))
+
+        headers = None
+        if header_pages:
+            with instrumentation.span("combine.headers", orders=len(parts)):
+                headers = fitz.open(
+                    stream=_render_header_pages(
+                        [(lines, src[0].rect) for (_, _, lines), src in zip(parts, sources)]
+                    ),
+                    filetype="pdf",
+                )
+
+        insert_timer = instrumentation.accumulator("combine.insert_pdf")
+        page_map = []
+        toc = []
+        for index, ((name, _, _), source) in enumerate(zip(parts, sources)):
+            check_cancelled()
+            header_page = None
+            if headers is not None:
+                result_pdf.insert_pdf(headers, from_page=index, to_page=index)
+                header_page = len(result_pdf)
+            first_page = len(result_pdf) + 1
+            with insert_timer:
+                result_pdf.insert_pdf(source)
+            page_map.append(
+                {
+                    "order": name,
+                    "header_page": header_page,
+                    "first_page": first_page,
+                    "last_page": len(result_pdf),
+                }
+            )
+            toc.append([1, name, header_page or first_page])
+            reporter.update(sources_merged=index + 1, pages_done=len(result_pdf))
+        if headers is not None:
+            headers.close()
+        insert_timer.emit(pages=len(result_pdf))
+        result_pdf.set_toc(toc)
+
+        check_cancelled()
+        target, buffer = _open_output(output_path)
+        with instrumentation.span("combine.save", pages=len(result_pdf)):
+            result_pdf.save(target)
+        reporter.finish(
+            sources_merged=len(parts),
+            pages_done=len(result_pdf),
+            bytes_written=_bytes_written(output_path, buffer),
+        )
+        return (buffer.getvalue() if buffer is not None else None), page_map
+    finally:
+        for source in sources:
+            source.close()
+        result_pdf.close()
+
+
+def _render_header_pages(pages: list[tuple[list[str], object]]) -> bytes:
+    """Страницы-разделители заказов: по строкам текста на страницу размера ``rect``."""
+    from reportlab.pdfgen import canvas
+
+    font_name = _register_font()
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for lines, rect in pages:
+        width, height = rect.width, rect.height
+        c.setPageSize((width, height))
+        # Размер шрифта подбирается под формат: от листа A4 до ленточной этикетки
+        font_size = max(6.0, min(18.0, height / (len(lines) + 2) / 1.4, width / 25))
+        y = height - font_size * 2
+        for number, line in enumerate(lines):
+            c.setFont(font_name, font_size if number else font_size * 1.2)
+            c.drawCentredString(width / 2.0, y, line)
+            y -= font_size * 1.5
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _register_font() -> str:
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    try:
+        pdfmetrics.registerFont(TTFont("Verdana", "Verdana.ttf"))
+        return "Verdana"
+    except Exception:
+        return "Helvetica"
+
+
+def _open_output(output_path: OutputTarget) -> tuple[Union[str, BinaryIO], Optional[io.BytesIO]]:
+    if output_path is None:
+        buffer = io.BytesIO()
+        return buffer, buffer
+    return output_path, None
+
+
+def _default_title(output_path: OutputTarget) -> str:
+    if isinstance(output_path, str):
+        return os.path.splitext(os.path.basename(output_path))[0]
+    return ""
+
 
-    for filename, quantity in selected_pdfs.items():
-        full_path = os.path.join(source_dir, filename)
-        if os.path.exists(full_path):
-            source_pdf = fitz.open(full_path)
-            for _ in range(quantity):
-                result_pdf.insert_pdf(source_pdf)
-            source_pdf.close()
+def _bytes_written(output_path: OutputTarget, buffer: Optional[io.BytesIO]) -> int:
+    if buffer is not None:
+        return buffer.getbuffer().nbytes
+    if isinstance(output_path, str):
+        return os.path.getsize(output_path)
+    return output_path.tell()
 
-    if len(result_pdf) == 0:
-        raise ValueError("Не найдено ни одного PDF-файла для объединения.")
 
-    result_pdf.save(output_path)
-    result_pdf.close()
+def _cancel_checker(cancel_token: Optional[CancelToken]):
+    if cancel_token is None:
+        return lambda: None
+    return cancel_token.raise_if_cancelled
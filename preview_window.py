@@ -3,30 +3,58 @@ from __future__ import annotations
 import os
 import tkinter as tk
 from tkinter import messagebox, ttk
-
-import fitz
-import win32api
+from typing import Callable, Optional
 
 
 class PDFPreviewWindow(tk.Toplevel):
-
-    def __init__(self, parent, pdf_path: str, selected_printer: str | None):
+    """Окно предпросмотра PDF из файла или из памяти.
+
+    Для документа в памяти (``pdf_bytes``) файл создаётся только при печати
+    через ``save_for_print``, который должен вернуть путь к сохранённому PDF.
+    Сама отправка выполняется через ``send_to_printer(path, printer)`` —
+    очередь печати приложения; окно закрывается сразу после постановки в очередь.
+
+    Черновик (``print_action`` задан) на принтер не отправляется: кнопка
+    «Печать» вызывает ``print_action``, который печатает полный документ.
+    """
+
+    def __init__(
+        self,
+        parent,
+        pdf_path: Optional[str],
+        selected_printer: str | None,
+        delete_on_close: bool = True,
+        pdf_bytes: Optional[bytes] = None,
+        save_for_print: Optional[Callable[[bytes], str]] = None,
+        send_to_printer: Optional[Callable[[str, str], object]] = None,
+        print_action: Optional[Callable[[], object]] = None,
+    ):
         super().__init__(parent)
         self.parent = parent
         self.pdf_path = pdf_path
+        self.pdf_bytes = pdf_bytes
+        self.save_for_print = save_for_print
+        self.send_to_printer = send_to_printer
+        self.print_action = print_action
+        self.delete_on_close = delete_on_close and pdf_path is not None
         self.selected_printer = selected_printer
         self.doc = None
         self.current_page = 0
         self.total_pages = 0
         self.photo_image = None
 
-        self.title("Предпросмотр PDF")
+        self.title("Предпросмотр PDF (черновик)" if print_action else "Предпросмотр PDF")
         self.geometry("800x600")
         self.transient(parent)
         self.grab_set()
 
+        import fitz
+
         try:
-            self.doc = fitz.open(self.pdf_path)
+            if self.pdf_bytes is not None:
+                self.doc = fitz.open(stream=self.pdf_bytes, filetype="pdf")
+            else:
+                self.doc = fitz.open(self.pdf_path)
             self.total_pages = len(self.doc)
         except Exception as e:
             messagebox.showerror(
@@ -93,23 +121,32 @@ class PDFPreviewWindow(tk.Toplevel):
             self.load_page()
 
     def print_pdf(self):
+        if self.print_action is not None:
+            self.on_close()
+            self.print_action()
+            return
+
         if not self.selected_printer:
             messagebox.showerror("Ошибка печати", "Принтер не выбран.", parent=self)
             return
 
         try:
-            win32api.ShellExecute(
-                0, "printto", self.pdf_path, f'"{self.selected_printer}"', ".", 0
-            )
-            messagebox.showinfo("Печать", "Документ отправлен на печать.", parent=self)
-            self.on_close()
+            if self.pdf_path is None:
+                self.pdf_path = self.save_for_print(self.pdf_bytes)
         except Exception as e:
             messagebox.showerror(
-                "Ошибка", f"Не удалось отправить на печать:\n{e}", parent=self
+                "Ошибка", f"Не удалось подготовить документ к печати:\n{e}", parent=self
             )
+            return
+
+        # Файл теперь принадлежит очереди печати и не удаляется при закрытии
+        self.delete_on_close = False
+        self.send_to_printer(self.pdf_path, self.selected_printer)
+        self.on_close()
 
     def on_close(self):
         if self.doc:
             self.doc.close()
-        os.remove(self.pdf_path)
+        if self.delete_on_close:
+            os.remove(self.pdf_path)
         self.destroy()
@@ -0,0 +1,427 @@
+from __future__ import annotations
+
+import itertools
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import instrumentation
+import pdf_cache
+from cancellation import CancelToken
+from progress import ProgressCallback
+
+PENDING = "pending"
+PRINTING = "printing"
+SENT = "sent"
+FAILED = "failed"
+
+RASTER_EXTENSIONS = (".tif", ".tiff")
+
+
+class PrintBackend(ABC):
+    """Способ передачи готового PDF на принтер."""
+
+    name = "base"
+
+    @abstractmethod
+    def submit(self, path: str, printer: str) -> None:
+        """Передаёт файл на принтер; ошибка передачи — исключение."""
+
+    def submit_raster(self, path: str, printer: str) -> None:
+        """Передаёт на принтер многостраничный TIFF (см. ``RasterizingBackend``)."""
+        self.submit(path, printer)
+
+    def needs_prepare(self, path: str, printer: str) -> bool:
+        """Нужна ли файлу долгая подготовка (``prepare``) перед постановкой в очередь."""
+        return False
+
+    def prepare(
+        self,
+        path: str,
+        printer: str,
+        progress: Optional[ProgressCallback] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> str:
+        """Готовит файл к отправке и возвращает путь к тому, что нужно отправить."""
+        return path
+
+    def list_printers(self) -> list[str]:
+        return []
+
+    def default_printer(self) -> Optional[str]:
+        printers = self.list_printers()
+        return printers[0] if printers else None
+
+
+class ShellPrintBackend(PrintBackend):
+    """Печать через ассоциированное приложение Windows (``ShellExecute printto``)."""
+
+    name = "shell"
+
+    def submit(self, path: str, printer: str) -> None:
+        import win32api
+
+        win32api.ShellExecute(0, "printto", path, f'"{printer}"', ".", 0)
+
+    def submit_raster(self, path: str, printer: str) -> None:
+        """Печатает кадры TIFF через GDI: у TIFF нет надёжного обработчика ``printto``.
+
+        Кадр рисуется в масштабе 1:1 относительно листа — с учётом разрешения
+        принтера и непечатаемых полей, — чтобы размеры штрихкодов не менялись.
+        """
+        import win32con
+        import win32ui
+        from PIL import Image, ImageSequence, ImageWin
+
+        dc = win32ui.CreateDC()
+        dc.CreatePrinterDC(printer)
+        try:
+            device_dpi = dc.GetDeviceCaps(win32con.LOGPIXELSX), dc.GetDeviceCaps(win32con.LOGPIXELSY)
+            offset = (
+                dc.GetDeviceCaps(win32con.PHYSICALOFFSETX),
+                dc.GetDeviceCaps(win32con.PHYSICALOFFSETY),
+            )
+            dc.StartDoc(os.path.basename(path))
+            try:
+                with Image.open(path) as tiff:
+                    dpi = tiff.info.get("dpi", (72, 72))
+                    for frame in ImageSequence.Iterator(tiff):
+                        page = frame.convert("L")
+                        width = round(page.width * device_dpi[0] / dpi[0])
+                        height = round(page.height * device_dpi[1] / dpi[1])
+                        dc.StartPage()
+                        ImageWin.Dib(page).draw(
+                            dc.GetHandleOutput(),
+                            (-offset[0], -offset[1], width - offset[0], height - offset[1]),
+                        )
+                        dc.EndPage()
+                dc.EndDoc()
+            except BaseException:
+                dc.AbortDoc()
+                raise
+        finally:
+            dc.DeleteDC()
+
+    def list_printers(self) -> list[str]:
+        import win32print
+
+        return [
+            p[2]
+            for p in win32print.EnumPrinters(
+                win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
+            )
+        ]
+
+    def default_printer(self) -> Optional[str]:
+        import win32print
+
+        try:
+            return win32print.GetDefaultPrinter()
+        except RuntimeError:
+            return None
+
+
+class DirectoryPrintBackend(PrintBackend):
+    """Локальная замена принтера: каталог-спул или команда в стиле ``lpr``.
+
+    Без команды документ копируется в ``spool_dir/<принтер>/``. С командой
+    (например ``lpr -P {printer} {path}``) она выполняется для каждого задания,
+    а ненулевой код возврата считается ошибкой печати.
+    """
+
+    name = "directory"
+
+    def __init__(self, spool_dir: str, command: Optional[str] = None):
+        self.spool_dir = spool_dir
+        self.command = command
+        self._seq = itertools.count(1)
+
+    def submit(self, path: str, printer: str) -> None:
+        if self.command:
+            args = [
+                part.format(printer=printer, path=path)
+                for part in shlex.split(self.command)
+            ]
+            subprocess.run(args, check=True, capture_output=True)
+            return
+
+        printer_dir = os.path.join(self.spool_dir, _safe_name(printer))
+        os.makedirs(printer_dir, exist_ok=True)
+        target = os.path.join(
+            printer_dir, f"{time.time_ns()}_{next(self._seq):06d}_{os.path.basename(path)}"
+        )
+        shutil.copyfile(path, target)
+
+    def list_printers(self) -> list[str]:
+        if not os.path.isdir(self.spool_dir):
+            return ["local"]
+        printers = sorted(
+            entry.name for entry in os.scandir(self.spool_dir) if entry.is_dir()
+        )
+        return printers or ["local"]
+
+
+class RasterizingBackend(PrintBackend):
+    """Обёртка: PDF для выбранных принтеров сначала растрируется в TIFF.
+
+    Растрирование долгое, поэтому GUI выполняет ``prepare`` отдельным
+    заданием планировщика (с прогрессом и отменой) и ставит в очередь печати
+    уже готовый TIFF. TIFF передаётся обёрнутому бэкенду через
+    ``submit_raster``: ``printto`` для него не подходит. Страницы кэшируются
+    в ``rasterizer.Rasterizer``, поэтому повтор задания не рендерит их заново.
+    """
+
+    def __init__(self, inner: PrintBackend, rasterizer, printers: Optional[list[str]] = None):
+        self.inner = inner
+        self.rasterizer = rasterizer
+        self.printers = set(printers or ())
+        self.name = f"{inner.name}+raster"
+
+    def needs_prepare(self, path: str, printer: str) -> bool:
+        return path.lower().endswith(".pdf") and (not self.printers or printer in self.printers)
+
+    def prepare(
+        self,
+        path: str,
+        printer: str,
+        progress: Optional[ProgressCallback] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> str:
+        if not self.needs_prepare(path, printer):
+            return path
+        return self.rasterizer.rasterize(path, progress=progress, cancel_token=cancel_token).path
+
+    def submit(self, path: str, printer: str) -> None:
+        path = self.prepare(path, printer)
+        if path.lower().endswith(RASTER_EXTENSIONS):
+            self.inner.submit_raster(path, printer)
+        else:
+            self.inner.submit(path, printer)
+
+    def list_printers(self) -> list[str]:
+        return self.inner.list_printers()
+
+    def default_printer(self) -> Optional[str]:
+        return self.inner.default_printer()
+
+
+def create_backend(settings) -> PrintBackend:
+    """Создаёт бэкенд по настройкам печати (``config_manager.PrintSettings``)."""
+    if settings.backend == "directory":
+        return DirectoryPrintBackend(settings.spool_dir, settings.command or None)
+    return ShellPrintBackend()
+
+
+def _safe_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name) or "printer"
+
+
+@dataclass(eq=False)
+class PrintJob:
+    id: int
+    path: str
+    printer: str
+    state: str = PENDING
+    attempts: int = 0
+    error: Optional[Exception] = None
+    queued_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def latency(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.queued_at
+
+
+class PrintMetrics:
+    """Счётчики спулера: задержка отправки и пропускная способность."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self.started_at = time.monotonic()
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.bytes_sent = 0
+
+    def record_submit(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def record_result(self, job: PrintJob, size: int) -> None:
+        with self._lock:
+            if job.state == SENT:
+                self.sent += 1
+                self.bytes_sent += size
+                self._latencies.append(job.latency)
+            else:
+                self.failed += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.monotonic() - self.started_at
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "bytes_sent": self.bytes_sent,
+                "latency_p50": _percentile(latencies, 0.5),
+                "latency_p95": _percentile(latencies, 0.95),
+                "jobs_per_second": self.sent / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class PrintSpooler:
+    """Асинхронная очередь отправки на печать.
+
+    ``submit`` возвращается сразу. У каждого принтера своя очередь FIFO: в пул
+    потоков задание попадает, только когда у его принтера есть свободное
+    место (не более ``per_printer_limit`` одновременно), поэтому очередь
+    одного принтера не занимает потоки, нужные другим. Ошибки отправки
+    повторяются. Колбэки передаются через ``dispatch`` (в GUI — в главный
+    поток Tk).
+    """
+
+    def __init__(
+        self,
+        backend: PrintBackend,
+        max_workers: int = 4,
+        per_printer_limit: int = 1,
+        max_retries: int = 2,
+        retry_delay: float = 1.0,
+        dispatch: Optional[Callable[[Callable[[], None]], None]] = None,
+    ):
+        self.backend = backend
+        self.per_printer_limit = per_printer_limit
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.dispatch = dispatch or (lambda fn: fn())
+        self.metrics = PrintMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="print")
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # Задания, ждущие свободного места у своего принтера
+        self._queues: Dict[str, deque] = {}
+        # Сколько заданий каждого принтера сейчас в пуле потоков
+        self._active: Dict[str, int] = {}
+        self._closed = False
+        self._ids = itertools.count(1)
+
+    def submit(
+        self,
+        path: str,
+        printer: str,
+        on_done: Optional[Callable[[PrintJob], None]] = None,
+        on_error: Optional[Callable[[PrintJob], None]] = None,
+    ) -> PrintJob:
+        job = PrintJob(next(self._ids), path, printer)
+        # Файл из кэша не должен быть вытеснен, пока задание в очереди
+        pdf_cache.pin(path)
+        with self._lock:
+            if self._closed:
+                pdf_cache.unpin(path)
+                raise RuntimeError("Очередь печати остановлена")
+            self._queues.setdefault(printer, deque()).append((job, on_done, on_error))
+        self.metrics.record_submit()
+        self._start_next(printer)
+        return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает очередь; с ``wait`` сначала отправляет все задания."""
+        with self._lock:
+            if wait:
+                while any(self._queues.values()) or any(self._active.values()):
+                    self._idle.wait()
+            self._closed = True
+            dropped = [entry for queue in self._queues.values() for entry in queue]
+            self._queues.clear()
+        for job, _, _ in dropped:
+            job.state = FAILED
+            job.error = RuntimeError("Очередь печати остановлена")
+            pdf_cache.unpin(job.path)
+            job.done.set()
+        self._executor.shutdown(wait=wait)
+
+    def _start_next(self, printer: str) -> None:
+        """Передаёт в пул очередные задания принтера, пока у него есть места."""
+        while True:
+            with self._lock:
+                queue = self._queues.get(printer)
+                if (
+                    self._closed
+                    or not queue
+                    or self._active.get(printer, 0) >= self.per_printer_limit
+                ):
+                    return
+                entry = queue.popleft()
+                self._active[printer] = self._active.get(printer, 0) + 1
+            self._executor.submit(self._run, *entry)
+
+    def _run(self, job: PrintJob, on_done, on_error) -> None:
+        try:
+            self._send(job)
+        finally:
+            pdf_cache.unpin(job.path)
+            job.done.set()
+            with self._lock:
+                self._active[job.printer] -= 1
+                self._idle.notify_all()
+            self._start_next(job.printer)
+
+        callback = on_done if job.state == SENT else on_error
+        if callback is not None:
+            self.dispatch(lambda: callback(job))
+
+    def _send(self, job: PrintJob) -> None:
+        job.state = PRINTING
+        queued_ms = round((time.monotonic() - job.queued_at) * 1000, 3)
+        while True:
+            job.attempts += 1
+            try:
+                with instrumentation.span(
+                    "print.submit",
+                    backend=self.backend.name,
+                    printer=job.printer,
+                    attempt=job.attempts,
+                    queued_ms=queued_ms,
+                ):
+                    self.backend.submit(job.path, job.printer)
+                job.state = SENT
+                break
+            except Exception as exc:
+                job.error = exc
+                if job.attempts > self.max_retries:
+                    job.state = FAILED
+                    break
+                self.metrics.record_retry()
+                time.sleep(self.retry_delay * job.attempts)
+        job.finished_at = time.monotonic()
+        try:
+            size = os.path.getsize(job.path)
+        except OSError:
+            size = 0
+        self.metrics.record_result(job, size)
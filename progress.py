@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import dataclasses
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Минимальный интервал между вызовами колбэка прогресса, в секундах
+DEFAULT_INTERVAL = 0.2
+
+
+@dataclass
+class Progress:
+    labels_placed: int = 0
+    labels_total: int = 0
+    pages_done: int = 0
+    sources_merged: int = 0
+    sources_total: int = 0
+    bytes_written: int = 0
+    elapsed: float = 0.0
+    finished: bool = False
+
+    @property
+    def fraction(self) -> float:
+        if self.finished:
+            return 1.0
+        if self.labels_total:
+            return self.labels_placed / self.labels_total
+        if self.sources_total:
+            return self.sources_merged / self.sources_total
+        return 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Оценка оставшегося времени в секундах или None, если данных мало."""
+        fraction = self.fraction
+        if fraction <= 0 or self.elapsed <= 0:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+class ProgressReporter:
+    """Накопитель прогресса с ограничением частоты вызова колбэка.
+
+    Колбэк получает копию состояния и вызывается не чаще одного раза в
+    ``min_interval`` секунд, поэтому ``update`` можно звать из горячего цикла.
+    Без колбэка все методы ничего не делают.
+    """
+
+    def __init__(
+        self, callback: Optional[ProgressCallback], min_interval: float = DEFAULT_INTERVAL
+    ):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.state = Progress()
+        self._started = time.monotonic()
+        self._last_emit = 0.0
+
+    def update(self, force: bool = False, **fields) -> None:
+        if self.callback is None:
+            return
+        for name, value in fields.items():
+            setattr(self.state, name, value)
+        now = time.monotonic()
+        if force or now - self._last_emit >= self.min_interval:
+            self._last_emit = now
+            self.state.elapsed = now - self._started
+            self.callback(dataclasses.replace(self.state))
+
+    def finish(self, **fields) -> None:
+        self.update(force=True, finished=True, **fields)
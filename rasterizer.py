@@ -0,0 +1,276 @@
+"""Предварительное растрирование заданий в битмап с разрешением принтера.
+
+Некоторые принтеры очень медленно растрируют PDF сами. Для них документ
+заранее переводится в многостраничный TIFF: страницы рендерит PyMuPDF в пуле
+процессов с нужным DPI, 1-битные страницы сжимаются CCITT G4, 8-битные —
+deflate. Каждая отрендеренная страница кэшируется по хэшу её содержимого,
+поэтому повторные задания (и одинаковые страницы разных заданий) заново не
+растрируются, а готовый TIFF всего задания берётся из кэша целиком.
+"""
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Optional
+
+import instrumentation
+from cancellation import CancelToken
+import pdf_cache
+from pdf_cache import PdfCache
+from progress import ProgressCallback, ProgressReporter
+
+DEFAULT_DPI = 300
+BIT_DEPTHS = (1, 8)
+# Как часто главный поток проверяет отмену, пока страницы рендерятся
+POLL_INTERVAL = 0.2
+# Меньше стольких страниц пул процессов не запускается: его запуск дороже
+MIN_PAGES_FOR_POOL = 4
+
+
+@dataclass
+class RasterResult:
+    path: str
+    pages: int
+    # Сколько страниц взято из кэша без рендеринга
+    cached_pages: int
+    # Весь TIFF задания уже был в кэше
+    cached: bool = False
+
+
+def page_hashes(doc) -> list[str]:
+    """SHA-256 каждой страницы как отдельного документа (вместе с ресурсами).
+
+    Одинаковые страницы разных документов дают одинаковый хэш: страница
+    копируется в пустой документ и сохраняется без случайного /ID.
+    """
+    import fitz  # PyMuPDF
+
+    hashes = []
+    for index in range(len(doc)):
+        single = fitz.open()
+        try:
+            single.insert_pdf(doc, from_page=index, to_page=index)
+            data = single.tobytes(garbage=3, no_new_id=True)
+        finally:
+            single.close()
+        hashes.append(hashlib.sha256(data).hexdigest())
+    return hashes
+
+
+def render_page(page, dpi: int, bit_depth: int):
+    """Страница PyMuPDF как изображение Pillow: ``1`` (порог без растра) или ``L``."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    if bit_depth == 1:
+        # Штрихкоды: жёсткий порог, без диффузии ошибки по краям штрихов
+        img = img.point(lambda v: 255 if v >= 128 else 0).convert("1", dither=Image.Dither.NONE)
+    return img
+
+
+def _save_tiff(images, path: str, dpi: int, bit_depth: int) -> None:
+    images = iter(images)
+    first = next(images)
+    first.save(
+        path,
+        format="TIFF",
+        compression="group4" if bit_depth == 1 else "tiff_deflate",
+        dpi=(dpi, dpi),
+        save_all=True,
+        append_images=images,
+    )
+
+
+def _render_pages(
+    pdf_path: str, indices: list[int], dpi: int, bit_depth: int, out_dir: str
+) -> list[tuple[int, str]]:
+    """Рендерит страницы во временные TIFF в ``out_dir`` (выполняется в дочернем процессе)."""
+    import fitz  # PyMuPDF
+
+    rendered = []
+    with fitz.open(pdf_path) as doc:
+        for index in indices:
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=out_dir)
+            os.close(fd)
+            try:
+                _save_tiff([render_page(doc[index], dpi, bit_depth)], tmp_path, dpi, bit_depth)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            rendered.append((index, tmp_path))
+    return rendered
+
+
+class Rasterizer:
+    """Растрирование PDF в TIFF с кэшем страниц и готовых заданий.
+
+    ``cache_dir`` содержит подкаталоги ``pages`` (страницы по хэшу) и
+    ``jobs`` (TIFF заданий по набору страниц); общий объём ограничен
+    ``max_bytes`` с вытеснением давно не использованных файлов.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        dpi: int = DEFAULT_DPI,
+        bit_depth: int = 1,
+        workers: Optional[int] = None,
+    ):
+        if bit_depth not in BIT_DEPTHS:
+            raise ValueError(f"Недопустимая глубина цвета: {bit_depth}")
+        self.dpi = dpi
+        self.bit_depth = bit_depth
+        self.workers = workers or os.cpu_count() or 1
+        # Страницы занимают основную часть объёма, готовые задания — остаток
+        self.pages = PdfCache(os.path.join(cache_dir, "pages"), max_bytes * 3 // 4, suffix=".tif")
+        self.jobs = PdfCache(os.path.join(cache_dir, "jobs"), max_bytes // 4, suffix=".tif")
+
+    def rasterize(
+        self,
+        pdf_path: str,
+        output_path: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> RasterResult:
+        """Растрирует ``pdf_path``; без ``output_path`` TIFF остаётся в кэше заданий."""
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as doc:
+            with instrumentation.span("raster.hash", pages=len(doc)):
+                hashes = page_hashes(doc)
+        suffix = f"-{self.dpi}-{self.bit_depth}"
+        keys = [digest + suffix for digest in hashes]
+        job_key = hashlib.sha256("".join(keys).encode("ascii")).hexdigest() + suffix
+
+        job_path = self.jobs.get(job_key)
+        if job_path is not None:
+            return RasterResult(
+                self._export(job_path, output_path), len(keys), len(keys), cached=True
+            )
+
+        reporter = ProgressReporter(progress)
+        reporter.update(force=True, labels_total=len(keys))
+        copies = Counter(keys)
+        # Одинаковые страницы внутри задания рендерятся один раз
+        first_index: dict[str, int] = {}
+        for index, key in enumerate(keys):
+            first_index.setdefault(key, index)
+        # Страницы задания не вытесняются другими заданиями до конца сборки
+        page_paths = [self.pages.path_for(key) for key in first_index]
+        for path in page_paths:
+            pdf_cache.pin(path)
+        try:
+            to_render = [
+                index for key, index in first_index.items() if self.pages.get(key) is None
+            ]
+            cached_pages = len(keys) - sum(copies[keys[index]] for index in to_render)
+            done = cached_pages
+
+            def rendered(index: int, tmp_path: str) -> None:
+                nonlocal done
+                self.pages.commit(keys[index], tmp_path)
+                done += copies[keys[index]]
+                reporter.update(labels_placed=done, pages_done=done)
+
+            with instrumentation.span(
+                "raster.render", pages=len(to_render), cached=cached_pages, dpi=self.dpi
+            ):
+                self._render(pdf_path, to_render, rendered, cancel_token)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            with instrumentation.span("raster.assemble", pages=len(keys)):
+                job_path, _ = self.jobs.get_or_create(
+                    job_key,
+                    lambda out: _save_tiff(
+                        self._cached_pages(keys, cancel_token), out, self.dpi, self.bit_depth
+                    ),
+                )
+        finally:
+            for path in page_paths:
+                pdf_cache.unpin(path)
+        reporter.finish(labels_placed=len(keys), pages_done=len(keys))
+        return RasterResult(self._export(job_path, output_path), len(keys), cached_pages)
+
+    def _cached_pages(self, keys: list[str], cancel_token: Optional[CancelToken] = None):
+        from PIL import Image
+
+        for key in keys:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            path = self.pages.get(key)
+            if path is None:
+                raise OSError(f"Страница {key[:12]} вытеснена из кэша во время сборки")
+            with Image.open(path) as img:
+                img.load()
+                yield img.copy()
+
+    def _render(self, pdf_path, indices, rendered, cancel_token) -> None:
+        if not indices:
+            return
+        out_dir = self.pages.cache_dir
+        workers = min(self.workers, len(indices))
+        if workers == 1 or len(indices) < MIN_PAGES_FOR_POOL:
+            for index in indices:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                for page_index, tmp_path in _render_pages(
+                    pdf_path, [index], self.dpi, self.bit_depth, out_dir
+                ):
+                    rendered(page_index, tmp_path)
+            return
+
+        # Каждый процесс получает страницы через одну, чтобы нагрузка была ровной
+        chunks = [indices[start::workers] for start in range(workers)]
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        pending = set()
+        try:
+            pending = {
+                pool.submit(_render_pages, pdf_path, chunk, self.dpi, self.bit_depth, out_dir)
+                for chunk in chunks
+            }
+            while pending:
+                finished, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                for future in finished:
+                    for page_index, tmp_path in future.result():
+                        rendered(page_index, tmp_path)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            # Страницы, дорендеренные после отмены или ошибки, тоже идут в кэш
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    for page_index, tmp_path in future.result():
+                        rendered(page_index, tmp_path)
+
+    @staticmethod
+    def _export(job_path: str, output_path: Optional[str]) -> str:
+        if output_path is None:
+            return job_path
+        shutil.copyfile(job_path, output_path)
+        return output_path
+
+
+def create_rasterizer(settings, cache_dir: str) -> Optional[Rasterizer]:
+    """Растеризатор по ``config_manager.RasterSettings`` или ``None``, если он выключен."""
+    if not settings.enabled:
+        return None
+    return Rasterizer(
+        os.path.join(cache_dir, "raster"),
+        settings.max_mb * 1024 * 1024,
+        dpi=settings.dpi,
+        bit_depth=settings.bit_depth,
+        workers=settings.workers or None,
+    )
@@ -4,6 +4,8 @@ import tkinter as tk
 from tkinter import ttk
 from typing import Dict
 
+from list_model import merge_sorted
+
 
 class RibbonBarcodeSelectionTab(ttk.Frame):
     """Вкладка выбора штрих‑кодов для печати с ленты."""
@@ -12,6 +14,7 @@ class RibbonBarcodeSelectionTab(ttk.Frame):
         super().__init__(parent, *args, **kwargs)
         self.app = app
         self.checkbox_vars: Dict[str, tk.IntVar] = {}
+        self.checkboxes: Dict[str, ttk.Checkbutton] = {}
         self.create_widgets()
 
     def create_widgets(self) -> None:
@@ -72,11 +75,48 @@ class RibbonBarcodeSelectionTab(ttk.Frame):
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
         self.checkbox_vars.clear()
+        self.checkboxes.clear()
+        self.append_files(files)
+
+    def append_files(self, files: list[str]) -> None:
         for filename in files:
             var = tk.IntVar()
             cb = ttk.Checkbutton(self.scrollable_frame, text=filename, variable=var)
             cb.pack(anchor="w", padx=10, pady=2, fill="x")
             self.checkbox_vars[filename] = var
+            self.checkboxes[filename] = cb
+
+    def finish_loading(self, sorted_files: list[str]) -> None:
+        if list(self.checkboxes) == sorted_files:
+            return
+        for cb in self.checkboxes.values():
+            cb.pack_forget()
+        for filename in sorted_files:
+            self.checkboxes[filename].pack(anchor="w", padx=10, pady=2, fill="x")
+        self.checkboxes = {f: self.checkboxes[f] for f in sorted_files}
+        self.checkbox_vars = {f: self.checkbox_vars[f] for f in sorted_files}
+
+    def apply_library_changes(self, changes) -> None:
+        for filename in changes.removed:
+            cb = self.checkboxes.pop(filename, None)
+            if cb is not None:
+                cb.destroy()
+                del self.checkbox_vars[filename]
+
+        order, anchors = merge_sorted(list(self.checkboxes), changes.added)
+        if not anchors:
+            return
+        for filename, before in anchors:
+            var = tk.IntVar()
+            cb = ttk.Checkbutton(self.scrollable_frame, text=filename, variable=var)
+            if before is not None:
+                cb.pack(anchor="w", padx=10, pady=2, fill="x", before=self.checkboxes[before])
+            else:
+                cb.pack(anchor="w", padx=10, pady=2, fill="x")
+            self.checkboxes[filename] = cb
+            self.checkbox_vars[filename] = var
+        self.checkboxes = {f: self.checkboxes[f] for f in order}
+        self.checkbox_vars = {f: self.checkbox_vars[f] for f in order}
 
     def add_selected_to_ribbon_list(self) -> None:
         self.app.add_pdfs_from_ribbon_selection_tab(self.checkbox_vars)
@@ -1,18 +1,24 @@
 from __future__ import annotations
 
+import bisect
 import os
-import tempfile
-import threading
-import tkinter as tk
 from tkinter import messagebox, ttk
-from typing import Dict, Optional
-
-import fitz
-import win32api
-from PIL import Image, ImageTk
-
+from typing import TYPE_CHECKING, Dict, Optional
+
+import cancellation
+import job_scheduler
+import library_scanner
+import library_source
+import library_watcher
+import list_model
+import order_batcher
+import output_parts
+import pdf_cache
 import pdf_generator
 
+if TYPE_CHECKING:
+    from PIL import ImageTk
+
 
 class RibbonPrintTab(ttk.Frame):
 
@@ -20,8 +26,9 @@ class RibbonPrintTab(ttk.Frame):
         super().__init__(parent, *args, **kwargs)
         self.app = app
         self.all_pdf_files: list[str] = []
-        self.selected_for_printing: Dict[str, int] = {}
         self.preview_image: Optional[ImageTk.PhotoImage] = None
+        self.preview_filename: Optional[str] = None
+        self._pdf_scanner: Optional[library_scanner.LibraryScanner] = None
         self.create_widgets()
 
     def create_widgets(self):
@@ -98,6 +105,10 @@ class RibbonPrintTab(ttk.Frame):
         self.print_list_view.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
+        self.print_list = list_model.QuantityListModel(
+            self.print_list_view, on_total_changed=self.update_total_count
+        )
+
         total_frame = ttk.Frame(list_frame)
         total_frame.pack(fill="x", side="bottom", pady=(5, 0))
         self.total_count_label = ttk.Label(total_frame, text="Всего для печати: 0")
@@ -111,6 +122,13 @@ class RibbonPrintTab(ttk.Frame):
         self.print_list_view.bind("<ButtonPress-1>", self.handle_list_click)
 
         # --- 3. Кнопки управления ---
+        import_button = ttk.Button(
+            left_panel,
+            text="Импорт CSV...",
+            command=self.import_csv,
+        )
+        import_button.pack(pady=(5, 0))
+
         clear_button = ttk.Button(
             left_panel,
             text="Убрать все",
@@ -139,21 +157,63 @@ class RibbonPrintTab(ttk.Frame):
         )
         self.preview_label.pack(fill="both", expand=True)
 
+    @property
+    def selected_for_printing(self) -> Dict[str, int]:
+        return self.print_list.items
+
     def load_pdf_list(self):
-        """Загружает список PDF-файлов из указанной директории."""
+        """Запускает фоновое сканирование директории с PDF-файлами."""
         self.clear_list(silent=True)
         self.pdf_selector.set("")
-        pdf_dir = self.app.cfg.pdf_source_dir
-
-        if not os.path.isdir(pdf_dir):
+        self.all_pdf_files = []
+        self.pdf_selector["values"] = []
+        self.app.ribbon_selection_tab.populate_files([])
+
+        self.app.library_watcher.unwatch("pdfs")
+        if self._pdf_scanner is not None:
+            self._pdf_scanner.cancel()
+            self._pdf_scanner = None
+        source_dir = self.app.cfg.pdf_source_dir
+        if self.app.catalog.is_synced(source_dir):
+            snapshot = self.app.catalog.snapshot(source_dir, library_scanner.PDF_EXTENSIONS)
+            self._on_pdf_batch(list(snapshot))
+            self._on_pdf_scan_done(None, known=snapshot)
+            return
+        self._pdf_scanner = library_scanner.LibraryScanner(
+            self.app,
+            self.app.cfg.pdf_source_dir,
+            library_scanner.PDF_EXTENSIONS,
+            on_batch=self._on_pdf_batch,
+            on_done=self._on_pdf_scan_done,
+        )
+        self._pdf_scanner.start()
+
+    def _on_pdf_batch(self, batch: list[str]) -> None:
+        """Принимает очередной пакет файлов от сканера."""
+        self.all_pdf_files.extend(batch)
+        self.app.ribbon_selection_tab.append_files(batch)
+
+    def _on_pdf_scan_done(
+        self, error: Exception | None, known: library_watcher.Snapshot | None = None
+    ) -> None:
+        """Завершает загрузку списка PDF после окончания сканирования."""
+        self._pdf_scanner = None
+        self.app.on_library_scan_finished("pdf_scan")
+        if error is not None:
             self.all_pdf_files = []
-            self.pdf_selector["values"] = []
             self.app.update_status("Папка с PDF не найдена. Укажите путь в Настройках.")
             return
 
-        self.all_pdf_files = sorted(
-            [f for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf")]
+        self.all_pdf_files.sort()
+        self.app.library_watcher.watch(
+            "pdfs",
+            self.app.cfg.pdf_source_dir,
+            library_scanner.PDF_EXTENSIONS,
+            self.apply_library_changes,
+            known=self.all_pdf_files if known is None else known,
         )
+        self.app.sync_catalog(self.app.cfg.pdf_source_dir, library_scanner.PDF_EXTENSIONS)
+        self.app.ribbon_selection_tab.finish_loading(self.all_pdf_files)
         self.pdf_selector["values"] = self.all_pdf_files
         if self.all_pdf_files:
             self.pdf_selector.current(0)
@@ -163,14 +223,35 @@ class RibbonPrintTab(ttk.Frame):
             self.app.update_status("В папке с PDF не найдено файлов.")
             self.show_pdf_preview(None)
 
+    def apply_library_changes(self, changes: library_watcher.LibraryChanges) -> None:
+        """Применяет изменения папки с PDF, не трогая список для печати."""
+        if changes.removed:
+            removed = set(changes.removed)
+            self.all_pdf_files = [f for f in self.all_pdf_files if f not in removed]
+        for filename in changes.added:
+            bisect.insort(self.all_pdf_files, filename)
+        self.filter_pdfs()
+        self.app.ribbon_selection_tab.apply_library_changes(changes)
+
+        if self.preview_filename in changes.removed or self.preview_filename in changes.modified:
+            self.show_pdf_preview(self.preview_filename)
+        self.app.report_library_changes(changes)
+        self.app.on_library_changed(
+            self.app.cfg.pdf_source_dir, library_scanner.PDF_EXTENSIONS, changes
+        )
+
     def filter_pdfs(self, event=None):
         """Фильтрует список PDF в Combobox."""
         search_term = self.pdf_selector.get().lower()
         if not search_term:
             self.pdf_selector["values"] = self.all_pdf_files
             return
-        filtered = [f for f in self.all_pdf_files if search_term in f.lower()]
-        self.pdf_selector["values"] = filtered
+        self.pdf_selector["values"] = self.app.search_library(
+            self.app.cfg.pdf_source_dir,
+            search_term,
+            self.all_pdf_files,
+            library_scanner.PDF_EXTENSIONS,
+        )
 
     def add_to_list(self):
         """Добавляет выбранный PDF в список на печать."""
@@ -187,47 +268,42 @@ class RibbonPrintTab(ttk.Frame):
             messagebox.showerror("Ошибка", "Количество должно быть целым числом > 0.")
             return
 
-        self.selected_for_printing[filename] = quantity
-        self.update_print_list_view()
+        self.print_list.set(filename, quantity)
         self.show_pdf_preview(filename)
         self.pdf_selector.set("")
         self.pdf_selector.focus_set()
         self.app.update_status(f"Добавлен: {filename} (x{quantity})")
 
-    def update_print_list_view(self):
-        """Обновляет Treeview со списком PDF."""
-        for i in self.print_list_view.get_children():
-            self.print_list_view.delete(i)
-        for filename, quantity in self.selected_for_printing.items():
-            self.print_list_view.insert("", tk.END, values=(filename, quantity, "❌"))
-        self.update_total_count()
-
-    def update_total_count(self):
-        total = sum(self.selected_for_printing.values())
+    def update_total_count(self, total: Optional[int] = None):
+        if total is None:
+            total = self.print_list.total
         self.total_count_label.config(text=f"Всего для печати: {total}")
 
     def add_selected_from_selection(self, checkbox_vars: dict) -> int:
         """Добавляет выбранные штрихкоды в список печати с ленты с количеством 1."""
-        added = 0
+        checked = []
         for filename, var in checkbox_vars.items():
             if var.get() == 1:
-                if filename not in self.selected_for_printing:
-                    self.selected_for_printing[filename] = 1
-                    added += 1
+                checked.append(filename)
                 var.set(0)
-        if added:
-            self.update_print_list_view()
-        return added
+        return self.print_list.add_missing(checked)
 
     def switch_to_self(self):
         self.app.notebook.select(self)
 
+    def import_csv(self):
+        """Заполняет список печати заказом из CSV-файла."""
+        self.app.import_order_csv(
+            self.app.cfg.pdf_source_dir,
+            library_scanner.PDF_EXTENSIONS,
+            self.all_pdf_files, self.print_list, "Импорт заказа: печать с ленты"
+        )
+
     def clear_list(self, silent: bool = False):
         """Очищает список для печати с ленты."""
-        if not self.selected_for_printing and not silent:
+        if not self.print_list and not silent:
             return
-        self.selected_for_printing.clear()
-        self.update_print_list_view()
+        self.print_list.clear()
         if not silent:
             self.show_pdf_preview(None)
             self.app.update_status("Список для печати с ленты очищен.")
@@ -237,12 +313,9 @@ class RibbonPrintTab(ttk.Frame):
         column_id = self.print_list_view.identify_column(event.x)
         if column_id == "#3":  # Столбец "Удалить"
             item_id = self.print_list_view.identify_row(event.y)
-            if item_id:
-                filename = self.print_list_view.item(item_id, "values")[0]
-                if filename in self.selected_for_printing:
-                    del self.selected_for_printing[filename]
-                    self.update_print_list_view()
-                    self.app.update_status(f"Удалено: {filename}")
+            filename = self.print_list.filename_of(item_id)
+            if filename and self.print_list.remove(filename):
+                self.app.update_status(f"Удалено: {filename}")
 
     def edit_list_item(self, event):
         """Обрабатывает двойной клик для редактирования количества."""
@@ -272,13 +345,11 @@ class RibbonPrintTab(ttk.Frame):
             if new_quantity <= 0:
                 raise ValueError("Количество должно быть положительным")
 
-            filename = self.print_list_view.item(item_id, "values")[0]
-            if filename in self.selected_for_printing:
-                self.selected_for_printing[filename] = new_quantity
+            filename = self.print_list.filename_of(item_id)
+            if filename in self.print_list:
+                self.print_list.set(filename, new_quantity)
                 self.app.update_status(f"Количество для '{filename}' обновлено.")
 
-            self.update_print_list_view()
-
         except ValueError:
             messagebox.showerror(
                 "Ошибка ввода", "Количество должно быть целым положительным числом."
@@ -288,19 +359,23 @@ class RibbonPrintTab(ttk.Frame):
 
     def show_pdf_preview(self, filename):
         """Отображает первую страницу PDF в области предпросмотра."""
+        self.preview_filename = filename
         if not filename:
             self.preview_label.config(image="", text="Выберите PDF-файл")
             self.preview_image = None
             return
 
-        filepath = os.path.join(self.app.cfg.pdf_source_dir, filename)
-        if not os.path.exists(filepath):
+        filepath = self.app.library_path(self.app.cfg.pdf_source_dir, filename)
+        if not library_source.exists(filepath):
             self.preview_label.config(image="", text="Файл не найден")
             self.preview_image = None
             return
 
+        import fitz
+        from PIL import Image, ImageTk
+
         try:
-            doc = fitz.open(filepath)
+            doc = library_source.open_pdf(filepath)
             if len(doc) == 0:
                 self.preview_label.config(image="", text="PDF пустой")
                 self.preview_image = None
@@ -339,8 +414,7 @@ class RibbonPrintTab(ttk.Frame):
         if not selected_items:
             return
 
-        item_id = selected_items[0]
-        filename = self.print_list_view.item(item_id, "values")[0]
+        filename = self.print_list.filename_of(selected_items[0])
         self.show_pdf_preview(filename)
 
     def process_ribbon_printing(self):
@@ -353,58 +427,75 @@ class RibbonPrintTab(ttk.Frame):
             messagebox.showerror("Ошибка", "Принтер для ленты не выбран в Настройках.")
             return
 
-        temp_fd, temp_path = tempfile.mkstemp(suffix=".pdf")
-        os.close(temp_fd)
+        selected_pdfs = dict(self.selected_for_printing)
+        pdf_dir = self.app.cfg.pdf_source_dir
+        printer = self.app.cfg.ribbon_printer
+        if self.app.cfg.print_settings.batch_orders:
+            self.app.queue_order(
+                self.app.new_order(order_batcher.KIND_RIBBON, selected_pdfs, printer, pdf_dir)
+            )
+            return
+
+        token = cancellation.CancelToken()
+        max_pages = self.app.cfg.print_settings.split_max_pages
+        max_labels = self.app.cfg.print_settings.split_max_labels
 
         def task():
-            pdf_generator.merge_pdfs(
-                self.selected_for_printing, self.app.cfg.pdf_source_dir, temp_path
-            )
-            win32api.ShellExecute(
-                0, "printto", temp_path, f'"{self.app.cfg.ribbon_printer}"', ".", 0
+            source_dir = self.app.readable_dir(pdf_dir, selected_pdfs, token)
+            if max_pages or max_labels:
+                pieces = output_parts.plan_merge(selected_pdfs, source_dir, max_pages, max_labels)
+                if len(pieces) > 1:
+                    paths, _ = self.app.pdf_cache.get_or_create_parts(
+                        pdf_cache.make_cache_key(
+                            "ribbon-parts",
+                            selected_pdfs,
+                            source_dir,
+                            {"split": [max_pages, max_labels]},
+                        ),
+                        len(pieces),
+                        lambda out_dir: [
+                            os.path.join(out_dir, part.file)
+                            for part in output_parts.merge_pdf_parts(
+                                selected_pdfs,
+                                source_dir,
+                                os.path.join(out_dir, "ribbon.pdf"),
+                                progress=self.app.make_progress_callback("Объединение PDF"),
+                                cancel_token=token,
+                                pieces=pieces,
+                            )
+                        ],
+                    )
+                    token.raise_if_cancelled()
+                    return paths
+            key = pdf_cache.make_cache_key("ribbon", selected_pdfs, source_dir)
+            path, _ = self.app.pdf_cache.get_or_create(
+                key,
+                lambda out: pdf_generator.merge_pdfs(
+                    selected_pdfs,
+                    source_dir,
+                    out,
+                    progress=self.app.make_progress_callback("Объединение PDF"),
+                    cancel_token=token,
+                ),
             )
-            return temp_path
+            token.raise_if_cancelled()
+            return [path]
 
-        def on_done(result):
-            self.app.update_status("Документ отправлен на печать. Готово.")
-            messagebox.showinfo("Готово", "Задание на печать успешно отправлено.")
-            self.app.after(2000, lambda: self._cleanup_temp(temp_path))
+        def on_done(paths):
+            if len(paths) > 1:
+                self.app.send_parts_to_printer(paths, printer)
+            else:
+                self.app.send_to_printer(paths[0], printer)
 
         def on_error(error):
             messagebox.showerror("Ошибка", f"Произошла ошибка:\n{error}")
             self.app.update_status("Ошибка при печати с ленты.")
-            self._cleanup_temp(temp_path)
-
-        self._run_ribbon_task(task, on_done, on_error)
-
-    def _run_ribbon_task(self, task, on_done, on_error):
-        """Запускает задачу в фоновом потоке (аналог _run_task из gui.py)."""
-        self.app.update_status("Объединение PDF-файлов...")
-        self.app.update_idletasks()
-
-        def _wrapper():
-            try:
-                result = task()
-                self.app.after(
-                    0, lambda res=result: self._ribbon_task_completed(on_done, on_error, res, None)
-                )
-            except Exception as exc:
-                self.app.after(
-                    0, lambda err=exc: self._ribbon_task_completed(on_done, on_error, None, err)
-                )
-
-        threading.Thread(target=_wrapper, daemon=True).start()
-
-    def _ribbon_task_completed(self, on_done, on_error, result, error):
-        if error:
-            on_error(error)
-        else:
-            on_done(result)
 
-    @staticmethod
-    def _cleanup_temp(path: str):
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except OSError:
-            pass
+        self.app._run_task(
+            task,
+            on_done,
+            on_error,
+            "Объединение PDF-файлов...",
+            job_scheduler.PRIORITY_PRINT,
+            cancel_token=token,
+        )
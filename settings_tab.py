@@ -3,9 +3,31 @@ from __future__ import annotations
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
-import win32print
-
 import config_manager
+import library_source
+import sheet_layout
+import vector_labels
+
+SOURCE_TYPE_LABELS = {
+    vector_labels.SOURCE_IMAGE: "Растровые (PNG из папки)",
+    vector_labels.SOURCE_VECTOR: "Векторные (Code128 по коду OZN)",
+}
+
+LAYOUT_LABELS = {
+    sheet_layout.LAYOUT_GRID: "По группам (каждая с новой строки)",
+    sheet_layout.LAYOUT_PACKED: "Плотная упаковка (меньше листов)",
+}
+
+PREVIEW_MODE_LABELS = {
+    "full": "Как при печати",
+    "thumbnail": "Черновик: миниатюры",
+    "outline": "Черновик: рамки с именами файлов",
+}
+
+ARCHIVE_FILETYPES = [
+    ("ZIP-архивы", " ".join(f"*{ext}" for ext in library_source.ARCHIVE_EXTENSIONS)),
+    ("Все файлы", "*.*"),
+]
 
 
 class SettingsTab(ttk.Frame):
@@ -21,7 +43,7 @@ class SettingsTab(ttk.Frame):
         )
         image_path_frame.pack(fill="x", padx=10, pady=10)
 
-        ttk.Label(image_path_frame, text="Папка со штрих-кодами:").grid(
+        ttk.Label(image_path_frame, text="Папка или ZIP-архив со штрих-кодами:").grid(
             row=0, column=0, sticky="w", pady=(0, 5)
         )
 
@@ -34,6 +56,10 @@ class SettingsTab(ttk.Frame):
             image_path_frame, text="Выбрать...", command=self.select_barcode_dir
         )
         browse_button.grid(row=1, column=1, sticky="w", padx=(10, 0), in_=image_path_frame)
+        archive_button = ttk.Button(
+            image_path_frame, text="Архив...", command=self.select_barcode_archive
+        )
+        archive_button.grid(row=1, column=2, sticky="w", padx=(5, 0), in_=image_path_frame)
 
         image_path_frame.columnconfigure(0, weight=1)
 
@@ -42,7 +68,7 @@ class SettingsTab(ttk.Frame):
         )
         pdf_path_frame.pack(fill="x", padx=10, pady=5)
 
-        ttk.Label(pdf_path_frame, text="Папка с PDF-файлами:").grid(
+        ttk.Label(pdf_path_frame, text="Папка или ZIP-архив с PDF-файлами:").grid(
             row=0, column=0, sticky="w", pady=(0, 5)
         )
         self.pdf_path_entry = ttk.Entry(pdf_path_frame, width=70)
@@ -54,6 +80,10 @@ class SettingsTab(ttk.Frame):
             pdf_path_frame, text="Выбрать...", command=self.select_pdf_source_dir
         )
         pdf_browse_button.grid(row=1, column=1, sticky="w", padx=(10, 0))
+        pdf_archive_button = ttk.Button(
+            pdf_path_frame, text="Архив...", command=self.select_pdf_source_archive
+        )
+        pdf_archive_button.grid(row=1, column=2, sticky="w", padx=(5, 0))
         pdf_path_frame.columnconfigure(0, weight=1)
 
         printer_frame = ttk.LabelFrame(self, text="Настройки печати", padding=15)
@@ -76,7 +106,6 @@ class SettingsTab(ttk.Frame):
         self.ribbon_printer_selector.bind("<<ComboboxSelected>>", self.on_ribbon_printer_select)
 
         printer_frame.columnconfigure(0, weight=1)
-        self.load_printers()
 
         page_settings_frame = ttk.LabelFrame(
             self, text="Настройки страницы (мм)", padding=15
@@ -124,6 +153,59 @@ class SettingsTab(ttk.Frame):
         )
         self.orientation_selector.set(self.app.cfg.page_settings.orientation)
 
+        ttk.Label(page_settings_frame, text="Этикетки:").grid(
+            row=3, column=0, sticky="w", pady=(10, 0)
+        )
+        self.source_type_selector = ttk.Combobox(
+            page_settings_frame,
+            state="readonly",
+            values=list(SOURCE_TYPE_LABELS.values()),
+        )
+        self.source_type_selector.grid(
+            row=3, column=1, columnspan=3, sticky="ew", pady=(10, 0)
+        )
+        self.source_type_selector.set(
+            SOURCE_TYPE_LABELS.get(
+                self.app.cfg.page_settings.source_type,
+                SOURCE_TYPE_LABELS[vector_labels.SOURCE_IMAGE],
+            )
+        )
+
+        ttk.Label(page_settings_frame, text="Раскладка:").grid(
+            row=4, column=0, sticky="w", pady=(10, 0)
+        )
+        self.layout_selector = ttk.Combobox(
+            page_settings_frame,
+            state="readonly",
+            values=list(LAYOUT_LABELS.values()),
+        )
+        self.layout_selector.grid(
+            row=4, column=1, columnspan=3, sticky="ew", pady=(10, 0)
+        )
+        self.layout_selector.set(
+            LAYOUT_LABELS.get(
+                self.app.cfg.page_settings.layout, LAYOUT_LABELS[sheet_layout.LAYOUT_GRID]
+            )
+        )
+
+        ttk.Label(page_settings_frame, text="Предпросмотр:").grid(
+            row=5, column=0, sticky="w", pady=(10, 0)
+        )
+        self.preview_mode_selector = ttk.Combobox(
+            page_settings_frame,
+            state="readonly",
+            values=list(PREVIEW_MODE_LABELS.values()),
+        )
+        self.preview_mode_selector.grid(
+            row=5, column=1, columnspan=3, sticky="ew", pady=(10, 0)
+        )
+        self.preview_mode_selector.set(
+            PREVIEW_MODE_LABELS.get(
+                self.app.cfg.preview_mode,
+                PREVIEW_MODE_LABELS[config_manager.DEFAULT_PREVIEW_MODE],
+            )
+        )
+
         self.margin_top_entry.bind("<FocusOut>", self.on_page_settings_change)
         self.margin_bottom_entry.bind("<FocusOut>", self.on_page_settings_change)
         self.margin_left_entry.bind("<FocusOut>", self.on_page_settings_change)
@@ -131,6 +213,15 @@ class SettingsTab(ttk.Frame):
         self.orientation_selector.bind(
             "<<ComboboxSelected>>", self.on_page_settings_change
         )
+        self.source_type_selector.bind(
+            "<<ComboboxSelected>>", self.on_page_settings_change
+        )
+        self.layout_selector.bind(
+            "<<ComboboxSelected>>", self.on_page_settings_change
+        )
+        self.preview_mode_selector.bind(
+            "<<ComboboxSelected>>", self.on_page_settings_change
+        )
 
     def on_page_settings_change(self, event=None):
         try:
@@ -139,7 +230,23 @@ class SettingsTab(ttk.Frame):
             self.app.cfg.page_settings.margin_left = int(self.margin_left_entry.get())
             self.app.cfg.page_settings.margin_right = int(self.margin_right_entry.get())
             self.app.cfg.page_settings.orientation = self.orientation_selector.get()
+            self.app.cfg.page_settings.source_type = next(
+                key
+                for key, label in SOURCE_TYPE_LABELS.items()
+                if label == self.source_type_selector.get()
+            )
+            self.app.cfg.page_settings.layout = next(
+                key
+                for key, label in LAYOUT_LABELS.items()
+                if label == self.layout_selector.get()
+            )
+            self.app.cfg.preview_mode = next(
+                key
+                for key, label in PREVIEW_MODE_LABELS.items()
+                if label == self.preview_mode_selector.get()
+            )
             self.app.save_config()
+            self.app.main_tab.update_total_count()
             self.app.update_status("Настройки страницы сохранены.")
         except ValueError:
             messagebox.showerror(
@@ -147,12 +254,8 @@ class SettingsTab(ttk.Frame):
             )
 
     def load_printers(self):
-        printers = [
-            p[2]
-            for p in win32print.EnumPrinters(
-                win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
-            )
-        ]
+        """Заполняет списки принтеров; вызывается после первой отрисовки окна."""
+        printers = self.app.print_backend.list_printers()
         self.printer_selector["values"] = printers
         if self.app.cfg.selected_printer in printers:
             self.printer_selector.set(self.app.cfg.selected_printer)
@@ -182,11 +285,22 @@ class SettingsTab(ttk.Frame):
         )
 
     def select_barcode_dir(self):
-        new_dir = filedialog.askdirectory(
-            title="Выберите папку со штрих-кодами",
-            initialdir=self.app.cfg.barcode_dir,
+        self._set_barcode_dir(
+            filedialog.askdirectory(
+                title="Выберите папку со штрих-кодами",
+                initialdir=self.app.cfg.barcode_dir,
+            )
+        )
+
+    def select_barcode_archive(self):
+        self._set_barcode_dir(
+            filedialog.askopenfilename(
+                title="Выберите ZIP-архив со штрих-кодами",
+                filetypes=ARCHIVE_FILETYPES,
+            )
         )
 
+    def _set_barcode_dir(self, new_dir: str) -> None:
         if new_dir and new_dir != self.app.cfg.barcode_dir:
             self.app.cfg.barcode_dir = new_dir
             self.app.update_status(f"Новый путь: {self.app.cfg.barcode_dir}")
@@ -200,11 +314,22 @@ class SettingsTab(ttk.Frame):
             self.app.load_barcode_list()
 
     def select_pdf_source_dir(self):
-        new_dir = filedialog.askdirectory(
-            title="Выберите папку с PDF-файлами",
-            initialdir=self.app.cfg.pdf_source_dir,
+        self._set_pdf_source_dir(
+            filedialog.askdirectory(
+                title="Выберите папку с PDF-файлами",
+                initialdir=self.app.cfg.pdf_source_dir,
+            )
+        )
+
+    def select_pdf_source_archive(self):
+        self._set_pdf_source_dir(
+            filedialog.askopenfilename(
+                title="Выберите ZIP-архив с PDF-файлами",
+                filetypes=ARCHIVE_FILETYPES,
+            )
         )
 
+    def _set_pdf_source_dir(self, new_dir: str) -> None:
         if new_dir and new_dir != self.app.cfg.pdf_source_dir:
             self.app.cfg.pdf_source_dir = new_dir
             self.app.update_status(f"Новый путь для PDF: {self.app.cfg.pdf_source_dir}")
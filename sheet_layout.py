@@ -0,0 +1,414 @@
+"""Раскладка этикеток по листам A4 без отрисовки.
+
+План (``SheetLayout``) содержит координаты каждой этикетки в пунктах PDF,
+разделительные линии и число страниц; ``pdf_generator`` только рисует по
+нему. Поддерживаются два режима:
+
+* ``grid`` — прежняя раскладка: каждая группа с новой строки, между группами
+  линия, высота всех этикеток по пропорциям первого изображения;
+* ``packed`` — плотная упаковка полками (shelf / NFDH): группы идут подряд
+  без принудительного перевода строки, этикетки разных пропорций
+  раскладываются по убыванию высоты, а ориентация листа выбирается та, при
+  которой страниц меньше.
+"""
+from __future__ import annotations
+
+import dataclasses
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, NamedTuple, Optional
+
+# Единицы reportlab (те же выражения, чтобы координаты совпадали до бита)
+CM = 72.0 / 2.54
+MM = CM * 0.1
+A4 = (210 * MM, 297 * MM)
+
+LABEL_WIDTH = 45 * MM
+GAP_X = 2 * MM
+GAP_Y = 5 * MM
+
+PORTRAIT = "Книжная"
+LANDSCAPE = "Альбомная"
+ORIENTATIONS = (PORTRAIT, LANDSCAPE)
+
+LAYOUT_GRID = "grid"
+LAYOUT_PACKED = "packed"
+LAYOUTS = (LAYOUT_GRID, LAYOUT_PACKED)
+
+DEFAULT_MARGINS = {"top": 25, "bottom": 10, "left": 10, "right": 10}
+
+
+class Placement(NamedTuple):
+    page: int
+    x: float
+    y: float
+    width: float
+    height: float
+    filename: str
+
+
+@dataclass
+class SheetLayout:
+    mode: str
+    orientation: str
+    page_size: tuple[float, float]
+    placements: list[Placement] = field(default_factory=list)
+    # (страница, y) разделительных линий между группами
+    separators: list[tuple[int, float]] = field(default_factory=list)
+    pages: int = 1
+    # Страницы без заголовка: в раскладке grid так выходит, когда разрыв
+    # страницы приходится на место разделительной линии
+    headerless: set[int] = field(default_factory=set)
+    # Сколько страниц заняла бы раскладка grid с настроенной ориентацией
+    baseline_pages: int = 1
+
+    @property
+    def saved_pages(self) -> int:
+        return self.baseline_pages - self.pages
+
+    def report(self) -> str:
+        """Текст для пользователя об экономии листов в режиме упаковки."""
+        if self.mode != LAYOUT_PACKED:
+            return f"Листов: {self.pages}"
+        text = f"Листов: {self.pages} вместо {self.baseline_pages} при раскладке по группам"
+        if self.saved_pages > 0:
+            percent = self.saved_pages * 100 / self.baseline_pages
+            text += f" (экономия {self.saved_pages}, {percent:.0f}%)"
+        return f"{text}; ориентация: {self.orientation.lower()}"
+
+
+def page_size(orientation: str) -> tuple[float, float]:
+    width, height = A4
+    return (height, width) if orientation == LANDSCAPE else (width, height)
+
+
+def _margins_pt(margins: Optional[dict]) -> tuple[float, float, float, float]:
+    margins = margins or DEFAULT_MARGINS
+    return (
+        margins["top"] * MM,
+        margins["bottom"] * MM,
+        margins["left"] * MM,
+        margins["right"] * MM,
+    )
+
+
+def plan_grid(
+    groups: list[tuple[str, int]],
+    aspect: float,
+    orientation: str = PORTRAIT,
+    margins: Optional[dict] = None,
+) -> SheetLayout:
+    """Прежняя раскладка по группам; координаты совпадают с историческими."""
+    page_width, page_height = size = page_size(orientation)
+    top, bottom, left, right = _margins_pt(margins)
+    width = LABEL_WIDTH
+    height = width * aspect
+    layout = SheetLayout(LAYOUT_GRID, orientation, size)
+    placements = layout.placements
+
+    page = 0
+    x = left
+    y = page_height - top - height
+    for i, (filename, quantity) in enumerate(groups):
+        for _ in range(quantity):
+            if x + width > page_width - right:
+                x = left
+                y -= height + GAP_Y
+            if y < bottom:
+                page += 1
+                x = left
+                y = page_height - top - height
+            placements.append(Placement(page, x, y, width, height, filename))
+            x += width + GAP_X
+
+        if i == len(groups) - 1:
+            break
+        # Следующая группа начинается с новой строки
+        if x != left:
+            x = left
+            y -= height + GAP_Y
+        if y < bottom:
+            page += 1
+            layout.headerless.add(page)
+            y = page_height - top - height
+            continue  # линия в самом верху новой страницы не рисуется
+        layout.separators.append((page, y + height + GAP_Y / 2))
+
+    layout.pages = layout.baseline_pages = page + 1
+    return layout
+
+
+def plan_packed(
+    groups: list[tuple[str, int]],
+    aspects: Dict[str, float],
+    orientation: str = PORTRAIT,
+    margins: Optional[dict] = None,
+) -> SheetLayout:
+    """Плотная упаковка полками с сортировкой групп по убыванию высоты.
+
+    Этикетки одной группы остаются рядом; при одинаковых пропорциях порядок
+    групп не меняется (сортировка устойчивая).
+    """
+    page_width, page_height = size = page_size(orientation)
+    top, bottom, left, right = _margins_pt(margins)
+    width = LABEL_WIDTH
+    layout = SheetLayout(LAYOUT_PACKED, orientation, size)
+    placements = layout.placements
+
+    page = 0
+    x = left
+    shelf_top = page_height - top
+    shelf_height = 0.0
+    page_empty = True
+    for filename, quantity in sorted(groups, key=lambda group: -aspects[group[0]]):
+        height = width * aspects[filename]
+        for _ in range(quantity):
+            if x + width > page_width - right and x != left:
+                shelf_top -= shelf_height + GAP_Y
+                x = left
+                shelf_height = 0.0
+            # Этикетка, не влезающая даже на пустой лист, ставится как в grid
+            if shelf_top - height < bottom and not page_empty:
+                page += 1
+                x = left
+                shelf_top = page_height - top
+                shelf_height = 0.0
+            placements.append(Placement(page, x, shelf_top - height, width, height, filename))
+            page_empty = False
+            shelf_height = max(shelf_height, height)
+            x += width + GAP_X
+
+    layout.pages = page + 1
+    return layout
+
+
+def plan_sheet(
+    groups: list[tuple[str, int]],
+    aspects: Dict[str, float],
+    page_settings: Optional[dict] = None,
+) -> SheetLayout:
+    """План для ``page_settings`` (формат ``PageSettings.to_dict``).
+
+    ``aspects`` — отношение высоты к ширине для каждого файла. В режиме grid
+    используется пропорция первого файла, как и раньше.
+    """
+    page_settings = page_settings or {}
+    orientation = page_settings.get("orientation", PORTRAIT)
+    margins = page_settings.get("margins", DEFAULT_MARGINS)
+    if not groups:
+        raise ValueError("Нет этикеток для раскладки.")
+
+    baseline = plan_grid(groups, aspects[groups[0][0]], orientation, margins)
+    if page_settings.get("layout", LAYOUT_GRID) != LAYOUT_PACKED:
+        return baseline
+
+    # Сначала настроенная ориентация: при равном числе листов остаётся она
+    candidates = [orientation] + [o for o in ORIENTATIONS if o != orientation]
+    best = min(
+        (plan_packed(groups, aspects, o, margins) for o in candidates),
+        key=lambda layout: layout.pages,
+    )
+    best.baseline_pages = baseline.pages
+    return best
+
+
+def split_layout(layout: SheetLayout, max_pages: int = 0, max_labels: int = 0) -> list[SheetLayout]:
+    """Делит план на части по целым страницам; 0 — без ограничения.
+
+    Страницы в каждой части нумеруются с нуля, геометрия не меняется, так что
+    части, напечатанные подряд, совпадают с цельным документом. Страница, на
+    которой этикеток больше ``max_labels``, всё равно образует свою часть.
+    """
+    per_page = Counter(p.page for p in layout.placements)
+    bounds = []
+    first = labels = 0
+    for page in range(layout.pages):
+        if page > first and (
+            (max_pages and page - first >= max_pages)
+            or (max_labels and labels + per_page[page] > max_labels)
+        ):
+            bounds.append((first, page))
+            first, labels = page, 0
+        labels += per_page[page]
+    bounds.append((first, layout.pages))
+
+    return [slice_layout(layout, first, end) for first, end in bounds]
+
+
+def slice_layout(layout: SheetLayout, first: int, end: Optional[int] = None) -> SheetLayout:
+    """Страницы ``first``…``end - 1`` плана как отдельный план (нумерация с нуля)."""
+    if end is None:
+        end = layout.pages
+    return dataclasses.replace(
+        layout,
+        placements=[
+            p._replace(page=p.page - first) for p in layout.placements if first <= p.page < end
+        ],
+        separators=[(page - first, y) for page, y in layout.separators if first <= page < end],
+        pages=end - first,
+        headerless={page - first for page in layout.headerless if first <= page < end},
+        baseline_pages=end - first,
+    )
+
+
+def common_pages(old: SheetLayout, new: SheetLayout) -> int:
+    """Сколько первых страниц двух планов рисуются одинаково.
+
+    Страница определяется своими этикетками, разделителями и наличием
+    заголовка; номеров страниц и общих итогов в документе нет.
+    """
+    if old.page_size != new.page_size:
+        return 0
+
+    def by_page(layout: SheetLayout) -> list[tuple[list, list, bool]]:
+        pages = [([], [], page not in layout.headerless) for page in range(layout.pages)]
+        for placement in layout.placements:
+            pages[placement.page][0].append(placement)
+        for page, y in layout.separators:
+            pages[page][1].append(y)
+        return pages
+
+    count = 0
+    for old_page, new_page in zip(by_page(old), by_page(new)):
+        if old_page != new_page:
+            break
+        count += 1
+    return count
+
+
+def _columns(page_width: float, left: float, right: float, guard: bool) -> int:
+    """Сколько этикеток встаёт в ряд при том же накоплении x, что и в планах.
+
+    ``guard`` — проверка ``x != left`` из ``plan_packed``: первая этикетка
+    ряда ставится всегда.
+    """
+    count = 0
+    x = left
+    while not (x + LABEL_WIDTH > page_width - right and (x != left or not guard)):
+        count += 1
+        x += LABEL_WIDTH + GAP_X
+    return count
+
+
+def _rows(page_height: float, top: float, bottom: float, height: float) -> int:
+    """Сколько рядов высоты ``height`` встаёт на чистый лист (как в ``plan_grid``)."""
+    count = 0
+    y = page_height - top - height
+    while y >= bottom:
+        count += 1
+        y -= height + GAP_Y
+    return count
+
+
+def _shelves(page_top: float, bottom: float, height: float) -> int:
+    """Сколько полок высоты ``height`` встаёт на чистый лист (как в ``plan_packed``)."""
+    count = 0
+    shelf_top = page_top
+    while shelf_top - height >= bottom:
+        count += 1
+        shelf_top -= height + GAP_Y
+    return count
+
+
+def _estimate_grid(groups, aspect, orientation, margins) -> Optional[int]:
+    page_width, page_height = page_size(orientation)
+    top, bottom, left, right = _margins_pt(margins)
+    per_row = _columns(page_width, left, right, guard=False)
+    rows = _rows(page_height, top, bottom, LABEL_WIDTH * aspect)
+    if not per_row or not rows:
+        return None  # вырожденная геометрия: считает полный план
+    capacity = per_row * rows
+
+    # slot — сколько мест на текущей странице занято (с учётом начатого ряда)
+    page = slot = 0
+    last = len(groups) - 1
+    for i, (_, quantity) in enumerate(groups):
+        if quantity > 0:
+            added = (slot + quantity - 1) // capacity
+            page += added
+            slot += quantity - added * capacity
+        if i == last:
+            break
+        if quantity > 0:
+            # Следующая группа — с новой строки
+            slot = -(-slot // per_row) * per_row
+        if slot >= capacity:
+            page += 1
+            slot = 0
+    return page + 1
+
+
+def _estimate_packed(groups, aspects, orientation, margins) -> Optional[int]:
+    page_width, page_height = page_size(orientation)
+    top, bottom, left, right = _margins_pt(margins)
+    per_row = _columns(page_width, left, right, guard=True)
+    page_top = page_height - top
+    rows_cache: Dict[float, int] = {}
+
+    page = 0
+    shelf_top = page_top
+    shelf_height = 0.0
+    column = 0
+    page_empty = fresh = True
+    for filename, quantity in sorted(groups, key=lambda group: -aspects[group[0]]):
+        height = LABEL_WIDTH * aspects[filename]
+        if page_top - height < bottom:
+            return None  # этикетка выше листа
+        rows = rows_cache.get(height)
+        if rows is None:
+            rows = rows_cache[height] = _shelves(page_top, bottom, height)
+        remaining = quantity
+        while remaining > 0:
+            if column == per_row:
+                shelf_top -= shelf_height + GAP_Y
+                column = 0
+                shelf_height = 0.0
+            if column == 0:
+                if shelf_top - height < bottom and not page_empty:
+                    page += 1
+                    shelf_top = page_top
+                    fresh = True
+                if fresh:
+                    # Целые листы, занятые этой группой, пропускаются сразу
+                    full = (remaining - 1) // (per_row * rows)
+                    page += full
+                    remaining -= full * per_row * rows
+                shelf_height = max(shelf_height, height)
+            placed = min(remaining, per_row - column)
+            column += placed
+            remaining -= placed
+            page_empty = fresh = False
+    return page + 1
+
+
+def estimate_pages(
+    groups: list[tuple[str, int]],
+    aspects: Dict[str, float],
+    page_settings: Optional[dict] = None,
+) -> int:
+    """Число листов, которое даст ``plan_sheet``, без построения раскладки.
+
+    Работа на группу не зависит от количества этикеток в ней: ряды и полки
+    считаются арифметикой по тем же накопленным координатам, что и в
+    планах, поэтому результат совпадает с генератором точно. ``aspects`` —
+    как в ``plan_sheet`` (в режиме grid нужна пропорция только первой группы).
+    """
+    if not groups:
+        return 0
+    page_settings = page_settings or {}
+    orientation = page_settings.get("orientation", PORTRAIT)
+    margins = page_settings.get("margins", DEFAULT_MARGINS)
+
+    if page_settings.get("layout", LAYOUT_GRID) != LAYOUT_PACKED:
+        pages = _estimate_grid(groups, aspects[groups[0][0]], orientation, margins)
+        if pages is None:
+            pages = plan_grid(groups, aspects[groups[0][0]], orientation, margins).pages
+        return pages
+
+    best = None
+    for candidate in ORIENTATIONS:
+        pages = _estimate_packed(groups, aspects, candidate, margins)
+        if pages is None:
+            pages = plan_packed(groups, aspects, candidate, margins).pages
+        best = pages if best is None else min(best, pages)
+    return best
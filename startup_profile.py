@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# Момент первого импорта модуля. gui.py импортирует его самым первым, поэтому
+# разница с началом BarcodePDFApp.__init__ — время импорта модулей приложения.
+PROCESS_START = time.perf_counter()
+
+
+class StartupProfile:
+    """Собирает длительности этапов запуска приложения."""
+
+    def __init__(self, started_at: float = PROCESS_START):
+        self.started_at = started_at
+        self.phases: list[tuple[str, float]] = []
+        self._open: Dict[str, float] = {}
+
+    def record(self, name: str, start: float, end: Optional[float] = None) -> None:
+        if end is None:
+            end = time.perf_counter()
+        self.phases.append((name, end - start))
+
+    def begin(self, name: str) -> None:
+        self._open[name] = time.perf_counter()
+
+    def end(self, name: str) -> None:
+        start = self._open.pop(name, None)
+        if start is not None:
+            self.record(name, start)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._open)
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.phases)
+
+    def report(self) -> str:
+        lines = ["Профиль запуска:"]
+        for name, duration in self.phases:
+            lines.append(f"  {name:<14} {duration * 1000:9.1f} мс")
+        total = time.perf_counter() - self.started_at
+        lines.append(f"  {'итого':<14} {total * 1000:9.1f} мс")
+        return "\n".join(lines)
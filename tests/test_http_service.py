@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import socket
+import threading
+
+import fitz
+import pytest
+from PIL import Image
+
+from config_manager import AppConfig
+from http_service import HttpService
+
+
+@pytest.fixture
+def service(tmp_path):
+    barcodes = tmp_path / "barcodes"
+    barcodes.mkdir()
+    Image.new("RGB", (100, 50), color="red").save(barcodes / "a.png")
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    doc = fitz.open()
+    doc.new_page()
+    doc.save(str(pdfs / "label.pdf"))
+    doc.close()
+
+    cfg = AppConfig(
+        barcode_dir=str(barcodes), pdf_source_dir=str(pdfs), cache_dir=str(tmp_path / "cache")
+    )
+    svc = HttpService(cfg, max_workers=1, max_queue=0)
+    thread = threading.Thread(target=lambda: asyncio.run(svc.serve("127.0.0.1", 0)), daemon=True)
+    thread.start()
+    assert svc.started.wait(5)
+    yield svc
+    svc.close()
+    thread.join(5)
+
+
+def _post(port: int, path: str, payload) -> tuple[int, dict, bytes]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response.status, dict(response.getheaders()), body
+
+
+def test_generate_streams_pdf(service):
+    status, headers, body = _post(service.port, "/generate", {"items": {"a.png": 3}, "title": "WMS"})
+    assert status == 200
+    assert headers["Transfer-Encoding"] == "chunked"
+    assert body.startswith(b"%PDF")
+
+
+def test_merge_and_keep_alive(service):
+    conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+    for _ in range(2):
+        conn.request("POST", "/merge", body=json.dumps({"items": {"label.pdf": 2}}))
+        response = conn.getresponse()
+        doc = fitz.open(stream=response.read(), filetype="pdf")
+        assert response.status == 200 and len(doc) == 2
+        doc.close()
+    conn.close()
+
+
+def test_validation_errors(service):
+    assert _post(service.port, "/generate", {"items": {}})[0] == 400
+    assert _post(service.port, "/generate", {"items": {"../secret.png": 1}})[0] == 400
+    assert _post(service.port, "/generate", {"items": {"a.png": 0}})[0] == 400
+    assert _post(service.port, "/generate", {"items": {"missing.png": 1}})[0] == 422
+    assert _post(service.port, "/unknown", {"items": {"a.png": 1}})[0] == 404
+
+
+def test_oversized_requests_are_rejected_before_planning(service):
+    assert _post(service.port, "/generate", {"items": {"a.png": 1_000_000_000}})[0] == 413
+    service.max_total_labels = 10
+    assert _post(service.port, "/generate", {"items": {"a.png": 6, "b.png": 5}})[0] == 413
+    assert _post(service.port, "/merge", {"items": {"label.pdf": 11}})[0] == 413
+
+
+def test_title_and_page_settings_are_validated(service):
+    def status(**fields):
+        return _post(service.port, "/generate", {"items": {"a.png": 1}, **fields})[0]
+
+    assert status(title=5) == 400
+    assert status(page_settings="landscape") == 400
+    assert status(page_settings={"margins": [1]}) == 400
+    assert status(page_settings={"margins": {"top": "1"}}) == 400
+    assert status(page_settings={"paper": "A3"}) == 400
+    assert status(page_settings={"margins": {"top": -1}}) == 422
+    assert status(page_settings={"layout": "spiral"}) == 422
+    # Отсутствующие поля берутся из настроек по умолчанию
+    assert status(page_settings={"margins": {"top": 1}}, title="T") == 200
+    assert status(page_settings={"orientation": "Альбомная", "layout": "packed"}) == 200
+
+
+def test_bad_content_length_is_rejected(service):
+    for value in (b"abc", b"-5"):
+        with socket.create_connection(("127.0.0.1", service.port), timeout=10) as sock:
+            sock.sendall(b"POST /generate HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n")
+            assert sock.recv(1024).startswith(b"HTTP/1.1 400")
+
+
+def test_backpressure_rejects_when_pool_is_full(service):
+    gate = threading.Event()
+    service._executor.submit(gate.wait)
+    service.stats.in_flight = service.max_pending
+
+    status, headers, body = _post(service.port, "/generate", {"items": {"a.png": 1}})
+    assert status == 503 and headers["Retry-After"] == "1"
+    assert service.stats.rejected == 1
+
+    service.stats.in_flight = 0
+    gate.set()
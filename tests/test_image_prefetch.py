@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from PIL import Image
+
+from image_prefetch import ImagePrefetcher, load_image, load_thumbnail
+
+
+def make_images(tmp_path, count):
+    for i in range(count):
+        Image.new("RGB", (20 + i, 10), "white").save(tmp_path / f"{i}.png")
+    return [f"{i}.png" for i in range(count)]
+
+
+def test_prefetcher_yields_in_request_order(tmp_path):
+    names = make_images(tmp_path, 6)
+    with ImagePrefetcher(str(tmp_path), reversed(names), workers=3, window=2) as images:
+        result = [(name, reader.getSize()) for name, reader in images]
+    assert result == [(f"{i}.png", (20 + i, 10)) for i in reversed(range(6))]
+
+
+def test_prefetcher_keeps_bounded_window(tmp_path):
+    names = make_images(tmp_path, 10)
+    pulled = []
+
+    def source():
+        for name in names:
+            pulled.append(name)
+            yield name
+
+    images = ImagePrefetcher(str(tmp_path), source(), workers=2, window=3)
+    assert len(pulled) == 3
+    next(images)
+    next(images)
+    assert len(pulled) == 5
+    images.close()
+    assert list(images) == []
+
+
+def test_corrupt_image_raises_value_error_with_filename(tmp_path):
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    (tmp_path / "empty.png").write_bytes(b"")
+
+    with pytest.raises(ValueError, match="broken.png"):
+        load_image(str(tmp_path / "broken.png"))
+    with ImagePrefetcher(str(tmp_path), ["empty.png"]) as images:
+        with pytest.raises(ValueError, match="empty.png"):
+            next(images)
+
+
+def test_thumbnail_is_scaled_and_cached(tmp_path):
+    path = tmp_path / "big.png"
+    Image.new("RGB", (1000, 400), "white").save(path)
+
+    thumb = load_thumbnail(str(path), max_width=100)
+    assert thumb.getSize() == (100, 40)
+    assert load_thumbnail(str(path), max_width=100) is thumb
+
+    Image.new("RGB", (500, 100), "white").save(path)
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 10**9))
+    assert load_thumbnail(str(path), max_width=100).getSize() == (100, 20)
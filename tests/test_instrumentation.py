@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+
+import pytest
+from PIL import Image
+
+import instrumentation
+from config_manager import InstrumentationSettings
+from pdf_generator import create_pdf_from_barcodes
+
+
+@pytest.fixture
+def sink():
+    stream = io.StringIO()
+    sink = instrumentation.configure(stream=stream)
+    sink.stream = stream
+    yield sink
+    instrumentation.disable()
+
+
+def _records(sink) -> list[dict]:
+    return [json.loads(line) for line in sink.stream.getvalue().splitlines()]
+
+
+def test_disabled_span_is_shared_noop():
+    instrumentation.disable()
+    assert instrumentation.span("a") is instrumentation.span("b")
+    with instrumentation.span("a") as span:
+        span.set(x=1)
+
+
+def test_nested_spans_and_errors(sink):
+    with instrumentation.span("job", name="print"):
+        with instrumentation.span("stage", pages=2):
+            pass
+        with pytest.raises(ValueError):
+            with instrumentation.span("broken"):
+                raise ValueError
+
+    stage, broken, job = _records(sink)
+    assert stage["parent"] == "job" and stage["pages"] == 2
+    assert stage["trace"] == job["trace"] == broken["trace"]
+    assert broken["error"] == "ValueError"
+    assert "parent" not in job and job["name"] == "print"
+    assert sink.totals["broken"][3] == 1
+
+
+def test_generator_emits_stage_spans(sink, tmp_path):
+    Image.new("RGB", (100, 50)).save(tmp_path / "a.png")
+    create_pdf_from_barcodes({"a.png": 5}, str(tmp_path))
+
+    spans = {r["span"]: r for r in _records(sink)}
+    assert {"generate.scan", "generate.decode", "generate.layout", "generate.save"} <= set(spans)
+    assert spans["generate.draw_image"]["calls"] == 5
+
+
+def test_prometheus_textfile(tmp_path):
+    path = tmp_path / "metrics.prom"
+    sink = instrumentation.configure(prometheus_path=str(path))
+    try:
+        with instrumentation.span("generate.save"):
+            pass
+        sink.write_prometheus()
+    finally:
+        instrumentation.disable()
+
+    text = path.read_text(encoding="utf-8")
+    assert 'barcode_span_duration_seconds_count{span="generate.save"} 1' in text
+    assert 'barcode_span_errors_total{span="generate.save"} 0' in text
+
+
+def test_write_errors_never_reach_the_job(tmp_path, caplog):
+    path = tmp_path / "missing" / "metrics.prom"
+    sink = instrumentation.configure(prometheus_path=str(path))
+    sink.prometheus_interval = 0
+    try:
+        for _ in range(3):
+            with instrumentation.span("generate.save"):
+                pass
+    finally:
+        instrumentation.disable()
+
+    assert sink.totals["generate.save"][0] == 3
+    assert len([r for r in caplog.records if r.name == "instrumentation"]) == 1
+    assert not list(tmp_path.iterdir())
+
+
+def test_unwritable_jsonl_path_does_not_stop_startup(tmp_path, caplog):
+    settings = InstrumentationSettings(True, str(tmp_path / "missing" / "spans.jsonl"))
+    try:
+        instrumentation.configure_from(settings)
+        with instrumentation.span("generate.save"):
+            pass
+        assert instrumentation.enabled()
+    finally:
+        instrumentation.disable()
+
+    assert len([r for r in caplog.records if r.name == "instrumentation"]) == 1
+    assert not list(tmp_path.iterdir())
+
+
+def test_disabled_overhead_is_negligible():
+    instrumentation.disable()
+    n = 100_000
+    started = time.perf_counter()
+    for _ in range(n):
+        with instrumentation.span("x", a=1):
+            pass
+    assert (time.perf_counter() - started) / n < 5e-6
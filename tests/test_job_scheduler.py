@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import job_scheduler
+from cancellation import CancelToken
+from job_scheduler import JobScheduler
+
+
+def _wait_all(scheduler: JobScheduler, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    finished = job_scheduler.FINISHED_STATES
+    while any(job.state not in finished for job in scheduler.jobs):
+        assert time.monotonic() < deadline, "задания не завершились"
+        time.sleep(0.01)
+
+
+def test_preview_outranks_queued_print():
+    scheduler = JobScheduler(dispatch=lambda fn: fn(), max_workers=1)
+    gate = threading.Event()
+    order = []
+
+    scheduler.submit("blocker", gate.wait)
+    scheduler.submit("print", lambda: order.append("print"), priority=job_scheduler.PRIORITY_PRINT)
+    scheduler.submit("generate", lambda: order.append("generate"))
+    scheduler.submit("preview", lambda: order.append("preview"), priority=job_scheduler.PRIORITY_PREVIEW)
+    gate.set()
+    _wait_all(scheduler)
+
+    assert order == ["preview", "generate", "print"]
+
+
+def test_job_states_and_callbacks():
+    results, errors, updates = [], [], []
+    scheduler = JobScheduler(
+        dispatch=lambda fn: fn(), max_workers=2, on_update=lambda job: updates.append(job.state)
+    )
+
+    ok = scheduler.submit("ok", lambda: 42, on_done=results.append)
+    bad = scheduler.submit("bad", lambda: 1 / 0, on_error=errors.append)
+    _wait_all(scheduler)
+
+    assert ok.state == job_scheduler.DONE and ok.result == 42
+    assert bad.state == job_scheduler.FAILED
+    assert results == [42]
+    assert isinstance(errors[0], ZeroDivisionError)
+    assert job_scheduler.QUEUED in updates and job_scheduler.RUNNING in updates
+    assert scheduler.counts()[job_scheduler.FAILED] == 1
+
+
+def test_worker_pool_is_bounded():
+    scheduler = JobScheduler(dispatch=lambda fn: fn(), max_workers=2)
+    gate = threading.Event()
+    for i in range(5):
+        scheduler.submit(f"job{i}", gate.wait)
+    assert len(scheduler._workers) == 2
+    gate.set()
+    _wait_all(scheduler)
+
+
+def test_cancel_queued_and_running_jobs():
+    scheduler = JobScheduler(dispatch=lambda fn: fn(), max_workers=1)
+    started = threading.Event()
+    cancelled = []
+
+    running_token = CancelToken()
+
+    def long_task():
+        started.set()
+        while True:
+            running_token.raise_if_cancelled()
+            time.sleep(0.005)
+
+    running = scheduler.submit(
+        "long", long_task, cancel_token=running_token, on_cancel=lambda: cancelled.append("long")
+    )
+    queued = scheduler.submit(
+        "queued",
+        lambda: cancelled.append("ran"),
+        cancel_token=CancelToken(),
+        on_cancel=lambda: cancelled.append("queued"),
+    )
+    plain = scheduler.submit("plain", lambda: None)
+    assert started.wait(5)
+
+    assert scheduler.cancel(queued)
+    assert queued.state == job_scheduler.CANCELLED
+    assert scheduler.cancel(running)
+    assert not scheduler.cancel(plain)
+    _wait_all(scheduler)
+
+    assert running.state == job_scheduler.CANCELLED
+    assert plain.state == job_scheduler.DONE
+    assert sorted(cancelled) == ["long", "queued"]
+
+
+def test_current_job_is_set_while_task_runs():
+    scheduler = JobScheduler(dispatch=lambda fn: fn(), max_workers=1)
+    gate = threading.Event()
+    seen = []
+
+    def task():
+        gate.wait()
+        seen.append(job_scheduler.current_job())
+
+    job = scheduler.submit("job", task)
+    gate.set()
+    _wait_all(scheduler)
+
+    assert seen == [job]
+    assert job_scheduler.current_job() is None
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+
+from library_catalog import LibraryCatalog, parse_filename
+from library_scanner import IMAGE_EXTENSIONS, PDF_EXTENSIONS
+from order_import import SkuIndex
+
+LIBRARY = [
+    "OZN2389393150_ПК для струйно печати_10шт.png",
+    "OZN2390014686_ПК для струйной печати_50шт.png",
+    "OZN2390041748_ПК для струйной печати 100 шт.png",
+    "mifare_classic_1k_без_номера_2шт_076.png",
+]
+
+
+def make_library(path, names=LIBRARY):
+    for name in names:
+        (path / name).write_bytes(name.encode("utf-8"))
+
+
+def test_parse_filename_extracts_code_description_and_pack():
+    parsed = parse_filename(LIBRARY[1])
+    assert parsed.ozn == "OZN2390014686"
+    assert parsed.description == "ПК для струйной печати"
+    assert parsed.pack_size == 50
+
+    assert parse_filename(LIBRARY[2]).pack_size == 100
+    mifare = parse_filename(LIBRARY[3])
+    assert mifare.ozn is None
+    assert mifare.pack_size == 2
+    assert mifare.description == "mifare classic 1k без номера 076"
+    assert parse_filename("OZN1_Лента.png").pack_size is None
+
+
+def test_sync_is_incremental(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    make_library(library)
+    (library / "readme.txt").write_text("x")
+    catalog = LibraryCatalog(str(tmp_path / "catalog.sqlite3"))
+
+    changes = catalog.sync(str(library), IMAGE_EXTENSIONS)
+    assert changes.added == sorted(LIBRARY)
+    assert catalog.is_synced(str(library))
+    assert catalog.names(str(library)) == sorted(LIBRARY)
+    assert not catalog.sync(str(library), IMAGE_EXTENSIONS)
+
+    (library / LIBRARY[0]).unlink()
+    (library / "OZN5_Новая карта_20шт.png").write_bytes(b"new")
+    target = library / LIBRARY[1]
+    target.write_bytes(b"changed content")
+    st = target.stat()
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    changes = catalog.sync(str(library), IMAGE_EXTENSIONS)
+    assert changes.added == ["OZN5_Новая карта_20шт.png"]
+    assert changes.removed == [LIBRARY[0]]
+    assert changes.modified == [LIBRARY[1]]
+
+    entry = catalog.lookup(str(library), LIBRARY[1])
+    assert entry["sha256"] == hashlib.sha256(b"changed content").hexdigest()
+    assert entry["pack_size"] == 50 and entry["ozn"] == "OZN2390014686"
+    assert catalog.find_by_code("ozn5") == ["OZN5_Новая карта_20шт.png"]
+
+
+def test_catalog_persists_between_sessions(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    make_library(library)
+    db_path = str(tmp_path / "catalog.sqlite3")
+    LibraryCatalog(db_path).sync(str(library), IMAGE_EXTENSIONS)
+
+    reopened = LibraryCatalog(db_path)
+    assert reopened.is_synced(str(library))
+    snapshot = reopened.snapshot(str(library), IMAGE_EXTENSIONS)
+    assert set(snapshot) == set(LIBRARY)
+    assert all(meta is not None for meta in snapshot.values())
+
+
+def test_corrupted_database_is_rebuilt(tmp_path):
+    db_path = tmp_path / "catalog.sqlite3"
+    db_path.write_bytes(b"definitely not sqlite" * 100)
+    catalog = LibraryCatalog(str(db_path))
+    assert catalog.names(str(tmp_path)) == []
+
+
+def test_search_by_words_and_pack_size(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    make_library(library)
+    catalog = LibraryCatalog(str(tmp_path / "catalog.sqlite3"))
+    catalog.sync(str(library), IMAGE_EXTENSIONS)
+
+    assert catalog.search(str(library), "струйной 50шт") == [LIBRARY[1]]
+    assert catalog.search(str(library), "ПК печати", pack_size=100) == [LIBRARY[2]]
+    assert len(catalog.search(str(library), "пк печати")) == 3
+    assert catalog.search(str(library), "2390041748") == [LIBRARY[2]]
+    assert catalog.search(str(library), "лента") == []
+
+
+def test_search_and_index_filter_by_library_kind(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    make_library(library, [LIBRARY[1], "OZN2390014686_ПК для струйной печати_50шт.pdf"])
+    catalog = LibraryCatalog(str(tmp_path / "catalog.sqlite3"))
+    catalog.sync(str(library), IMAGE_EXTENSIONS)
+    catalog.sync(str(library), PDF_EXTENSIONS)
+
+    assert len(catalog.search(str(library), "50шт")) == 2
+    assert catalog.search(str(library), "50шт", extensions=PDF_EXTENSIONS) == [
+        "OZN2390014686_ПК для струйной печати_50шт.pdf"
+    ]
+    entries = catalog.index_entries(str(library), IMAGE_EXTENSIONS)
+    assert [entry[0] for entry in entries] == [LIBRARY[1]]
+
+
+def test_sku_index_from_catalog_matches_filename_index(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    make_library(library)
+    catalog = LibraryCatalog(str(tmp_path / "catalog.sqlite3"))
+    catalog.sync(str(library), IMAGE_EXTENSIONS)
+
+    from_catalog = SkuIndex.from_entries(catalog.index_entries(str(library)))
+    from_names = SkuIndex(LIBRARY)
+    assert from_catalog.by_code == from_names.by_code
+    assert from_catalog.by_name == from_names.by_name
+
+
+def test_search_in_large_catalog_is_fast(tmp_path):
+    library = tmp_path / "lib"
+    library.mkdir()
+    catalog = LibraryCatalog(str(tmp_path / "catalog.sqlite3"))
+    rows = [
+        (
+            catalog._library(str(library)),
+            f"OZN{i:010d}_Товар {i % 97}_{(i % 5 + 1) * 10}шт.png",
+            f"OZN{i:010d}",
+            f"Товар {i % 97}",
+            f"ozn{i:010d} товар {i % 97} {(i % 5 + 1) * 10}шт",
+            f"товар {i % 97} {(i % 5 + 1) * 10}шт",
+            (i % 5 + 1) * 10,
+            100,
+            0,
+            None,
+            ".png",
+        )
+        for i in range(100_000)
+    ]
+    with catalog._conn:
+        catalog._conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    started = time.perf_counter()
+    assert catalog.find_by_code("OZN0000054321") == [rows[54321][1]]
+    found = catalog.search(str(library), "товар 42 30шт")
+    elapsed = time.perf_counter() - started
+
+    assert found and all("_30шт" in name for name in found)
+    assert elapsed < 1.0
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import time
+
+from library_scanner import IMAGE_EXTENSIONS, LibraryScanner, iter_library_batches
+
+
+class FakeWidget:
+    """Выполняет колбэки ``after`` синхронно по запросу теста."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def run_until_idle(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            callback = self.pending.pop(0)
+            callback()
+            time.sleep(0.001)
+
+
+def _make_library(tmp_path, count: int):
+    (tmp_path / "subdir.png").mkdir()
+    (tmp_path / "notes.txt").write_text("x")
+    for i in range(count):
+        (tmp_path / f"OZN{i:05d}_item.png").write_bytes(b"")
+    return str(tmp_path)
+
+
+def test_iter_library_batches_filters_and_batches(tmp_path):
+    path = _make_library(tmp_path, 7)
+
+    batches = list(iter_library_batches(path, IMAGE_EXTENSIONS, batch_size=3))
+
+    assert [len(b) for b in batches] == [3, 3, 1]
+    names = sorted(n for b in batches for n in b)
+    assert names == [f"OZN{i:05d}_item.png" for i in range(7)]
+
+
+def test_scanner_streams_batches_then_done(tmp_path):
+    path = _make_library(tmp_path, 10)
+    widget = FakeWidget()
+    received, done = [], []
+
+    scanner = LibraryScanner(
+        widget, path, IMAGE_EXTENSIONS, received.append, done.append, batch_size=4
+    )
+    scanner.start()
+    widget.run_until_idle()
+
+    assert done == [None]
+    assert sum(len(b) for b in received) == 10
+
+
+def test_scanner_reports_missing_directory(tmp_path):
+    widget = FakeWidget()
+    done = []
+
+    LibraryScanner(
+        widget, str(tmp_path / "missing"), IMAGE_EXTENSIONS, lambda b: None, done.append
+    ).start()
+    widget.run_until_idle()
+
+    assert len(done) == 1
+    assert isinstance(done[0], FileNotFoundError)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import zipfile
+
+import fitz
+import pytest
+
+import library_source
+import pdf_cache
+from library_scanner import IMAGE_EXTENSIONS, iter_library_batches
+from library_watcher import diff_snapshots, take_snapshot
+from pdf_generator import create_pdf_from_barcodes, merge_pdfs, plan_sheet
+
+BARCODES = os.path.join(os.path.dirname(__file__), "..", "barcode_images")
+
+
+def _zip_library(path, source_dir, prefix="labels/"):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(prefix, "")
+        for name in sorted(os.listdir(source_dir)):
+            zf.write(os.path.join(source_dir, name), prefix + name)
+    return str(path)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return _zip_library(tmp_path / "labels.zip", BARCODES)
+
+
+def test_archive_lists_and_reads_entries_by_name(archive):
+    names = sorted(os.listdir(BARCODES))
+    batches = list(iter_library_batches(archive, IMAGE_EXTENSIONS, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert sorted(name for batch in batches for name in batch) == names
+    assert library_source.is_archive(archive)
+    assert not library_source.is_archive(BARCODES)
+
+    path = os.path.join(archive, names[0])
+    assert library_source.exists(path)
+    assert not library_source.exists(os.path.join(archive, "missing.png"))
+    with library_source.open_file(path) as f, open(os.path.join(BARCODES, names[0]), "rb") as g:
+        assert f.read() == g.read()
+    assert library_source.stat(path)[0] == os.path.getsize(os.path.join(BARCODES, names[0]))
+    with pytest.raises(FileNotFoundError):
+        library_source.open_file(os.path.join(archive, "missing.png"))
+
+
+def test_index_is_cached_until_archive_changes(archive, tmp_path, monkeypatch):
+    index = library_source.archive_index(archive)
+    assert library_source.archive_index(archive) is index
+
+    before = take_snapshot(archive, IMAGE_EXTENSIONS)
+    with zipfile.ZipFile(archive, "a") as zf:
+        zf.writestr("labels/OZN1_new.png", b"png")
+    monkeypatch.setattr(library_source, "REVALIDATE_AFTER", 0.0)
+
+    assert library_source.archive_index(archive) is not index
+    assert diff_snapshots(before, take_snapshot(archive, IMAGE_EXTENSIONS)).added == [
+        "OZN1_new.png"
+    ]
+
+
+def test_superseded_index_is_closed_after_open_streams(archive, monkeypatch):
+    name = sorted(os.listdir(BARCODES))[0]
+    with open(os.path.join(BARCODES, name), "rb") as f:
+        expected = f.read()
+    index = library_source.archive_index(archive)
+    stream = index.open(name)
+
+    with zipfile.ZipFile(archive, "a") as zf:
+        zf.writestr("labels/OZN1_new.png", b"png")
+    monkeypatch.setattr(library_source, "REVALIDATE_AFTER", 0.0)
+    current = library_source.archive_index(archive)
+
+    assert index.closed and not current.closed
+    # Открытый поток дочитывается, а устаревшая ссылка читает из нового индекса
+    with stream:
+        assert stream.read() == expected
+    with index.open("OZN1_new.png") as f:
+        assert f.read() == b"png"
+
+    library_source.close_all()
+    assert current.closed
+    assert not library_source.archive_index(archive).closed
+
+
+def test_windows_oem_names_are_decoded(tmp_path):
+    path = str(tmp_path / "oem.zip")
+    name = "OZN1_этикетка.png"
+    placeholder = "@" * len(name)
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(placeholder, b"data")
+    # Имя в cp866 без флага UTF-8, как у «Сжатой папки» Windows
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data.replace(placeholder.encode("ascii"), name.encode("cp866")))
+
+    assert library_source.archive_index(path).names() == [name]
+
+
+def test_broken_archive_raises_oserror(tmp_path):
+    path = tmp_path / "broken.zip"
+    path.write_bytes(b"not a zip")
+    with pytest.raises(OSError):
+        list(iter_library_batches(str(path), IMAGE_EXTENSIONS))
+
+
+def test_sheet_from_archive_matches_folder(archive):
+    selection = {name: 2 for name in sorted(os.listdir(BARCODES))}
+    page_settings = {"layout": "packed"}
+
+    layout = plan_sheet(selection, archive, page_settings)
+    assert layout == plan_sheet(selection, BARCODES, page_settings)
+    from_archive = create_pdf_from_barcodes(selection, archive, title="T", page_settings=page_settings)
+    from_folder = create_pdf_from_barcodes(selection, BARCODES, title="T", page_settings=page_settings)
+
+    def pages(data):
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            return [page.get_pixmap(dpi=30).samples for page in doc]
+
+    assert pages(from_archive) == pages(from_folder)
+    # Ключ кэша строится по содержимому файлов, а не по месту их хранения
+    assert pdf_cache.make_cache_key("sheet", selection, archive) == pdf_cache.make_cache_key(
+        "sheet", selection, BARCODES
+    )
+
+
+def test_merge_from_archive(tmp_path):
+    path = str(tmp_path / "pdfs.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        for name in ("doc1.pdf", "doc2.pdf"):
+            doc = fitz.open()
+            doc.new_page().insert_text((50, 50), name)
+            zf.writestr(name, doc.tobytes())
+            doc.close()
+
+    data = merge_pdfs({"doc1.pdf": 2, "doc2.pdf": 1, "missing.pdf": 1}, path)
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        assert [page.get_text().strip() for page in doc] == ["doc1.pdf", "doc1.pdf", "doc2.pdf"]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+
+from library_scanner import IMAGE_EXTENSIONS
+from library_watcher import LibraryWatcher, diff_snapshots, take_snapshot
+
+
+class FakeWidget:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def run_pending(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+
+def test_diff_snapshots_detects_all_kinds_of_changes():
+    old = {"a.png": (1, 10), "b.png": (2, 20), "c.png": (3, 30)}
+    new = {"a.png": (1, 10), "b.png": (5, 25), "d.png": (4, 40)}
+
+    changes = diff_snapshots(old, new)
+
+    assert changes.added == ["d.png"]
+    assert changes.removed == ["c.png"]
+    assert changes.modified == ["b.png"]
+
+
+def test_diff_against_names_only_baseline_reports_no_modifications():
+    changes = diff_snapshots({"a.png": None}, {"a.png": (1, 10), "b.png": (1, 1)})
+    assert changes.added == ["b.png"]
+    assert not changes.modified
+    assert not diff_snapshots({"a.png": None}, {"a.png": (1, 10)})
+
+
+def test_take_snapshot_filters_extensions(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"123")
+    (tmp_path / "b.txt").write_bytes(b"1")
+
+    snapshot = take_snapshot(str(tmp_path), IMAGE_EXTENSIONS)
+
+    assert list(snapshot) == ["a.png"]
+    assert snapshot["a.png"][0] == 3
+
+
+def test_watcher_delivers_changes_to_current_watch_only(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"1")
+    (tmp_path / "b.png").write_bytes(b"1")
+    widget = FakeWidget()
+    received = []
+    watcher = LibraryWatcher(widget)
+    watcher.watch("barcodes", str(tmp_path), IMAGE_EXTENSIONS, received.append, known=["a.png"])
+
+    watcher.check_now()
+    (tmp_path / "a.png").write_bytes(b"changed")
+    os.utime(tmp_path / "a.png", ns=(1, 1))
+    (tmp_path / "b.png").unlink()
+    watcher.check_now()
+    watcher._dispatch()
+
+    assert [c.added for c in received] == [["b.png"], []]
+    assert received[1].modified == ["a.png"]
+    assert received[1].removed == ["b.png"]
+
+    (tmp_path / "c.png").write_bytes(b"1")
+    watcher.check_now()
+    watcher.unwatch("barcodes")
+    widget.run_pending()
+    assert len(received) == 2
+
+
+def test_stop_ends_polling_thread(tmp_path):
+    watcher = LibraryWatcher(FakeWidget(), interval_ms=10)
+    watcher.watch("barcodes", str(tmp_path), IMAGE_EXTENSIONS, lambda changes: None)
+    watcher.start()
+    thread = watcher._thread
+
+    watcher.stop()
+
+    assert not thread.is_alive()
+    assert not watcher._watches
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import itertools
+import random
+
+from list_model import QuantityListModel, merge_sorted
+
+
+class FakeTreeview:
+    """Минимальная замена ttk.Treeview, считающая операции над строками."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.rows: list[str] = []
+        self.values: dict[str, tuple] = {}
+        self.ops: list[str] = []
+
+    def insert(self, parent, index, values):
+        item_id = f"I{next(self._ids)}"
+        self.rows.append(item_id)
+        self.values[item_id] = values
+        self.ops.append("insert")
+        return item_id
+
+    def delete(self, *item_ids):
+        for item_id in item_ids:
+            self.rows.remove(item_id)
+            del self.values[item_id]
+        self.ops.append("delete")
+
+    def item(self, item_id, values):
+        self.values[item_id] = values
+        self.ops.append("update")
+
+    def move(self, item_id, parent, index):
+        self.rows.remove(item_id)
+        self.rows.insert(index, item_id)
+        self.ops.append("move")
+
+    def index(self, item_id):
+        return self.rows.index(item_id)
+
+    def get_children(self):
+        return tuple(self.rows)
+
+    def filenames(self):
+        return [self.values[i][0] for i in self.rows]
+
+
+def test_set_inserts_then_updates_in_place():
+    view = FakeTreeview()
+    totals = []
+    model = QuantityListModel(view, on_total_changed=totals.append)
+
+    model.set("a.png", 2)
+    model.set("b.png", 3)
+    item_id = model.item_id_of("a.png")
+    view.ops.clear()
+
+    model.set("a.png", 5)
+
+    assert view.ops == ["update"]
+    assert model.item_id_of("a.png") == item_id
+    assert model.items == {"a.png": 5, "b.png": 3}
+    assert model.total == 8
+    assert totals == [2, 5, 8]
+
+
+def test_add_missing_and_remove():
+    view = FakeTreeview()
+    model = QuantityListModel(view)
+    model.set("a.png", 4)
+
+    added = model.add_missing(["a.png", "b.png", "c.png"])
+    assert added == 2
+    assert model.total == 6
+
+    assert model.remove("b.png")
+    assert not model.remove("b.png")
+    assert view.filenames() == ["a.png", "c.png"]
+    assert model.total == 5
+
+
+def test_drag_commit_uses_item_mapping():
+    view = FakeTreeview()
+    reorders = []
+    model = QuantityListModel(view, on_order_changed=lambda: reorders.append(list(model.items)))
+    for name in ("a.png", "b.png", "c.png"):
+        model.set(name, 1)
+
+    model.move(model.item_id_of("c.png"), 0)
+    assert list(model.items) == ["a.png", "b.png", "c.png"]
+    assert reorders == []
+
+    assert model.commit_order()
+    assert list(model.items) == ["c.png", "a.png", "b.png"]
+    assert not model.commit_order()
+    assert reorders == [["c.png", "a.png", "b.png"]]
+
+    model.replace({"b.png": 1, "c.png": 1, "a.png": 1})
+    assert reorders[-1] == ["b.png", "c.png", "a.png"]
+
+
+def test_replace_applies_minimal_diff():
+    view = FakeTreeview()
+    model = QuantityListModel(view)
+    for name in ("a.png", "b.png", "c.png"):
+        model.set(name, 1)
+    view.ops.clear()
+
+    model.replace({"a.png": 1, "c.png": 7, "d.png": 2})
+
+    assert sorted(view.ops) == ["delete", "insert", "update"]
+    assert view.filenames() == ["a.png", "c.png", "d.png"]
+    assert model.total == 10
+
+
+def test_replace_reorders_without_row_lookups():
+    view = FakeTreeview()
+    model = QuantityListModel(view)
+    names = [f"{i}.png" for i in range(200)]
+    for name in names:
+        model.set(name, 1)
+    lookups = []
+    view.index = lookups.append
+
+    rng = random.Random(3)
+    for _ in range(5):
+        rng.shuffle(names)
+        model.replace(dict.fromkeys(names, 1))
+        assert view.filenames() == names
+        assert list(model.items) == names
+    assert lookups == []
+
+
+def test_clear_resets_total():
+    view = FakeTreeview()
+    model = QuantityListModel(view)
+    model.set("a.png", 3)
+    model.clear()
+    assert view.rows == []
+    assert model.total == 0
+    assert not model
+
+
+def test_merge_sorted_returns_order_and_anchors():
+    order, anchors = merge_sorted(["b", "d", "f"], ["e", "a", "c", "g", "d", "c"])
+
+    assert order == ["a", "b", "c", "d", "e", "f", "g"]
+    assert anchors == [("a", "b"), ("c", "d"), ("e", "f"), ("g", None)]
+    assert merge_sorted(["a"], ["a"]) == (["a"], [])
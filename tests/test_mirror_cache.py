@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+
+from config_manager import AppConfig
+from mirror_cache import MirrorCache, create_mirror
+
+
+def bump_mtime(path, seconds=1):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+def make_share(tmp_path, files):
+    share = tmp_path / "share"
+    share.mkdir(exist_ok=True)
+    for name, data in files.items():
+        (share / name).write_bytes(data)
+    return share
+
+
+def test_ensure_copies_files_and_serves_them_locally(tmp_path):
+    share = make_share(tmp_path, {"a.png": b"aaa", "b.png": b"bbbb"})
+    mirror = MirrorCache(str(tmp_path / "mirror"), max_bytes=1024)
+
+    local_dir = mirror.ensure(str(share), ["a.png", "b.png", "missing.png"])
+
+    assert local_dir == mirror.mirror_dir(str(share))
+    assert local_dir != str(share)
+    assert (tmp_path / "mirror" / os.path.basename(local_dir) / "a.png").read_bytes() == b"aaa"
+    assert not os.path.exists(os.path.join(local_dir, "missing.png"))
+    assert mirror.local_path(str(share), "b.png") == os.path.join(local_dir, "b.png")
+    assert mirror.usage() == 7
+
+
+def test_local_path_serves_share_and_copies_in_background(tmp_path):
+    share = make_share(tmp_path, {"a.png": b"aaa"})
+    mirror = MirrorCache(str(tmp_path / "mirror"), max_bytes=1024, save_delay=3600)
+
+    assert mirror.local_path(str(share), "a.png") == str(share / "a.png")
+    mirror.close()
+
+    local = os.path.join(mirror.mirror_dir(str(share)), "a.png")
+    assert mirror.local_path(str(share), "a.png") == local
+    # Индекс записан при закрытии, а не после каждого копирования
+    reopened = MirrorCache(str(tmp_path / "mirror"), max_bytes=1024)
+    assert reopened.usage() == 3
+
+
+def test_changed_upstream_file_is_fetched_again(tmp_path):
+    share = make_share(tmp_path, {"a.png": b"old"})
+    mirror = MirrorCache(str(tmp_path / "mirror"), max_bytes=1024, revalidate_after=0)
+    local = mirror.fetch(str(share), "a.png")
+
+    (share / "a.png").write_bytes(b"new content")
+    bump_mtime(share / "a.png")
+    assert mirror.fetch(str(share), "a.png") == local
+    with open(local, "rb") as f:
+        assert f.read() == b"new content"
+
+    (share / "a.png").unlink()
+    assert mirror.fetch(str(share), "a.png") == str(share / "a.png")
+    assert not os.path.exists(local)
+
+
+def test_revalidation_window_skips_upstream_stat(tmp_path):
+    share = make_share(tmp_path, {"a.png": b"old"})
+    mirror = MirrorCache(str(tmp_path / "mirror"), max_bytes=1024, revalidate_after=3600)
+    local = mirror.fetch(str(share), "a.png")
+
+    (share / "a.png").write_bytes(b"new content")
+    bump_mtime(share / "a.png")
+    mirror.fetch(str(share), "a.png")
+    with open(local, "rb") as f:
+        assert f.read() == b"old"
+
+    mirror.invalidate(str(share), ["a.png"])
+    mirror.fetch(str(share), "a.png")
+    with open(local, "rb") as f:
+        assert f.read() == b"new content"
+
+
+def test_index_survives_restart_and_refresh_repairs_copies(tmp_path):
+    share = make_share(tmp_path, {"a.png": b"aaa", "b.png": b"bbb"})
+    root = str(tmp_path / "mirror")
+    mirror = MirrorCache(root, max_bytes=1024)
+    local_dir = mirror.ensure(str(share), ["a.png", "b.png"])
+    mirror.close()
+
+    # Локальная копия испорчена без изменения размера, исходник «b» изменён
+    with open(os.path.join(local_dir, "a.png"), "wb") as f:
+        f.write(b"xxx")
+    (share / "b.png").write_bytes(b"bbb2")
+    bump_mtime(share / "b.png")
+
+    reopened = MirrorCache(root, max_bytes=1024, revalidate_after=0)
+    assert reopened.usage() == 6
+    assert reopened.refresh() == 2
+    with open(os.path.join(local_dir, "a.png"), "rb") as f:
+        assert f.read() == b"aaa"
+    with open(os.path.join(local_dir, "b.png"), "rb") as f:
+        assert f.read() == b"bbb2"
+
+    (share / "b.png").unlink()
+    # Недоступный исходник — ошибка сверки, а не обновление
+    assert reopened.refresh() == 0
+
+
+def test_eviction_keeps_footprint_bounded(tmp_path):
+    share = make_share(tmp_path, {f"{i}.png": bytes(100) for i in range(5)})
+    mirror = MirrorCache(str(tmp_path / "mirror"), max_bytes=250, min_eviction_age=0)
+
+    for i in range(5):
+        mirror.fetch(str(share), f"{i}.png")
+
+    assert mirror.usage() <= 250
+    local_dir = mirror.mirror_dir(str(share))
+    assert sorted(os.listdir(local_dir)) == ["3.png", "4.png"]
+
+
+def test_create_mirror_follows_settings(tmp_path):
+    cfg = AppConfig(cache_dir=str(tmp_path))
+    assert create_mirror(cfg.mirror, cfg.cache_dir) is None
+    cfg.mirror.enabled = True
+    mirror = create_mirror(cfg.mirror, cfg.cache_dir)
+    assert mirror.root == os.path.join(str(tmp_path), "mirror")
+
+
+def test_mirror_settings_roundtrip(tmp_path):
+    path = str(tmp_path / "config.ini")
+    cfg = AppConfig()
+    cfg.mirror.enabled = True
+    cfg.mirror.max_mb = 300
+    cfg.save(path)
+
+    loaded = AppConfig.load(path)
+    assert loaded.mirror.enabled and loaded.mirror.max_mb == 300
+    assert loaded.validate() == []
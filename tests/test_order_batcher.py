@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import os
+
+import fitz
+
+from order_batcher import KIND_RIBBON, KIND_SHEET, Batch, Order, OrderBatcher, render_batch
+from pdf_cache import PdfCache
+
+
+class FakeWidget:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def fire_timers(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+
+def _order(name: str, labels: int = 1, kind: str = KIND_SHEET, printer: str = "P1") -> Order:
+    return Order(name, kind, {f"{name}.png": labels}, printer, "src")
+
+
+def test_flushes_on_order_count_and_keeps_order():
+    flushed = []
+    batcher = OrderBatcher(FakeWidget(), flushed.append, max_orders=3)
+
+    for name in ("a", "b", "c", "d"):
+        batcher.add(_order(name))
+
+    assert [[o.name for o in batch.orders] for batch in flushed] == [["a", "b", "c"]]
+    assert batcher.pending_orders() == 1
+
+
+def test_flushes_on_label_threshold():
+    flushed = []
+    batcher = OrderBatcher(FakeWidget(), flushed.append, max_labels=100)
+    batcher.add(_order("a", labels=60))
+    assert not flushed
+    batcher.add(_order("b", labels=40))
+    assert len(flushed) == 1 and flushed[0].labels == 100
+
+
+def test_batches_are_separated_by_kind_and_printer():
+    flushed = []
+    batcher = OrderBatcher(FakeWidget(), flushed.append)
+    batcher.add(_order("a"))
+    batcher.add(_order("b", printer="P2"))
+    batcher.add(_order("c", kind=KIND_RIBBON))
+
+    assert batcher.flush_all() == 3
+    assert sorted((b.kind, b.printer) for b in flushed) == [
+        (KIND_RIBBON, "P1"),
+        (KIND_SHEET, "P1"),
+        (KIND_SHEET, "P2"),
+    ]
+
+
+def test_timer_flushes_only_its_own_batch():
+    flushed = []
+    widget = FakeWidget()
+    batcher = OrderBatcher(widget, flushed.append, max_orders=2)
+
+    batcher.add(_order("a"))
+    batcher.add(_order("b"))  # пакет ушёл по размеру
+    batcher.add(_order("c"))  # новый пакет со своим таймером
+    stale_timer, fresh_timer = widget.pending
+
+    stale_timer()
+    assert len(flushed) == 1
+    fresh_timer()
+    assert [o.name for o in flushed[1].orders] == ["c"]
+
+
+def test_render_batch_keys_by_printer_and_writes_page_map(tmp_path):
+    source = tmp_path / "pdfs"
+    source.mkdir()
+    for name in ("a.pdf", "b.pdf"):
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), name)
+        doc.save(str(source / name))
+        doc.close()
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=10**8)
+    orders = [
+        Order("first", KIND_RIBBON, {"a.pdf": 2}, "P1", str(source)),
+        Order("second", KIND_RIBBON, {"b.pdf": 1}, "P1", str(source)),
+    ]
+
+    path = render_batch(Batch(KIND_RIBBON, "P1", list(orders)), cache)
+    other = render_batch(Batch(KIND_RIBBON, "P2", list(orders)), cache)
+
+    assert path != other
+    with fitz.open(path) as doc:
+        assert len(doc) == 5
+    key = os.path.splitext(os.path.basename(path))[0]
+    with open(cache.sidecar_path(key), encoding="utf-8") as f:
+        sidecar = json.load(f)
+    assert sidecar["printer"] == "P1"
+    assert [o["first_page"] for o in sidecar["orders"]] == [2, 5]
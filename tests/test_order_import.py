@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import io
+import time
+
+from order_import import SkuIndex, import_orders, parse_quantity
+
+LIBRARY = [
+    "OZN2389393150_ПК для струйно печати_10шт.png",
+    "OZN2390014686_ПК для струйной печати_50шт.png",
+    "OZN2390041748_ПК для струйной печати 100 шт.png",
+    "mifare_classic_1k_без_номера_2шт_076.png",
+]
+
+
+def test_resolves_by_code_name_and_filename():
+    index = SkuIndex(LIBRARY)
+    assert index.resolve("ozn2390014686")[0] == LIBRARY[1]
+    assert index.resolve("Артикул OZN2389393150 / коробка")[0] == LIBRARY[0]
+    assert index.resolve("ПК для струйной печати 100 шт")[0] == LIBRARY[2]
+    assert index.resolve("mifare classic 1k без номера 2шт 076")[0] == LIBRARY[3]
+    assert index.resolve(LIBRARY[3])[0] == LIBRARY[3]
+    assert index.resolve("OZN999") == (None, "не найден в библиотеке")
+
+
+def test_ambiguous_name_is_reported():
+    index = SkuIndex(["OZN1_Карта.png", "OZN2_Карта.png"])
+    filename, reason = index.resolve("Карта")
+    assert filename is None and "нескольким" in reason
+
+
+def test_header_columns_semicolon_and_duplicates():
+    data = (
+        "Наименование;Артикул;Кол-во\n"
+        "Пакет;OZN2390014686;3\n"
+        "ПК для струйно печати 10шт;;2\n"
+        "Неизвестно;OZN000;1\n"
+        "Пакет;OZN2390014686;4\n"
+        "Пакет;OZN2390041748;abc\n"
+    )
+    result = import_orders(io.StringIO(data), SkuIndex(LIBRARY))
+
+    assert result.items == {LIBRARY[1]: 7, LIBRARY[0]: 2}
+    assert result.rows == 5
+    assert [(r.line, r.reason) for r in result.unresolved] == [
+        (4, "не найден в библиотеке"),
+        (6, "неверное количество 'abc'"),
+    ]
+
+
+def test_headerless_comma_file():
+    data = "OZN2390014686,5\r\nOZN2389393150\r\n\r\n"
+    result = import_orders(io.StringIO(data), SkuIndex(LIBRARY))
+    assert result.items == {LIBRARY[1]: 5, LIBRARY[0]: 1}
+    assert not result.unresolved
+
+
+def test_parse_quantity():
+    assert parse_quantity(" 1 000 ") == 1000
+    assert parse_quantity("2,0") == 2
+    assert parse_quantity("0") is None
+    assert parse_quantity("1.5") is None
+    for value in ("nan", "inf", "-inf", "1e400", "100001"):
+        assert parse_quantity(value) is None
+    assert parse_quantity("100000") == 100000
+
+
+def test_bad_quantities_are_reported_not_fatal():
+    index = SkuIndex(["OZN1_a.png", "OZN2_b.png"])
+    text = "артикул;количество\nOZN1;nan\nOZN2;1e400\nOZN1;inf\nOZN2;3\nOZN2;99999\nOZN1;2\n"
+
+    result = import_orders(io.StringIO(text), index)
+
+    assert result.items == {"OZN2_b.png": 3, "OZN1_a.png": 2}
+    assert [row.line for row in result.unresolved] == [2, 3, 4, 6]
+
+
+def test_large_file_is_fast(tmp_path):
+    library = [f"OZN{1000000 + i}_Товар номер {i}_{i % 7 + 1}шт.png" for i in range(5000)]
+    path = tmp_path / "order.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Артикул\tКоличество\n")
+        for i in range(50_000):
+            f.write(f"OZN{1000000 + i % 6000}\t{i % 9 + 1}\n")
+
+    started = time.perf_counter()
+    result = import_orders(str(path), SkuIndex(library))
+    elapsed = time.perf_counter() - started
+
+    assert result.rows == 50_000
+    assert len(result.items) == 5000
+    assert len(result.unresolved) == 50_000 // 6000 * 1000 + max(0, 50_000 % 6000 - 5000)
+    assert elapsed < 1.0
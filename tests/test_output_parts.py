@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+import fitz
+import pytest
+from PIL import Image
+
+import output_parts
+import pdf_generator
+from cancellation import CancelToken, OperationCancelled
+from pdf_generator import create_pdf_from_barcodes, plan_sheet
+from sheet_layout import split_layout
+
+SOURCE_DIR = os.path.join(os.path.dirname(__file__), "..", "barcode_images")
+
+
+@pytest.fixture
+def selection():
+    return {f: 25 for f in sorted(os.listdir(SOURCE_DIR))}
+
+
+def page_signature(page):
+    return (
+        [tuple(round(v, 2) for v in info["bbox"]) for info in page.get_image_info()],
+        page.get_text(),
+        len(page.get_drawings()),
+    )
+
+
+def test_split_layout_cuts_on_page_boundaries(selection):
+    layout = plan_sheet(selection, SOURCE_DIR)
+
+    by_pages = split_layout(layout, max_pages=2)
+    assert [part.pages for part in by_pages][:-1] == [2] * (len(by_pages) - 1)
+    assert sum(part.pages for part in by_pages) == layout.pages
+    assert sum(len(part.placements) for part in by_pages) == len(layout.placements)
+    assert all(p.page < part.pages for part in by_pages for p in part.placements)
+
+    by_labels = split_layout(layout, max_labels=50)
+    assert all(len(part.placements) <= 50 for part in by_labels)
+    assert split_layout(layout) == [layout]
+
+
+def test_parts_concatenate_to_the_single_document(selection, tmp_path):
+    output = str(tmp_path / "job.pdf")
+    whole = create_pdf_from_barcodes(selection, SOURCE_DIR, title="job")
+
+    parts = output_parts.create_pdf_parts(
+        selection, SOURCE_DIR, output, max_pages=3, workers=2
+    )
+
+    assert [part.file for part in parts] == [
+        f"job_part{index:03d}.pdf" for index in range(1, len(parts) + 1)
+    ]
+    whole_doc = fitz.open(stream=whole, filetype="pdf")
+    pages = []
+    for part in parts:
+        doc = fitz.open(str(tmp_path / part.file))
+        assert len(doc) == part.pages
+        pages.extend(page_signature(page) for page in doc)
+    assert pages == [page_signature(page) for page in whole_doc]
+
+    manifest = output_parts.load_manifest(output)
+    assert manifest["kind"] == "sheet"
+    assert manifest["pages"] == len(whole_doc)
+    assert manifest["labels"] == sum(selection.values())
+    assert [p["first_page"] for p in manifest["parts"]] == [p.first_page for p in parts]
+
+
+def test_rerun_with_fewer_parts_removes_stale_files(selection, tmp_path):
+    output = str(tmp_path / "job.pdf")
+    many = output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=2, workers=1)
+    few = output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=5, workers=1)
+
+    assert len(few) < len(many)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [part.file for part in few] + ["job_manifest.json"]
+    )
+
+
+def test_neighbouring_files_with_the_same_prefix_survive(selection, tmp_path):
+    keep = ["job_partner_invoice.xlsx", "job_party.txt", "job_part001.pdf.bak", "job_part1.pdf"]
+    for name in keep:
+        (tmp_path / name).write_text("user data")
+    output = str(tmp_path / "job.pdf")
+
+    parts = output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=2, workers=1)
+    output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=5, workers=1)
+
+    assert len(parts) > 1
+    for name in keep:
+        assert (tmp_path / name).read_text() == "user data"
+
+
+def test_cancelled_job_leaves_no_parts(selection, tmp_path):
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(OperationCancelled):
+        output_parts.create_pdf_parts(
+            selection, SOURCE_DIR, str(tmp_path / "job.pdf"), max_pages=2, cancel_token=token
+        )
+    assert os.listdir(tmp_path) == []
+
+
+def test_job_without_finished_parts_leaves_nothing(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    Image.new("RGB", (100, 50), "white").save(source_dir / "a.png")
+    layout = plan_sheet({"a.png": 200}, str(source_dir))
+    (source_dir / "a.png").write_bytes(b"broken")
+
+    with pytest.raises(output_parts.PartsFailed) as info:
+        output_parts.create_pdf_parts(
+            {"a.png": 200}, str(source_dir), str(tmp_path / "job.pdf"),
+            max_pages=1, workers=1, layout=layout,
+        )
+    assert isinstance(info.value.__cause__, ValueError)
+    assert sorted(os.listdir(tmp_path)) == ["src"]
+
+
+def test_failed_part_keeps_finished_ones_and_rerun_builds_only_it(selection, tmp_path, monkeypatch):
+    output = str(tmp_path / "job.pdf")
+    build = pdf_generator.create_pdf_from_barcodes
+    built = []
+
+    def flaky(*args, **kwargs):
+        built.append(kwargs["layout"])
+        if len(built) == 2:
+            raise OSError("сеть недоступна")
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_generator, "create_pdf_from_barcodes", flaky)
+    with pytest.raises(output_parts.PartsFailed):
+        output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=2, workers=1)
+
+    manifest = output_parts.load_manifest(output)
+    statuses = [part["status"] for part in manifest["parts"]]
+    assert statuses[1] == output_parts.PART_FAILED
+    assert statuses.count(output_parts.PART_DONE) == len(statuses) - 1
+    assert manifest["parts"][1]["error"] == "сеть недоступна"
+    assert manifest["parts"][1]["file"] not in os.listdir(tmp_path)
+    total = len(built)
+
+    parts = output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=2, workers=1)
+
+    assert len(built) == total + 1
+    assert built[-1] == built[1]
+    assert all(part.status == output_parts.PART_DONE for part in parts)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [part.file for part in parts] + ["job_manifest.json"]
+    )
+    # Другие параметры — другое задание: части собираются заново
+    output_parts.create_pdf_parts(selection, SOURCE_DIR, output, max_pages=3, workers=1)
+    assert len(built) > total + 1 + 1
+
+
+def test_merge_parts_keep_source_documents_whole(tmp_path):
+    source_dir = tmp_path / "pdfs"
+    source_dir.mkdir()
+    for name, pages in (("one.pdf", 1), ("three.pdf", 3)):
+        doc = fitz.open()
+        for _ in range(pages):
+            doc.new_page()
+        doc.save(str(source_dir / name))
+        doc.close()
+
+    output = str(tmp_path / "ribbon.pdf")
+    parts = output_parts.merge_pdf_parts(
+        {"one.pdf": 2, "three.pdf": 2, "missing.pdf": 1}, str(source_dir), output, max_pages=4
+    )
+
+    assert [(p.pages, p.labels) for p in parts] == [(2, 2), (3, 1), (3, 1)]
+    assert [len(fitz.open(str(tmp_path / p.file))) for p in parts] == [2, 3, 3]
+    with open(output_parts.manifest_path(output), encoding="utf-8") as f:
+        assert json.load(f)["unit"] == "sources"
+
+
+def test_pool_worker_stops_on_shared_cancel_flag(tmp_path, monkeypatch):
+    event = threading.Event()
+    monkeypatch.setattr(output_parts, "_worker_cancel", None)
+    output_parts._init_worker(event)
+    event.set()
+
+    def build(path, **kwargs):
+        kwargs["cancel_token"].raise_if_cancelled()
+
+    with pytest.raises(OperationCancelled):
+        output_parts._write_part(build, str(tmp_path / "part.pdf"), (), {})
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import pdf_cache
+from pdf_cache import PdfCache, make_cache_key
+
+
+@pytest.fixture
+def sources(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "a.png").write_bytes(b"aaa")
+    (source_dir / "b.png").write_bytes(b"bbb")
+    return str(source_dir)
+
+
+def test_cache_key_depends_on_order_quantity_content_and_settings(sources):
+    base = make_cache_key("sheet", {"a.png": 1, "b.png": 2}, sources, {"orientation": "Книжная"}, "T")
+
+    assert base == make_cache_key("sheet", {"a.png": 1, "b.png": 2}, sources, {"orientation": "Книжная"}, "T")
+    assert base != make_cache_key("sheet", {"b.png": 2, "a.png": 1}, sources, {"orientation": "Книжная"}, "T")
+    assert base != make_cache_key("sheet", {"a.png": 1, "b.png": 3}, sources, {"orientation": "Книжная"}, "T")
+    assert base != make_cache_key("sheet", {"a.png": 1, "b.png": 2}, sources, {"orientation": "Альбомная"}, "T")
+    assert base != make_cache_key("sheet", {"a.png": 1, "b.png": 2}, sources, {"orientation": "Книжная"}, "X")
+
+    with open(os.path.join(sources, "a.png"), "wb") as f:
+        f.write(b"changed content")
+    assert base != make_cache_key("sheet", {"a.png": 1, "b.png": 2}, sources, {"orientation": "Книжная"}, "T")
+
+
+def test_get_or_create_reuses_document(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=10**6)
+    builds = []
+
+    def build(path):
+        builds.append(path)
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 test")
+
+    path1, hit1 = cache.get_or_create("k", build)
+    path2, hit2 = cache.get_or_create("k", build)
+
+    assert (hit1, hit2) == (False, True)
+    assert path1 == path2
+    assert len(builds) == 1
+
+
+def test_failed_build_leaves_no_files(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache = PdfCache(str(cache_dir), max_bytes=10**6)
+
+    def build(path):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_create("k", build)
+    assert os.listdir(cache_dir) == []
+
+
+def test_get_or_create_parts_rebuilds_when_a_part_is_missing(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=10**6)
+    builds = []
+
+    def build(out_dir):
+        builds.append(out_dir)
+        paths = []
+        for index in range(3):
+            path = os.path.join(out_dir, f"{index}.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%%PDF-1.4 part %d" % index)
+            paths.append(path)
+        return paths
+
+    paths, hit = cache.get_or_create_parts("k", 3, build)
+    assert not hit
+    assert [os.path.basename(path) for path in paths] == ["k-001.pdf", "k-002.pdf", "k-003.pdf"]
+    assert cache.get_or_create_parts("k", 3, build) == (paths, True)
+
+    os.remove(paths[1])
+    assert cache.get_or_create_parts("k", 3, build) == (paths, False)
+    assert len(builds) == 2
+    assert sorted(os.listdir(tmp_path / "cache")) == ["k-001.pdf", "k-002.pdf", "k-003.pdf"]
+
+
+def test_lru_eviction(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=250, min_eviction_age=0)
+
+    def build(path):
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+
+    for key, age in (("old", 300), ("mid", 200)):
+        path, _ = cache.get_or_create(key, build)
+        os.utime(path, (os.path.getmtime(path) - age,) * 2)
+    cache.get("old")  # обращение делает "old" самым свежим
+    cache.get_or_create("new", build)
+
+    assert cache.get("mid") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+
+
+def test_pinned_files_are_not_evicted(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"), max_bytes=150, min_eviction_age=0)
+
+    def build(path):
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+
+    pinned, _ = cache.get_or_create("pinned", build)
+    os.utime(pinned, (os.path.getmtime(pinned) - 300,) * 2)
+    pdf_cache.pin(pinned)
+    try:
+        cache.get_or_create("new", build)
+        assert os.path.exists(pinned)
+    finally:
+        pdf_cache.unpin(pinned)
+
+    cache.get_or_create("newer", build)
+    assert not os.path.exists(pinned)
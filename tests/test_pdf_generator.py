@@ -1,13 +1,24 @@
 from __future__ import annotations
 
+import io
 import os
 
 import fitz
 import pytest
 from PIL import Image
 
-from config_manager import AppConfig, PageSettings
-from pdf_generator import create_pdf_from_barcodes, merge_pdfs
+import pdf_generator
+import vector_labels
+from cancellation import CancelToken, OperationCancelled
+from config_manager import AppConfig, PageSettings, PrintSettings
+from pdf_cache import make_cache_key
+from pdf_generator import (
+    append_pdf_from_barcodes,
+    combine_orders,
+    create_pdf_from_barcodes,
+    merge_pdfs,
+    plan_sheet,
+)
 
 
 @pytest.fixture
@@ -150,6 +161,9 @@ class TestAppConfig:
             page_settings=PageSettings(
                 margin_top=15, margin_bottom=5, margin_left=20, margin_right=20, orientation="Альбомная"
             ),
+            print_settings=PrintSettings(
+                backend="directory", command="lpr -P {printer} {path}", batch_orders=True, batch_max_orders=3
+            ),
         )
         original.save(config_path)
 
@@ -159,6 +173,7 @@ class TestAppConfig:
         assert loaded.selected_printer == original.selected_printer
         assert loaded.ribbon_printer == original.ribbon_printer
         assert loaded.page_settings == original.page_settings
+        assert loaded.print_settings == original.print_settings
 
     def test_validate_valid_config(self):
         config = AppConfig()
@@ -175,3 +190,339 @@ class TestAppConfig:
         errors = config.validate()
         assert len(errors) == 1
         assert "Orientation" in errors[0]
+
+
+class TestProgress:
+    def test_create_pdf_reports_progress(self, barcode_images: str, tmp_path: str):
+        output_path = str(tmp_path / "progress.pdf")
+        updates = []
+
+        create_pdf_from_barcodes(
+            selected_barcodes={"barcode1.png": 30, "barcode2.png": 5},
+            source_dir=barcode_images,
+            output_path=output_path,
+            progress=updates.append,
+        )
+
+        final = updates[-1]
+        assert final.finished
+        assert final.labels_total == 35
+        assert final.labels_placed == 35
+        assert final.pages_done == len(fitz.open(output_path))
+        assert final.bytes_written == os.path.getsize(output_path)
+        # Колбэк ограничен по частоте и не вызывается на каждую этикетку
+        assert len(updates) < 35
+
+    def test_merge_reports_sources(self, pdf_files: str, tmp_path: str):
+        updates = []
+
+        merge_pdfs(
+            selected_pdfs={"doc1.pdf": 2, "doc2.pdf": 1},
+            source_dir=pdf_files,
+            output_path=str(tmp_path / "merged.pdf"),
+            progress=updates.append,
+        )
+
+        final = updates[-1]
+        assert final.finished
+        assert (final.sources_merged, final.sources_total) == (3, 3)
+        assert final.pages_done == 3
+        assert final.fraction == 1.0
+
+
+class TestCancellation:
+    def test_create_pdf_cancelled_leaves_no_output(self, barcode_images: str, tmp_path: str):
+        output_path = str(tmp_path / "cancelled.pdf")
+        token = CancelToken()
+        token.cancel()
+
+        with pytest.raises(OperationCancelled):
+            create_pdf_from_barcodes(
+                selected_barcodes={"barcode1.png": 500},
+                source_dir=barcode_images,
+                output_path=output_path,
+                cancel_token=token,
+            )
+
+        assert not os.path.exists(output_path)
+
+    def test_merge_cancelled(self, pdf_files: str, tmp_path: str):
+        token = CancelToken()
+        token.cancel()
+        output_path = str(tmp_path / "merged.pdf")
+
+        with pytest.raises(OperationCancelled):
+            merge_pdfs({"doc1.pdf": 3}, pdf_files, output_path, cancel_token=token)
+        assert not os.path.exists(output_path)
+
+
+class TestInMemoryOutput:
+    def test_create_pdf_returns_bytes(self, barcode_images: str):
+        data = create_pdf_from_barcodes(
+            selected_barcodes={"barcode1.png": 3},
+            source_dir=barcode_images,
+            title="В памяти",
+        )
+
+        assert data.startswith(b"%PDF")
+        doc = fitz.open(stream=data, filetype="pdf")
+        assert len(doc) == 1
+        doc.close()
+
+    def test_create_pdf_to_stream(self, barcode_images: str):
+        stream = io.BytesIO()
+
+        result = create_pdf_from_barcodes(
+            selected_barcodes={"barcode1.png": 1}, source_dir=barcode_images, output_path=stream
+        )
+
+        assert result is None
+        assert stream.getvalue().startswith(b"%PDF")
+
+    def test_merge_returns_bytes(self, pdf_files: str):
+        data = merge_pdfs({"doc1.pdf": 2, "doc2.pdf": 1}, pdf_files)
+
+        doc = fitz.open(stream=data, filetype="pdf")
+        assert len(doc) == 3
+        doc.close()
+
+
+class TestCombineOrders:
+    def test_header_pages_and_page_map(self, barcode_images: str, pdf_files: str):
+        sheet = create_pdf_from_barcodes({"barcode1.png": 2}, barcode_images)
+        parts = [
+            ("Заказ 1", sheet, ["Заказ 1", "Позиций: 1"]),
+            ("Заказ 2", os.path.join(pdf_files, "doc1.pdf"), ["Заказ 2"]),
+        ]
+
+        data, page_map = combine_orders(parts)
+
+        assert page_map == [
+            {"order": "Заказ 1", "header_page": 1, "first_page": 2, "last_page": 2},
+            {"order": "Заказ 2", "header_page": 3, "first_page": 4, "last_page": 4},
+        ]
+        doc = fitz.open(stream=data, filetype="pdf")
+        assert len(doc) == 4
+        assert [entry[1:] for entry in doc.get_toc()] == [["Заказ 1", 1], ["Заказ 2", 3]]
+        # Страница-заголовок повторяет формат первой страницы заказа
+        assert doc[2].rect == doc[3].rect
+        doc.close()
+
+    def test_without_header_pages(self, pdf_files: str):
+        parts = [(name, os.path.join(pdf_files, name), []) for name in ("doc1.pdf", "doc2.pdf")]
+        data, page_map = combine_orders(parts, header_pages=False)
+
+        assert [(p["header_page"], p["first_page"]) for p in page_map] == [(None, 1), (None, 2)]
+        assert len(fitz.open(stream=data, filetype="pdf")) == 2
+
+
+class TestVectorLabels:
+    def test_vector_labels_reuse_one_form_per_code(self, tmp_path: str):
+        selection = {"OZN2389393150_Карта_10шт.png": 30, "OZN2390014686_Карта_50шт.png": 30}
+        vector = create_pdf_from_barcodes(
+            selection, str(tmp_path), page_settings={"source_type": "vector"}
+        )
+
+        doc = fitz.open(stream=vector, filetype="pdf")
+        assert len(doc) >= 2
+        # Изображений нет, а формы разделяются между страницами
+        assert not doc[0].get_images()
+        forms = {xref for page in doc for xref, *_ in page.get_xobjects()}
+        assert len(forms) == 2
+        assert "OZN2389393150" in doc[0].get_text()
+        doc.close()
+
+    def test_vector_is_smaller_than_raster(self):
+        source_dir = os.path.join(os.path.dirname(__file__), "..", "barcode_images")
+        selection = {f: 20 for f in sorted(os.listdir(source_dir)) if f.startswith("OZN")}
+
+        raster = create_pdf_from_barcodes(selection, source_dir)
+        vector = create_pdf_from_barcodes(
+            selection, source_dir, page_settings={"source_type": "vector"}
+        )
+        assert len(vector) * 5 < len(raster)
+
+    def test_vector_labels_print_library_descriptions(self, tmp_path, capsys):
+        (tmp_path / "descriptions.csv").write_text(
+            "OZN2389393150;White PVC card (10 pcs)\n", encoding="cp1251"
+        )
+        selection = {"OZN2389393150_PC_10.png": 1, "OZN2390014686_PC_50.png": 1, "mifare.png": 1}
+
+        layout = plan_sheet(selection, str(tmp_path), {"source_type": "vector"})
+        data = create_pdf_from_barcodes(
+            selection, str(tmp_path), page_settings={"source_type": "vector"}, layout=layout
+        )
+
+        assert [p.filename for p in layout.placements] == list(selection)[:2]
+        warnings = capsys.readouterr().out
+        assert "mifare.png" in warnings and "OZN2390014686" in warnings
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            text = doc[0].get_text()
+            # Штрихи не касаются края этикетки: слева оставлено свободное поле
+            left = min(d["rect"].x0 for d in doc[0].get_drawings() if d.get("fill"))
+            first = layout.placements[0]
+        assert "White PVC card (10 pcs)" in text
+        assert "PC 50" in text
+        assert left > first.x + 5
+
+    def test_descriptions_file_in_excel_encoding(self, tmp_path):
+        (tmp_path / "descriptions.csv").write_text(
+            'Код;Описание\nozn1;"Карта белая; глянцевая"\nOZN2;\n', encoding="cp1251"
+        )
+        assert vector_labels.load_descriptions(str(tmp_path)) == {"OZN1": "Карта белая; глянцевая"}
+        assert vector_labels.load_descriptions(str(tmp_path / "missing")) == {}
+
+    def test_vector_cache_key_follows_descriptions(self, tmp_path):
+        selection = {"OZN2389393150_ПК_10шт.png": 1}
+        settings = {"source_type": "vector"}
+        before = make_cache_key("sheet", selection, str(tmp_path), settings)
+        (tmp_path / "descriptions.csv").write_text("OZN2389393150;Карта\n", encoding="utf-8")
+
+        assert make_cache_key("sheet", selection, str(tmp_path), settings) != before
+        assert make_cache_key("sheet", selection, str(tmp_path)) == make_cache_key(
+            "sheet", selection, str(tmp_path)
+        )
+
+    def test_vector_requires_codes(self, tmp_path: str):
+        with pytest.raises(ValueError):
+            create_pdf_from_barcodes(
+                {"mifare.png": 1}, str(tmp_path), page_settings={"source_type": "vector"}
+            )
+
+
+class TestPackedLayout:
+    def test_packed_document_matches_plan_and_uses_fewer_pages(self):
+        source_dir = os.path.join(os.path.dirname(__file__), "..", "barcode_images")
+        selection = {f: 3 for f in sorted(os.listdir(source_dir))}
+        page_settings = {"layout": "packed"}
+
+        layout = plan_sheet(selection, source_dir, page_settings)
+        data = create_pdf_from_barcodes(
+            selection, source_dir, page_settings=page_settings, layout=layout
+        )
+
+        doc = fitz.open(stream=data, filetype="pdf")
+        assert len(doc) == layout.pages
+        assert sum(len(page.get_image_info()) for page in doc) == sum(selection.values())
+        grid = create_pdf_from_barcodes(selection, source_dir)
+        assert len(fitz.open(stream=grid, filetype="pdf")) == layout.baseline_pages
+        assert layout.pages <= layout.baseline_pages
+        doc.close()
+
+
+class TestDraftPreview:
+    @staticmethod
+    def image_boxes(data):
+        doc = fitz.open(stream=data, filetype="pdf")
+        boxes = [
+            [tuple(round(v, 2) for v in info["bbox"]) for info in page.get_image_info()]
+            for page in doc
+        ]
+        doc.close()
+        return boxes
+
+    def test_thumbnail_draft_keeps_geometry_and_is_smaller(self):
+        source_dir = os.path.join(os.path.dirname(__file__), "..", "barcode_images")
+        selection = {f: 4 for f in sorted(os.listdir(source_dir))}
+
+        full = create_pdf_from_barcodes(selection, source_dir, title="T")
+        draft = create_pdf_from_barcodes(selection, source_dir, title="T", draft="thumbnail")
+
+        assert self.image_boxes(draft) == self.image_boxes(full)
+        assert len(draft) < len(full)
+
+    def test_outline_draft_reads_no_images(self, barcode_images: str):
+        selection = {"barcode1.png": 3, "barcode2.png": 2}
+        full = create_pdf_from_barcodes(selection, barcode_images)
+        draft = create_pdf_from_barcodes(selection, barcode_images, draft="outline")
+
+        doc = fitz.open(stream=draft, filetype="pdf")
+        page = doc[0]
+        assert page.get_image_info() == []
+        assert "barcode2" in page.get_text()
+        rects = [
+            tuple(round(v, 2) for v in item["rect"])
+            for item in page.get_drawings()
+            if item["items"][0][0] == "re"
+        ]
+        assert rects == self.image_boxes(full)[0]
+        doc.close()
+
+    def test_preview_mode_setting(self, tmp_path: str):
+        path = str(tmp_path / "config.ini")
+        cfg = AppConfig()
+        assert cfg.preview_mode == "thumbnail"
+        cfg.preview_mode = "outline"
+        cfg.save(path)
+
+        loaded = AppConfig.load(path)
+        assert loaded.preview_mode == "outline"
+        assert loaded.validate() == []
+        loaded.preview_mode = "blurry"
+        assert any("PreviewMode" in error for error in loaded.validate())
+
+
+class TestAppend:
+    @staticmethod
+    def page_images(path_or_data):
+        if isinstance(path_or_data, bytes):
+            doc = fitz.open(stream=path_or_data, filetype="pdf")
+        else:
+            doc = fitz.open(path_or_data)
+        pages = [page.get_pixmap(dpi=30).samples for page in doc]
+        doc.close()
+        return pages
+
+    def test_append_matches_full_rebuild_and_keeps_old_pages(self, barcode_images: str, tmp_path: str):
+        output_path = str(tmp_path / "job.pdf")
+        first = {"barcode1.png": 130}
+        previous = plan_sheet(first, barcode_images)
+        create_pdf_from_barcodes(first, barcode_images, output_path, title="T", layout=previous)
+        size = os.path.getsize(output_path)
+        with open(output_path, "rb") as f:
+            original = f.read()
+
+        second = {"barcode1.png": 130, "barcode2.png": 10}
+        kept = append_pdf_from_barcodes(second, barcode_images, output_path, previous, title="T")
+
+        assert kept == previous.pages - 1
+        # Инкрементальное сохранение: старое содержимое файла не переписывается
+        with open(output_path, "rb") as f:
+            assert f.read(size) == original
+        full = create_pdf_from_barcodes(second, barcode_images, title="T")
+        assert self.page_images(output_path) == self.page_images(full)
+
+    def test_repeated_appends_are_compacted(self, barcode_images: str, tmp_path: str, monkeypatch):
+        monkeypatch.setattr(pdf_generator, "MAX_INCREMENTAL_SAVES", 3)
+        (tmp_path / "out").mkdir()
+        output_path = str(tmp_path / "out" / "job.pdf")
+        selection = {"barcode1.png": 130}
+        layout = plan_sheet(selection, barcode_images)
+        create_pdf_from_barcodes(selection, barcode_images, output_path, title="T", layout=layout)
+
+        sizes = []
+        for extra in range(1, 5):
+            selection = {"barcode1.png": 130, "barcode2.png": extra}
+            previous, layout = layout, plan_sheet(selection, barcode_images)
+            append_pdf_from_barcodes(selection, barcode_images, output_path, previous, title="T")
+            sizes.append(os.path.getsize(output_path))
+            with fitz.open(output_path) as doc:
+                versions = doc.version_count
+
+        # Третье сохранение полное: версии сброшены, копии изображений удалены
+        assert sizes[2] < sizes[1] and versions == 2
+        full = create_pdf_from_barcodes(selection, barcode_images, title="T")
+        assert self.page_images(output_path) == self.page_images(full)
+        assert os.listdir(tmp_path / "out") == ["job.pdf"]
+
+    def test_append_declines_when_first_page_changes(self, barcode_images: str, tmp_path: str):
+        output_path = str(tmp_path / "job.pdf")
+        previous = plan_sheet({"barcode1.png": 3}, barcode_images)
+        create_pdf_from_barcodes({"barcode1.png": 3}, barcode_images, output_path, layout=previous)
+
+        changed = {"barcode2.png": 1, "barcode1.png": 3}
+        assert append_pdf_from_barcodes(changed, barcode_images, output_path, previous) is None
+
+        # Файл не соответствует плану (другое число страниц)
+        longer = plan_sheet({"barcode1.png": 200}, barcode_images)
+        assert append_pdf_from_barcodes({"barcode1.png": 201}, barcode_images, output_path, longer) is None
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+
+import pytest
+
+import pdf_cache
+import print_backend
+from print_backend import DirectoryPrintBackend, PrintBackend, PrintSpooler
+
+
+class FlakyBackend(PrintBackend):
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def submit(self, path: str, printer: str) -> None:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError("принтер недоступен")
+
+
+class CountingBackend(PrintBackend):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.gate = threading.Event()
+
+    def submit(self, path: str, printer: str) -> None:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        self.gate.wait(5)
+        with self.lock:
+            self.active -= 1
+
+
+def _make_pdf(tmp_path) -> str:
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4\n%%EOF\n")
+    return str(path)
+
+
+def test_directory_backend_spools_copies(tmp_path):
+    spool = tmp_path / "spool"
+    spooler = PrintSpooler(DirectoryPrintBackend(str(spool)), max_workers=2)
+    path = _make_pdf(tmp_path)
+
+    jobs = [spooler.submit(path, "Zebra ZD420") for _ in range(3)]
+    for job in jobs:
+        assert job.done.wait(5)
+    spooler.shutdown()
+
+    assert all(job.state == print_backend.SENT for job in jobs)
+    assert len(os.listdir(spool / "Zebra_ZD420")) == 3
+    assert DirectoryPrintBackend(str(spool)).list_printers() == ["Zebra_ZD420"]
+    stats = spooler.metrics.snapshot()
+    assert stats["sent"] == 3 and stats["bytes_sent"] == 3 * os.path.getsize(path)
+
+
+def test_directory_backend_runs_command(tmp_path):
+    out = tmp_path / "out.txt"
+    command = f'{sys.executable} -c "import sys; open(sys.argv[2], \'w\').write(sys.argv[1])" {{printer}} {out}'
+    DirectoryPrintBackend(str(tmp_path), command).submit("doc.pdf", "P1")
+    assert out.read_text() == "P1"
+
+
+def test_retries_then_succeeds_or_fails(tmp_path):
+    path = _make_pdf(tmp_path)
+    done, errors = [], []
+
+    spooler = PrintSpooler(FlakyBackend(failures=2), max_retries=2, retry_delay=0)
+    job = spooler.submit(path, "P", on_done=done.append, on_error=errors.append)
+    assert job.done.wait(5)
+    assert job.state == print_backend.SENT and job.attempts == 3
+
+    spooler = PrintSpooler(FlakyBackend(failures=5), max_retries=1, retry_delay=0)
+    job = spooler.submit(path, "P", on_done=done.append, on_error=errors.append)
+    assert job.done.wait(5)
+    spooler.shutdown()
+    assert job.state == print_backend.FAILED and isinstance(job.error, OSError)
+    assert len(done) == 1 and errors == [job]
+    assert spooler.metrics.snapshot()["retries"] == 1
+
+
+def test_per_printer_limit(tmp_path):
+    path = _make_pdf(tmp_path)
+    backend = CountingBackend()
+    spooler = PrintSpooler(backend, max_workers=6, per_printer_limit=1)
+
+    jobs = [spooler.submit(path, printer) for printer in ("A", "A", "A", "B", "B")]
+    backend.gate.set()
+    for job in jobs:
+        assert job.done.wait(5)
+    spooler.shutdown()
+    assert backend.peak <= 2
+
+
+class PerPrinterGateBackend(PrintBackend):
+    def __init__(self):
+        self.gates = {"A": threading.Event(), "B": threading.Event()}
+        self.gates["B"].set()
+
+    def submit(self, path: str, printer: str) -> None:
+        assert self.gates[printer].wait(5)
+
+
+def test_backlog_of_one_printer_does_not_delay_another(tmp_path):
+    path = _make_pdf(tmp_path)
+    backend = PerPrinterGateBackend()
+    spooler = PrintSpooler(backend, max_workers=2, per_printer_limit=1)
+
+    backlog = [spooler.submit(path, "A") for _ in range(5)]
+    job = spooler.submit(path, "B")
+
+    assert job.done.wait(2) and job.state == print_backend.SENT
+    assert not any(a.done.is_set() for a in backlog)
+    backend.gates["A"].set()
+    spooler.shutdown()
+    assert all(a.state == print_backend.SENT for a in backlog)
+    assert not pdf_cache.is_pinned(path)
+
+
+def test_spooled_file_is_pinned_until_sent(tmp_path):
+    path = _make_pdf(tmp_path)
+    backend = CountingBackend()
+    spooler = PrintSpooler(backend)
+
+    job = spooler.submit(path, "P")
+    assert pdf_cache.is_pinned(path)
+    backend.gate.set()
+    assert job.done.wait(5)
+    spooler.shutdown()
+
+    assert not pdf_cache.is_pinned(path)
+
+
+def test_backend_requires_submit():
+    with pytest.raises(TypeError):
+        PrintBackend()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+
+import fitz
+import pytest
+from PIL import Image
+
+import pdf_cache
+from cancellation import CancelToken, OperationCancelled
+from config_manager import AppConfig
+from pdf_generator import create_pdf_from_barcodes
+from print_backend import DirectoryPrintBackend, RasterizingBackend
+from rasterizer import Rasterizer, page_hashes
+
+SOURCE_DIR = os.path.join(os.path.dirname(__file__), "..", "barcode_images")
+
+
+def make_job(path, count):
+    selection = {f: 30 for f in sorted(os.listdir(SOURCE_DIR))[:count]}
+    create_pdf_from_barcodes(selection, SOURCE_DIR, path, title="job")
+    return path
+
+
+@pytest.fixture
+def job(tmp_path):
+    return make_job(str(tmp_path / "job.pdf"), 3)
+
+
+def test_rasterize_writes_multipage_g4_tiff(tmp_path):
+    job = make_job(str(tmp_path / "big.pdf"), 5)
+    raster = Rasterizer(str(tmp_path / "raster"), 10**8, dpi=72, workers=2)
+
+    result = raster.rasterize(job)
+
+    pages = len(fitz.open(job))
+    assert pages >= 4  # страниц достаточно для пула процессов
+    assert (result.pages, result.cached_pages, result.cached) == (pages, 0, False)
+    with Image.open(result.path) as img:
+        assert img.n_frames == pages
+        assert img.mode == "1"
+        assert img.info["compression"] == "group4"
+        # A4 при 72 dpi
+        assert abs(img.size[0] - 595) <= 1 and abs(img.size[1] - 842) <= 1
+
+
+def test_repeat_jobs_and_shared_pages_skip_rendering(job, tmp_path):
+    raster = Rasterizer(str(tmp_path / "raster"), 10**8, dpi=72, workers=1)
+    first = raster.rasterize(job)
+
+    again = raster.rasterize(job)
+    assert again.cached and again.path == first.path
+
+    # Следующая группа добавлена в конец: все страницы, кроме последней, те же
+    longer = make_job(str(tmp_path / "longer.pdf"), 4)
+    with fitz.open(job) as a, fitz.open(longer) as b:
+        shared = set(page_hashes(a)) & set(page_hashes(b))
+        assert len(shared) >= len(a) - 1
+    assert raster.rasterize(longer).cached_pages >= len(shared)
+
+
+def test_eight_bit_output(job, tmp_path):
+    raster = Rasterizer(str(tmp_path / "raster"), 10**8, dpi=36, bit_depth=8, workers=1)
+    out = str(tmp_path / "job.tif")
+
+    result = raster.rasterize(job, output_path=out)
+
+    assert result.path == out
+    with Image.open(out) as img:
+        assert img.mode == "L"
+        assert img.info["dpi"] == (36, 36)
+
+
+def test_backend_rasterizes_only_selected_printers(job, tmp_path):
+    spool = tmp_path / "spool"
+    raster = Rasterizer(str(tmp_path / "raster"), 10**8, dpi=36, workers=1)
+    backend = RasterizingBackend(DirectoryPrintBackend(str(spool)), raster, ["slow"])
+
+    backend.submit(job, "slow")
+    backend.submit(job, "fast")
+
+    assert [name.endswith(".tif") for name in os.listdir(spool / "slow")] == [True]
+    assert [name.endswith(".pdf") for name in os.listdir(spool / "fast")] == [True]
+    assert backend.name == "directory+raster"
+
+
+class RecordingBackend(DirectoryPrintBackend):
+    def __init__(self, spool_dir):
+        super().__init__(spool_dir)
+        self.raster = []
+
+    def submit_raster(self, path, printer):
+        self.raster.append(path)
+
+
+def test_prepare_reports_progress_and_raster_goes_to_submit_raster(job, tmp_path):
+    raster = Rasterizer(str(tmp_path / "raster"), 10**8, dpi=36, workers=1)
+    inner = RecordingBackend(str(tmp_path / "spool"))
+    backend = RasterizingBackend(inner, raster, ["slow"])
+    states = []
+
+    assert backend.needs_prepare(job, "slow") and not backend.needs_prepare(job, "fast")
+    with pytest.raises(OperationCancelled):
+        token = CancelToken()
+        token.cancel()
+        backend.prepare(job, "slow", cancel_token=token)
+    prepared = backend.prepare(job, "slow", states.append, CancelToken())
+    backend.submit(prepared, "slow")
+
+    assert prepared.endswith(".tif") and inner.raster == [prepared]
+    assert states[-1].finished and states[-1].pages_done == len(fitz.open(job))
+    assert not os.path.exists(tmp_path / "spool")
+
+
+def test_job_pages_are_pinned_until_assembly(job, tmp_path, monkeypatch):
+    raster = Rasterizer(str(tmp_path / "raster"), 10**8, dpi=36, workers=1)
+    get_or_create = raster.jobs.get_or_create
+    pinned = []
+
+    def checked(key, build):
+        pages = [entry.path for entry in os.scandir(raster.pages.cache_dir)]
+        pinned.extend(pdf_cache.is_pinned(path) for path in pages)
+        return get_or_create(key, build)
+
+    monkeypatch.setattr(raster.jobs, "get_or_create", checked)
+    raster.rasterize(job)
+
+    assert pinned and all(pinned)
+    assert not any(
+        pdf_cache.is_pinned(entry.path) for entry in os.scandir(raster.pages.cache_dir)
+    )
+
+
+def test_raster_settings_roundtrip(tmp_path):
+    path = str(tmp_path / "config.ini")
+    cfg = AppConfig()
+    cfg.raster.enabled = True
+    cfg.raster.printers = "Zebra, Godex "
+    cfg.save(path)
+
+    loaded = AppConfig.load(path)
+    assert loaded.raster.enabled
+    assert loaded.raster.printer_list() == ["Zebra", "Godex"]
+    assert loaded.validate() == []
+    loaded.raster.bit_depth = 4
+    assert any("BitDepth" in error for error in loaded.validate())
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import itertools
+import random
+
+import pytest
+
+import sheet_layout
+from config_manager import AppConfig
+from sheet_layout import (
+    LANDSCAPE,
+    LAYOUT_PACKED,
+    PORTRAIT,
+    plan_grid,
+    plan_packed,
+    estimate_pages,
+    plan_sheet,
+)
+
+ASPECT = 1181 / 2032
+
+
+def assert_no_overlaps(layout):
+    by_page = {}
+    for p in layout.placements:
+        by_page.setdefault(p.page, []).append(p)
+    for placements in by_page.values():
+        for a, b in itertools.combinations(placements, 2):
+            assert (
+                a.x + a.width <= b.x + 1e-6
+                or b.x + b.width <= a.x + 1e-6
+                or a.y + a.height <= b.y + 1e-6
+                or b.y + b.height <= a.y + 1e-6
+            ), (a, b)
+
+
+def test_grid_starts_each_group_on_new_row_with_separator():
+    layout = plan_grid([("a", 3), ("b", 2)], ASPECT)
+
+    first_row_y = layout.placements[0].y
+    b_first = layout.placements[3]
+    assert b_first.x == layout.placements[0].x
+    assert b_first.y < first_row_y
+    assert len(layout.separators) == 1
+    assert layout.pages == 1 and not layout.headerless
+
+
+def test_grid_page_break_at_separator_skips_header():
+    # Группа ровно на одну страницу: разделитель приходится на разрыв
+    first_page = [p for p in plan_grid([("a", 500)], ASPECT).placements if p.page == 0]
+    per_row = len({p.x for p in first_page})
+    rows = len({p.y for p in first_page})
+    layout = plan_grid([("a", per_row * rows), ("b", 1)], ASPECT)
+
+    assert layout.pages == 2
+    assert layout.headerless == {1}
+    assert layout.separators == []
+    assert layout.placements[-1].page == 1
+
+
+def test_packed_layout_saves_pages_for_mixed_small_orders():
+    groups = [(f"item{i}", 1) for i in range(40)]
+    aspects = dict.fromkeys((name for name, _ in groups), ASPECT)
+
+    layout = plan_sheet(groups, aspects, {"layout": LAYOUT_PACKED})
+
+    assert layout.mode == LAYOUT_PACKED
+    assert layout.baseline_pages > layout.pages
+    assert layout.saved_pages == layout.baseline_pages - layout.pages
+    assert "экономия" in layout.report()
+    assert len(layout.placements) == 40
+    assert [p.filename for p in layout.placements] == [name for name, _ in groups]
+    assert_no_overlaps(layout)
+
+
+def test_packed_layout_handles_mixed_aspects_within_margins():
+    groups = [("wide", 7), ("tall", 5), ("square", 9)]
+    aspects = {"wide": 0.3, "tall": 1.4, "square": 1.0}
+
+    layout = plan_packed(groups, aspects)
+
+    # Полки заполняются по убыванию высоты
+    assert [p.filename for p in layout.placements[:5]] == ["tall"] * 5
+    page_width, page_height = layout.page_size
+    for p in layout.placements:
+        assert p.height == pytest.approx(sheet_layout.LABEL_WIDTH * aspects[p.filename])
+        assert p.x + p.width <= page_width - 10 * sheet_layout.MM + 1e-6
+        assert p.y >= 10 * sheet_layout.MM - 1e-6
+        assert p.y + p.height <= page_height - 25 * sheet_layout.MM + 1e-6
+    assert_no_overlaps(layout)
+
+
+def test_packed_layout_picks_orientation_with_fewer_pages():
+    # Узкие поля и низкие этикетки: в альбомной ориентации в ряд входит 6, в книжной 4
+    margins = {"top": 25, "bottom": 10, "left": 5, "right": 5}
+    groups = [("strip", 66)]
+    aspects = {"strip": 0.25}
+    assert plan_packed(groups, aspects, PORTRAIT, margins).pages == 2
+    assert plan_packed(groups, aspects, LANDSCAPE, margins).pages == 1
+
+    chosen = plan_sheet(
+        groups, aspects, {"layout": LAYOUT_PACKED, "orientation": PORTRAIT, "margins": margins}
+    )
+    assert chosen.orientation == LANDSCAPE
+    assert chosen.pages == 1
+
+    few = plan_sheet([("strip", 3)], aspects, {"layout": LAYOUT_PACKED, "orientation": PORTRAIT})
+    assert few.orientation == PORTRAIT
+
+
+def test_grid_is_the_default_mode():
+    layout = plan_sheet([("a", 2)], {"a": ASPECT})
+    assert layout.mode == sheet_layout.LAYOUT_GRID
+    assert layout.report() == "Листов: 1"
+    with pytest.raises(ValueError):
+        plan_sheet([], {})
+
+
+def test_layout_setting_roundtrip(tmp_path):
+    path = str(tmp_path / "config.ini")
+    cfg = AppConfig()
+    cfg.page_settings.layout = "packed"
+    cfg.save(path)
+
+    loaded = AppConfig.load(path)
+    assert loaded.page_settings.to_dict()["layout"] == "packed"
+    assert loaded.validate() == []
+    loaded.page_settings.layout = "spiral"
+    assert any("Layout" in error for error in loaded.validate())
+
+
+def test_estimate_matches_planner_exactly():
+    rng = random.Random(7)
+    for _ in range(500):
+        names = [f"f{i}" for i in range(rng.randint(1, 6))]
+        groups = [(name, rng.choice([0, 1, 5, 16, 33, rng.randint(0, 400)])) for name in names]
+        if not any(quantity for _, quantity in groups):
+            continue
+        aspects = {name: rng.choice([0.25, ASPECT, 1.0, 1.4, rng.uniform(0.1, 3)]) for name in names}
+        page_settings = {
+            "layout": rng.choice(sheet_layout.LAYOUTS),
+            "orientation": rng.choice(sheet_layout.ORIENTATIONS),
+            "margins": {k: rng.choice([0, 5, 10, 25, 50, 140]) for k in ("top", "bottom", "left", "right")},
+        }
+        expected = plan_sheet(groups, aspects, page_settings).pages
+        assert estimate_pages(groups, aspects, page_settings) == expected, (groups, aspects, page_settings)
+
+
+def test_estimate_on_exact_fit_boundary():
+    # Четыре квадратные полки ровно до нижнего поля: сравнение на границе как в плане
+    margins = {"top": 10, "bottom": 5, "left": 33, "right": 10}
+    groups = [("square", 100), ("short", 64)]
+    aspects = {"square": 1.0, "short": 0.75}
+    for layout in sheet_layout.LAYOUTS:
+        page_settings = {"layout": layout, "orientation": LANDSCAPE, "margins": margins}
+        assert estimate_pages(groups, aspects, page_settings) == plan_sheet(groups, aspects, page_settings).pages
+    assert estimate_pages([], {}) == 0
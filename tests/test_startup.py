@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+# Допустимое время «холодного» импорта модулей интерфейса
+IMPORT_BUDGET_SECONDS = 1.5
+
+UI_MODULES = [
+    "gui",
+    "main_tab",
+    "ribbon_print_tab",
+    "preview_window",
+    "settings_tab",
+    "pdf_generator",
+]
+HEAVY_MODULES = ["fitz", "reportlab", "PIL", "win32api", "win32print"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def _run_probe() -> dict:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = PROBE.format(modules=UI_MODULES, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-B", "-c", code],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_ui_modules_do_not_import_heavy_dependencies():
+    assert _run_probe()["heavy"] == []
+
+
+def test_ui_import_within_budget():
+    assert _run_probe()["elapsed"] < IMPORT_BUDGET_SECONDS
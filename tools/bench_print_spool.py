@@ -0,0 +1,56 @@
+"""Нагрузочная проверка очереди печати на локальном каталоге-спуле.
+
+Пример: python tools/bench_print_spool.py --jobs 200 --printers 3 --per-printer 2
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import print_backend  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", help="PDF для печати (по умолчанию — пустой документ)")
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--printers", type=int, default=2)
+    parser.add_argument("--per-printer", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--command", default=None, help="команда вида 'lpr -P {printer} {path}'")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp, "bench.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4\n%%EOF\n")
+
+        backend = print_backend.DirectoryPrintBackend(os.path.join(tmp, "spool"), args.command)
+        spooler = print_backend.PrintSpooler(
+            backend, max_workers=args.workers, per_printer_limit=args.per_printer
+        )
+
+        started = time.perf_counter()
+        jobs = [
+            spooler.submit(path, f"printer{i % args.printers}") for i in range(args.jobs)
+        ]
+        submitted = time.perf_counter() - started
+        for job in jobs:
+            job.done.wait()
+        spooler.shutdown()
+
+        stats = spooler.metrics.snapshot()
+        print(f"Поставлено {args.jobs} заданий за {submitted * 1000:.1f} мс")
+        for name, value in stats.items():
+            print(f"  {name}: {value:.4f}" if isinstance(value, float) else f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
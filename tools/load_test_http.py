@@ -0,0 +1,99 @@
+"""Нагрузочный тест HTTP-сервиса генерации PDF.
+
+Пример: python tools/load_test_http.py --url http://127.0.0.1:8765/generate \
+    --items '{"barcode.png": 10}' --requests 500 --concurrency 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, int]:
+    """Читает ответ целиком; возвращает статус и размер тела."""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        size = 0
+        while True:
+            chunk_size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(chunk_size + 2)
+            size += chunk_size
+            if chunk_size == 0:
+                return status, size
+    length = int(headers.get("content-length", "0"))
+    await reader.readexactly(length)
+    return status, length
+
+
+async def _client(url, body: bytes, jobs: asyncio.Queue, latencies: list, statuses: Counter) -> None:
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    request = (
+        f"POST {url.path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    ).encode("latin-1") + body
+    try:
+        while True:
+            try:
+                jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, _ = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def run(url: str, items: dict, requests: int, concurrency: int) -> None:
+    parsed = urlsplit(url)
+    body = json.dumps({"items": items}).encode("utf-8")
+    jobs: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        jobs.put_nowait(i)
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_client(parsed, body, jobs, latencies, statuses) for _ in range(concurrency))
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Запросов: {requests}, параллельно: {concurrency}, время: {elapsed:.2f} с")
+    print(f"  RPS: {requests / elapsed:.1f}")
+    print(f"  Ответы: {dict(statuses)}")
+    if latencies:
+        print(
+            f"  Задержка p50/p95/max: {latencies[len(latencies) // 2] * 1000:.1f}/"
+            f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f}/{latencies[-1] * 1000:.1f} мс"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8765/generate")
+    parser.add_argument("--items", required=True, help='JSON вида {"файл.png": 2}')
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, json.loads(args.items), args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import re
+from typing import Dict, Optional
+
+import library_source
+
+SOURCE_IMAGE = "image"
+SOURCE_VECTOR = "vector"
+SOURCE_TYPES = (SOURCE_IMAGE, SOURCE_VECTOR)
+
+CODE_PATTERN = re.compile(r"OZN\d+", re.IGNORECASE)
+
+# Пропорции растровых этикеток библиотеки (2032×1181), чтобы раскладка на листе
+# не зависела от типа источника
+LABEL_ASPECT = 1181 / 2032
+
+# Доли высоты этикетки: штрихи, строка кода, описание
+BARS_SHARE = 0.58
+CODE_SHARE = 0.1
+TEXT_SHARE = 0.07
+
+# Свободное поле Code128 слева и справа, в ширинах модуля
+QUIET_MODULES = 10
+
+# Описания товаров в библиотеке: «код OZN;описание», как на растровых этикетках
+DESCRIPTIONS_FILE = "descriptions.csv"
+
+
+def code_from_filename(filename: str) -> Optional[str]:
+    match = CODE_PATTERN.match(filename)
+    return match.group(0).upper() if match else None
+
+
+def description_from_filename(filename: str) -> str:
+    """Описание товара из имени файла: всё после кода, без расширения."""
+    stem = os.path.splitext(filename)[0]
+    match = CODE_PATTERN.match(stem)
+    if match:
+        stem = stem[match.end():]
+    return " ".join(stem.replace("_", " ").split())
+
+
+def load_descriptions(source_dir: str) -> Dict[str, str]:
+    """Описания товаров из ``descriptions.csv`` папки или архива библиотеки.
+
+    Файл в формате CSV с разделителем «;» (так сохраняет Excel), в UTF-8 или
+    cp1251: первая колонка — код OZN, вторая — описание. Нет файла — пустой словарь.
+    """
+    try:
+        with library_source.open_file(os.path.join(source_dir, DESCRIPTIONS_FILE)) as f:
+            data = f.read()
+    except OSError:
+        return {}
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("cp1251")
+    descriptions: Dict[str, str] = {}
+    for row in csv.reader(io.StringIO(text), delimiter=";"):
+        if len(row) < 2:
+            continue
+        code = code_from_filename(row[0].strip())
+        if code is not None and row[1].strip():
+            descriptions[code] = row[1].strip()
+    return descriptions
+
+
+class LabelForms:
+    """Векторные этикетки Code128, по одной форме PDF (XObject) на код.
+
+    Форма рисуется один раз при первом использовании кода, а все копии
+    ссылаются на неё через ``doForm``, поэтому размер документа почти не
+    зависит от числа копий.
+
+    Описание берётся из ``descriptions`` (код -> текст, см.
+    ``load_descriptions``), а при его отсутствии — из имени файла.
+    """
+
+    def __init__(
+        self,
+        canvas,
+        width: float,
+        height: float,
+        font_name: str,
+        descriptions: Optional[Dict[str, str]] = None,
+    ):
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.font_name = font_name
+        self.descriptions = descriptions or {}
+        self._forms: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def draw(self, filename: str, x: float, y: float) -> None:
+        name = self._forms.get(filename)
+        if name is None:
+            name = self._define(filename)
+        c = self.canvas
+        c.saveState()
+        c.translate(x, y)
+        c.doForm(name)
+        c.restoreState()
+
+    def _define(self, filename: str) -> str:
+        from reportlab.graphics.barcode.code128 import Code128
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        code = code_from_filename(filename)
+        if code is None:
+            raise ValueError(f"В имени '{filename}' нет кода OZN.")
+
+        name = f"label{len(self._forms)}"
+        c = self.canvas
+        w, h = self.width, self.height
+        c.beginForm(name, lowerx=0, lowery=0, upperx=w, uppery=h)
+
+        bars_height = h * BARS_SHARE
+        probe = Code128(code, barWidth=1, quiet=False, humanReadable=False)
+        # Штрихи занимают ширину этикетки без свободных полей по краям
+        bar_width = w / (probe.width + 2 * QUIET_MODULES)
+        quiet = bar_width * QUIET_MODULES
+        barcode = Code128(
+            code,
+            barWidth=bar_width,
+            barHeight=bars_height,
+            quiet=False,
+            humanReadable=False,
+        )
+        barcode.drawOn(c, quiet, h - bars_height)
+
+        code_size = h * CODE_SHARE
+        c.setFont(self.font_name, code_size)
+        y = h - bars_height - code_size * 1.05
+        c.drawString(quiet, y, code)
+
+        text_size = h * TEXT_SHARE
+        c.setFont(self.font_name, text_size)
+        description = self.descriptions.get(code) or description_from_filename(filename)
+        lines = _wrap(description, w - 2 * quiet, self.font_name, text_size, stringWidth)
+        for line in lines[:2]:
+            y -= text_size * 1.25
+            c.drawString(quiet, y, line)
+
+        c.endForm()
+        self._forms[filename] = name
+        return name
+
+
+def _wrap(text: str, width: float, font_name: str, size: float, string_width) -> list[str]:
+    lines: list[str] = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if current and string_width(candidate, font_name, size) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines